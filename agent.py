@@ -1,11 +1,45 @@
+import copy
+import time
 from typing import Any, List, Optional
 
 from smolagents import CodeAgent
+from smolagents.memory import ActionStep, AgentMemory, FinalAnswerStep, PlanningStep
+from smolagents.monitoring import Monitor
+from smolagents.utils import AgentMaxStepsError
 
+from context_budget import SUMMARY_PROMPT, ContextBudget
+from routing import RoutingModel
+from run_budget import BudgetExceededError, BudgetTracker, RunBudget
+from tools.read_context_tool import ReadContextTool
+from tools.retrieval import task_index
+from tools.web import task_memo
 from utils.logger import get_logger
+from utils.sandbox import SANDBOX_ENABLED, SandboxedPythonExecutor, get_sandbox_pool
+from utils.tracing import trace_model, trace_tool, tracer
 
 logger = get_logger(__name__)
 
+DEFAULT_PROMPT = """
+    You are an advanced AI assistant specialized in solving complex, real-world tasks that require multi-step reasoning, factual accuracy, and use of external tools.
+
+    Follow these principles:
+    - Be precise and concise. The final answer must strictly match the required format with no extra commentary.
+    - Use tools intelligently. If a question involves external information, structured data, images, or audio, call the appropriate tool to retrieve or process it.
+    - Reason step-by-step. Think through the solution logically and plan your actions carefully before answering.
+    - Validate information. Always verify facts when possible instead of guessing.
+    - Use code if needed. For calculations, parsing, or transformations, generate Python code and execute it. But be careful, some questions contains time-consuming tasks, so you should be careful with the code you run. Better analyze the question and think about the best way to solve it.
+    - Don't forget to use `final_answer` to give the final answer.
+    - Use name of file ONLY FROM "FILE:" section. THIS IF ALWAYS A FILE.
+
+    IMPORTANT: When giving the final answer, output only the direct required result without any extra text like "Final Answer:" or explanations. YOU MUST RESPOND IN THE EXACT FORMAT AS THE QUESTION.
+
+    QUESTION: {question}
+
+    FILE: {context}
+
+    ANSWER:
+    """
+
 
 class Agent:
     """
@@ -15,6 +49,11 @@ class Agent:
         model (Any): The language model to use.
         tools (Optional[List[Any]]): List of tools to provide to the agent.
         prompt (Optional[str]): Custom prompt template for the agent.
+        context_budget (Optional[ContextBudget]): Token budgets of tool outputs and of the
+            observations of a task; defaults to the CONTEXT_* environment variables.
+        sandbox (bool): Run the agent's code in resource-limited worker processes.
+        run_budget (Optional[RunBudget]): Step, wall-clock and token ceilings of a task;
+            defaults to the AGENT_MAX_* environment variables.
     """
 
     def __init__(
@@ -22,10 +61,24 @@ class Agent:
         model: Any,
         tools: Optional[List[Any]] = None,
         prompt: Optional[str] = None,
+        context_budget: Optional[ContextBudget] = None,
+        sandbox: bool = SANDBOX_ENABLED,
+        run_budget: Optional[RunBudget] = None,
     ):
         logger.info("Initializing Agent")
-        self.model = model
-        self.tools = tools
+        # Model and tool calls are recorded as spans of the running task
+        self.model = trace_model(model)
+        self.run_budget = run_budget or RunBudget()
+        self.context_budget = context_budget or ContextBudget.from_env()
+        step_callbacks = [self._trace_step]
+        if self.context_budget is not None and tools is not None:
+            # Oversized tool outputs are compacted before they reach the agent's memory
+            tools = [self.context_budget.wrap_tool(tool) for tool in tools]
+            if self.context_budget.overflow == "spill":
+                tools.append(ReadContextTool(self.context_budget))
+            self.context_budget.summarizer = self._summarize
+            step_callbacks.append(self.context_budget.enforce_task_budget)
+        self.tools = [trace_tool(tool) for tool in tools] if tools is not None else None
         self.imports = [
             "pandas",
             "numpy",
@@ -43,37 +96,162 @@ class Agent:
         self.agent = CodeAgent(
             model=self.model,
             tools=self.tools,
-            add_base_tools=True,
+            add_base_tools=False,
             additional_authorized_imports=self.imports,
+            step_callbacks=step_callbacks,
+            max_steps=self.run_budget.max_steps,
+            # Printed outputs of the agent's code get the same budget as tool outputs
+            max_print_outputs_length=self.context_budget.page_chars if self.context_budget else None,
         )
-        self.prompt = prompt or (
-            """
-            You are an advanced AI assistant specialized in solving complex, real-world tasks that require multi-step reasoning, factual accuracy, and use of external tools.
-        
-            Follow these principles:
-            - Be precise and concise. The final answer must strictly match the required format with no extra commentary.
-            - Use tools intelligently. If a question involves external information, structured data, images, or audio, call the appropriate tool to retrieve or process it.
-            - Reason step-by-step. Think through the solution logically and plan your actions carefully before answering.
-            - Validate information. Always verify facts when possible instead of guessing.
-            - Use code if needed. For calculations, parsing, or transformations, generate Python code and execute it. But be careful, some questions contains time-consuming tasks, so you should be careful with the code you run. Better analyze the question and think about the best way to solve it.
-            - Don't forget to use `final_answer` to give the final answer.
-            - Use name of file ONLY FROM "FILE:" section. THIS IF ALWAYS A FILE.
-
-            IMPORTANT: When giving the final answer, output only the direct required result without any extra text like "Final Answer:" or explanations. YOU MUST RESPOND IN THE EXACT FORMAT AS THE QUESTION.
-
-            QUESTION: {question}
-
-            FILE: {context}
-
-            ANSWER:
-            """
-        )
+        self.sandbox = sandbox
+        if sandbox:
+            # Start the warm workers while the rest of the app loads
+            get_sandbox_pool()
+        self.agent.python_executor = self._create_executor(self.agent)
+        self.prompt = prompt or DEFAULT_PROMPT
         logger.info("Agent initialized")
 
+    def clone(self) -> "Agent":
+        """
+        Create an independent copy of the agent without rebuilding its tools.
+
+        The model, tools and prompt templates are shared with the original, while the
+        memory, monitor, variables and Python executor of the CodeAgent are fresh, so the
+        clone can run a task concurrently with other clones.
+
+        Returns:
+            Agent: The cloned agent.
+        """
+        clone = copy.copy(self)
+        template = self.agent
+        code_agent = copy.copy(template)
+        code_agent.state = {}
+        code_agent.memory = AgentMemory(template.system_prompt)
+        code_agent.monitor = Monitor(code_agent.model, code_agent.logger)
+        code_agent.step_callbacks = [
+            callback
+            for callback in template.step_callbacks
+            if callback != template.monitor.update_metrics
+        ] + [code_agent.monitor.update_metrics]
+        code_agent.python_executor = self._create_executor(code_agent)
+        code_agent.interrupt_switch = False
+        clone.agent = code_agent
+        return clone
+
+    def _create_executor(self, code_agent: CodeAgent) -> Any:
+        """Executor of the agent's code: a sandbox worker, or the CodeAgent's own executor."""
+        if not self.sandbox:
+            return code_agent.create_python_executor()
+        return SandboxedPythonExecutor(
+            code_agent.additional_authorized_imports,
+            max_print_outputs_length=code_agent.max_print_outputs_length,
+        )
+
+    @staticmethod
+    def _trace_step(memory_step: Any, agent: Any = None) -> None:
+        """Record a finished agent step as a span of the running task."""
+        if not isinstance(memory_step, ActionStep):
+            return
+        error = memory_step.error
+        tracer.record(
+            f"step {memory_step.step_number}",
+            "step",
+            start=memory_step.start_time,
+            end=memory_step.end_time or memory_step.start_time,
+            step=memory_step.step_number,
+            model_output_chars=len(memory_step.model_output or ""),
+            observation_chars=len(memory_step.observations or ""),
+            error=str(error) if error else None,
+        )
+
+    def _summarize(self, text: str, tool_name: str, tokens: int) -> str:
+        """Summarize an oversized tool output with the agent's model."""
+        prompt = SUMMARY_PROMPT.format(tool=tool_name, tokens=tokens, text=text[: tokens * 40])
+        message = self.model.generate([{"role": "user", "content": [{"type": "text", "text": prompt}]}])
+        return message.content or ""
+
+    def _run(
+        self, question: str, file_path: Optional[str], tracker: BudgetTracker, max_steps: Optional[int] = None
+    ) -> str:
+        """Run the agent once, stopping it early when the task budget runs out."""
+        task = self.prompt.format(question=question, context=file_path)
+        tracker.start_run()
+        answer, reason, final_pending, last_step = None, None, False, None
+        steps = self.agent.run(task, stream=True, max_steps=max_steps)
+        for step in steps:
+            if isinstance(step, FinalAnswerStep):
+                answer = step.final_answer
+            elif isinstance(step, ActionStep):
+                # A step giving the final answer is never cut short
+                if step is not last_step and not final_pending:
+                    reason = tracker.check(step, self.agent)
+                    if reason is not None:
+                        break
+                last_step = step
+            elif isinstance(step, PlanningStep):
+                tracker.count(step, self.agent)
+            else:
+                final_pending = step is not None
+        if reason is not None:
+            steps.close()
+            tracker.reason = reason
+            self.run_budget.record(reason)
+            logger.info(f"Stopping the agent ({reason} budget), asking for its best answer")
+            answer = self._force_final_answer(task, reason)
+        elif self._max_steps_reached():
+            tracker.reason = tracker.reason or "steps"
+            self.run_budget.record("steps")
+        return str(answer).strip("'").strip('"').strip()
+
+    def _force_final_answer(self, task: str, reason: str) -> Any:
+        """Ask the model for its best answer from the memory, as on step exhaustion."""
+        answer = self.agent.provide_final_answer(task)
+        final_step = ActionStep(
+            step_number=self.agent.step_number, error=BudgetExceededError(reason, self.agent.logger)
+        )
+        final_step.action_output = answer
+        final_step.end_time = time.time()
+        self.agent.memory.steps.append(final_step)
+        return answer
+
+    def _max_steps_reached(self) -> bool:
+        steps = self.agent.memory.steps
+        return bool(steps) and isinstance(getattr(steps[-1], "error", None), AgentMaxStepsError)
+
+    def _run_cascade(self, question: str, file_path: Optional[str], span: Any, tracker: BudgetTracker) -> str:
+        """Try the routes planned by the routing model, escalating until one succeeds or the budget runs out."""
+        routes = self.model.plan(question, file_path)
+        for index, route in enumerate(routes):
+            is_last = index == len(routes) - 1
+            answer, error = None, None
+            start = time.perf_counter()
+            with self.model.use_route(route):
+                try:
+                    answer = self._run(question, file_path, tracker, max_steps=self.model.max_steps.get(route))
+                except Exception as e:
+                    error = e
+            reason = self.model.should_escalate(answer, error, self._max_steps_reached())
+            escalate = reason is not None and not is_last and not tracker.exhausted
+            self.model.record(route, time.perf_counter() - start, success=reason is None, escalated=escalate)
+            span.attributes.setdefault("routes", []).append(route)
+            if escalate:
+                logger.info(f"Escalating from route {route} to {routes[index + 1]} ({reason})")
+                continue
+            if error is not None:
+                raise error
+            return answer
+
     def __call__(self, question: str, file_path: Optional[str] = None) -> str:
         """
         Run the agent to answer a question, optionally using a file as context.
 
+        With a `RoutingModel`, the cheapest suitable route is tried first and the task is
+        rerun on stronger routes on errors, step exhaustion or low-confidence answers.
+        Web pages are fetched once per task, and documents fetched during the task are
+        indexed for `search_context` in an index of its own. Runs are bounded by
+        `run_budget`: when a ceiling is hit or the agent loops, it is stopped and asked
+        for its best answer.
+
         Args:
             question (str): The question to answer.
             file_path (Optional[str]): Path to a file to use as context (if any).
@@ -81,8 +259,19 @@ class Agent:
         Returns:
             str: The agent's answer as a string.
         """
-        answer = self.agent.run(
-            self.prompt.format(question=question, context=file_path)
-        )
-        answer = str(answer).strip("'").strip('"').strip()
+        tracker = self.run_budget.start()
+        task_span = tracer.span("task", "task", question_chars=len(question), file=file_path)
+        with task_span as span, task_index(), task_memo():
+            try:
+                if isinstance(self.model, RoutingModel):
+                    answer = self._run_cascade(question, file_path, span, tracker)
+                else:
+                    answer = self._run(question, file_path, tracker)
+            finally:
+                # The sandbox worker of the task is discarded with its variables
+                close = getattr(self.agent.python_executor, "close", None)
+                if close is not None:
+                    close()
+            steps = sum(1 for step in self.agent.memory.steps if isinstance(step, ActionStep))
+            span.attributes.update(steps=steps, answer_chars=len(answer), budget=tracker.reason)
         return answer
@@ -0,0 +1,209 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from tools.tool_cache import file_digest
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Answers of earlier runs served again for identical questions and attachments ("0" disables)
+MEMO_ENABLED = os.getenv("ANSWER_MEMO", "1") != "0"
+DEFAULT_MEMO_PATH = os.getenv("ANSWER_MEMO_PATH", os.path.join(".cache", "answer_memo.sqlite"))
+# Word set similarity above which a question is flagged as a near-duplicate of a memoized one
+DEFAULT_SIMILARITY = float(os.getenv("ANSWER_MEMO_SIMILARITY", "0.8"))
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normalize a question for exact matching: Unicode compatibility forms and whitespace.
+
+    Case and punctuation are kept, since they can change the answer (e.g. reversed text).
+    """
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", question)).strip()
+
+
+def question_words(question: str) -> FrozenSet[str]:
+    """Lowercase words of a question, compared to find near-duplicates."""
+    return frozenset(re.findall(r"\w+", question.lower()))
+
+
+class AnswerMemo:
+    """
+    Answers of earlier runs keyed by question, attachment content and agent configuration.
+
+    A question asked again with the same normalized text, byte-identical attachment and
+    configuration fingerprint (model, routing, prompt, see `AgentRegistry.fingerprint`)
+    is answered from the memo without running the agent. Only confirmed answers are
+    served: those the agent gave on its own, not ones forced by the task budget.
+    Questions close to a memoized one but not identical are only flagged, through an
+    in-memory index of the memoized questions' words.
+
+    Changing the prompt or the model changes the fingerprint, so older answers stop
+    being served; `invalidate` deletes them.
+
+    Args:
+        fingerprint (str): Fingerprint of the agent configuration.
+        path (str): Path of the sqlite file.
+        similarity (float): Jaccard similarity of the word sets above which a question is
+            flagged as a near-duplicate.
+    """
+
+    def __init__(self, fingerprint: str, path: str = DEFAULT_MEMO_PATH, similarity: float = DEFAULT_SIMILARITY):
+        self.fingerprint = fingerprint
+        self.path = path
+        self.similarity = similarity
+        self.stats = {"hits": 0, "misses": 0, "unconfirmed": 0, "near_duplicates": 0, "stores": 0}
+        self._lock = threading.RLock()
+        self._key_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+        self._words: Dict[str, Tuple[FrozenSet[str], str]] = {}
+        self._last_rowid = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Evaluation shards share the file, so writers wait for each other instead of failing
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "key TEXT PRIMARY KEY, config TEXT, question TEXT, answer TEXT, task_id TEXT, "
+            "confirmed INTEGER, created REAL)"
+        )
+        self._db.commit()
+        self._load_words()
+
+    def _load_words(self) -> None:
+        # Answers memoized since the last call, by this or another process
+        rows = self._db.execute(
+            "SELECT rowid, key, question, task_id FROM answers WHERE config = ? AND rowid > ? ORDER BY rowid",
+            (self.fingerprint, self._last_rowid),
+        ).fetchall()
+        for rowid, key, question, task_id in rows:
+            self._words[key] = (question_words(question), task_id)
+            self._last_rowid = rowid
+
+    @classmethod
+    def from_env(cls, fingerprint: str) -> Optional["AnswerMemo"]:
+        """The memo configured by the environment, None when ANSWER_MEMO is "0"."""
+        return cls(fingerprint) if MEMO_ENABLED else None
+
+    def key(self, question: str, file_path: Optional[str] = None) -> str:
+        """
+        Key of a question with its attachment under this memo's configuration.
+
+        Args:
+            question (str): The question.
+            file_path (Optional[str]): The attachment, keyed by content.
+
+        Returns:
+            str: Hex digest of the normalized question, attachment digest and fingerprint.
+        """
+        attachment = file_digest(file_path) if file_path else ""
+        payload = "\0".join((self.fingerprint, normalize_question(question), attachment))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def lock(self, key: str) -> threading.Lock:
+        """Lock of a key, held while answering so concurrent duplicates wait for the first answer."""
+        with self._lock:
+            return self._key_locks[key]
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Return the confirmed answer of a key.
+
+        Args:
+            key (str): See `key`.
+
+        Returns:
+            Optional[str]: The answer, None if there is no confirmed one.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT answer, confirmed FROM answers WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            if not row[1]:
+                self.stats["unconfirmed"] += 1
+                return None
+            self.stats["hits"] += 1
+            return row[0]
+
+    def record(self, key: str, question: str, answer: str, task_id: str = "", confirmed: bool = True) -> None:
+        """
+        Store the answer of a key, replacing any earlier one.
+
+        Args:
+            key (str): See `key`.
+            question (str): The question, indexed for near-duplicate detection.
+            answer (str): The answer.
+            task_id (str): The task the answer was given for.
+            confirmed (bool): Whether the answer may be served to later runs.
+        """
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers (key, config, question, answer, task_id, confirmed, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, self.fingerprint, question, answer, task_id, int(confirmed), time.time()),
+            )
+            self._db.commit()
+            self._load_words()
+            self.stats["stores"] += 1
+
+    def near_duplicate(self, question: str, key: str) -> Optional[Tuple[str, float]]:
+        """
+        Find the memoized question closest to `question`, other than `key` itself.
+
+        Args:
+            question (str): The question.
+            key (str): Its key, excluded from the search.
+
+        Returns:
+            Optional[Tuple[str, float]]: Task id and similarity of the closest memoized
+                question, if it reaches the similarity threshold.
+        """
+        words = question_words(question)
+        if not words:
+            return None
+        best: Optional[Tuple[str, float]] = None
+        with self._lock:
+            self._load_words()
+            for other_key, (other_words, task_id) in self._words.items():
+                if other_key == key or not other_words:
+                    continue
+                score = len(words & other_words) / len(words | other_words)
+                if score >= self.similarity and (best is None or score > best[1]):
+                    best = (task_id, score)
+            if best is not None:
+                self.stats["near_duplicates"] += 1
+        return best
+
+    def invalidate(self, keep_current: bool = True) -> int:
+        """
+        Delete memoized answers, e.g. after changing the prompt or the model.
+
+        Args:
+            keep_current (bool): Keep the answers of this memo's configuration and delete
+                those of every other one; False deletes everything.
+
+        Returns:
+            int: Number of answers deleted.
+        """
+        with self._lock:
+            if keep_current:
+                cursor = self._db.execute("DELETE FROM answers WHERE config != ?", (self.fingerprint,))
+            else:
+                cursor = self._db.execute("DELETE FROM answers")
+                self._words.clear()
+            self._db.commit()
+        logger.info(f"Invalidated {cursor.rowcount} memoized answers in {self.path}")
+        return cursor.rowcount
+
+    def report(self) -> Dict[str, int]:
+        """Hits, misses, unconfirmed answers skipped, near-duplicates flagged and answers stored."""
+        with self._lock:
+            return dict(self.stats)
+
@@ -1,15 +1,18 @@
 import inspect
 import os
-import tempfile
-from typing import Any, Optional, Tuple
+import time
+from collections import Counter
+from typing import Any, Iterator, Optional, Tuple
 
 import gradio as gr
 import pandas as pd
 import requests
 
-from agent import Agent
-from model import get_model
-from tools.tools import get_tools
+from answer_memo import AnswerMemo
+from evaluation import collect_results, fetch_questions, iter_questions, result_row, submit_answers
+from registry import AgentRegistry
+from utils.checkpoint import CheckpointStore
+from utils.startup import format_report, profile_imports
 
 # (Keep Constants as is)
 # --- Constants ---
@@ -18,18 +21,33 @@ DEFAULT_API_URL = "https://agents-course-unit4-scoring.hf.space"
 
 # --- Basic Agent Definition ---
 # ----- THIS IS WERE YOU CAN BUILD WHAT YOU WANT ------
+# Set MODEL_TYPE=RoutingModel and MODEL_ID=routes.json to route tasks between a cheap
+# and a strong model (see routing.py)
+MODEL_TYPE = os.getenv("MODEL_TYPE", "OpenAIServerModel")
+MODEL_ID = os.getenv("MODEL_ID", "gpt-4.1")
+
+# Model, tools and a template agent are built once per process and cloned per task
+agent_registry = AgentRegistry(MODEL_TYPE, MODEL_ID)
+
+# Evaluation runs streaming at the same time, and runs waiting in the queue (0: unbounded)
+RUN_CONCURRENCY = int(os.getenv("RUN_CONCURRENCY", "2"))
+RUN_QUEUE_SIZE = int(os.getenv("RUN_QUEUE_SIZE", "16"))
 
 
 def run_and_submit_all(
     profile: Optional[gr.OAuthProfile],
-) -> Tuple[str, Optional[pd.DataFrame]]:
+) -> Iterator[Tuple[str, Optional[pd.DataFrame]]]:
     """
     Fetches all questions, runs the Agent on them, submits all answers, and displays the results.
 
+    The results table is streamed: it is yielded again each time a question finishes,
+    with the status, duration and token count of every question, so the UI shows
+    progress and the connection stays active during long runs.
+
     Args:
         profile (Optional[gr.OAuthProfile]): The OAuth profile of the user.
 
-    Returns:
+    Yields:
         Tuple[str, Optional[pd.DataFrame]]: Status message and DataFrame of results.
     """
     # --- Determine HF Space Runtime URL and Repo URL ---
@@ -40,163 +58,96 @@ def run_and_submit_all(
         print(f"User logged in: {username}")
     else:
         print("User not logged in.")
-        return "Please Login to Hugging Face with the button.", None
+        yield "Please Login to Hugging Face with the button.", None
+        return
 
     api_url = DEFAULT_API_URL
-    questions_url = f"{api_url}/questions"
-    submit_url = f"{api_url}/submit"
-    files_url = f"{api_url}/files"
 
     # 1. Instantiate Agent ( modify this part to create your agent)
+    # Every task gets its own clone of the template agent (and CodeAgent memory).
+    yield "Initializing agent...", None
     try:
-        agent = Agent(
-            model=get_model("OpenAIServerModel", "gpt-4.1"), tools=get_tools()
-        )
+        agent_registry.warm_up()
     except Exception as e:
         print(f"Error instantiating agent: {e}")
-        return f"Error initializing agent: {e}", None
+        yield f"Error initializing agent: {e}", None
+        return
     # In the case of an app running as a hugging Face space, this link points toward your codebase (usefull for others so please keep it public)
     agent_code = f"https://huggingface.co/spaces/{space_id}/tree/main"
     print(agent_code)
 
     # 2. Fetch Questions
-    print(f"Fetching questions from: {questions_url}")
     try:
-        response = requests.get(questions_url, timeout=15)
-        response.raise_for_status()
-        questions_data = response.json()
-        if not questions_data:
-            print("Fetched questions list is empty.")
-            return "Fetched questions list is empty or invalid format.", None
-        print(f"Fetched {len(questions_data)} questions.")
+        tasks = fetch_questions(api_url)
     except requests.exceptions.RequestException as e:
         print(f"Error fetching questions: {e}")
-        return f"Error fetching questions: {e}", None
-    except requests.exceptions.JSONDecodeError as e:
-        print(f"Error decoding JSON response from questions endpoint: {e}")
-        print(f"Response text: {response.text[:500]}")
-        return f"Error decoding server response for questions: {e}", None
+        yield f"Error fetching questions: {e}", None
+        return
+    except ValueError as e:
+        print(str(e))
+        yield str(e), None
+        return
     except Exception as e:
         print(f"An unexpected error occurred fetching questions: {e}")
-        return f"An unexpected error occurred fetching questions: {e}", None
+        yield f"An unexpected error occurred fetching questions: {e}", None
+        return
 
     # 3. Run your Agent
-    results_log = []
-    answers_payload = []
-    print(f"Running agent on {len(questions_data)} questions...")
-    for item in questions_data:
-        task_id = item.get("task_id")
-        question_text = item.get("question")
-        if not task_id or question_text is None:
-            print(f"Skipping item with missing task_id or question: {item}")
-            continue
-        try:
-            file_path: Optional[str] = None
-            try:
-                file_response = requests.get(f"{files_url}/{task_id}", timeout=15)
-                if file_response.status_code == 200 and file_response.content:
-                    # Get filename from Content-Disposition header or URL
-                    filename = None
-                    content_disposition = file_response.headers.get(
-                        "Content-Disposition"
-                    )
-                    if content_disposition and "filename=" in content_disposition:
-                        filename = content_disposition.split("filename=")[-1].strip('"')
-                    else:
-                        # Try to get filename from URL
-                        url = file_response.url
-                        filename = url.split("/")[-1]
-                        if not filename or filename == str(task_id):
-                            filename = f"file_{task_id}"
-
-                    # Create temp directory and save file with original name
-                    temp_dir = tempfile.mkdtemp()
-                    file_path = os.path.join(temp_dir, filename)
-                    with open(file_path, "wb") as f:
-                        f.write(file_response.content)
-                    print(f"Downloaded file for task {task_id} to {file_path}")
-                else:
-                    print(f"No file for task {task_id} or file is empty.")
-            except Exception as e:
-                print(f"Error downloading file for task {task_id}: {e}")
-                file_path = None
-
-            submitted_answer = agent(question_text, file_path)
-            answers_payload.append(
-                {"task_id": task_id, "submitted_answer": submitted_answer}
-            )
-            results_log.append(
-                {
-                    "Task ID": task_id,
-                    "Question": question_text,
-                    "Submitted Answer": submitted_answer,
-                }
-            )
-        except Exception as e:
-            print(f"Error running agent on task {task_id}: {e}")
-            results_log.append(
-                {
-                    "Task ID": task_id,
-                    "Question": question_text,
-                    "Submitted Answer": f"AGENT ERROR: {e}",
-                }
-            )
+    # Answers are checkpointed as they come in, so an interrupted run resumes where it stopped
+    checkpoint = CheckpointStore(agent_registry.fingerprint())
+    # Questions answered before with the same attachment, model and prompt are not run again
+    memo = AnswerMemo.from_env(checkpoint.fingerprint)
+    rows = {
+        item["task_id"]: result_row(
+            item,
+            checkpoint.get(item["task_id"]),
+            "checkpoint" if item["task_id"] in checkpoint else "pending",
+        )
+        for item in tasks
+    }
+    pending = sum(row["Status"] == "pending" for row in rows.values())
+    yield f"Running agent on {pending} of {len(tasks)} questions...", pd.DataFrame(rows.values())
+
+    start = time.monotonic()
+    results = []
+    trace_summaries = {}
+    statuses = Counter()
+    for result in iter_questions(agent_registry, tasks, checkpoint, api_url, memo=memo):
+        item = result["task"]
+        results.append(result)
+        statuses[result["status"]] += 1
+        if result["summary"]:
+            trace_summaries[item["task_id"]] = result["summary"]
+        answer = result["result"] if result["status"] == "ok" else f"AGENT ERROR: {result['error']}"
+        rows[item["task_id"]] = result_row(item, answer, result["status"], result["duration"], result["summary"])
+        status_message = (
+            f"Running: {len(results)}/{pending} questions finished in {time.monotonic() - start:.0f}s "
+            f"({', '.join(f'{count} {status}' for status, count in sorted(statuses.items()))})"
+        )
+        yield status_message, pd.DataFrame(rows.values())
+
+    results_log, answers_payload = collect_results(tasks, checkpoint, results, trace_summaries)
 
     if not answers_payload:
         print("Agent did not produce any answers to submit.")
-        return "Agent did not produce any answers to submit.", pd.DataFrame(results_log)
+        yield "Agent did not produce any answers to submit.", pd.DataFrame(results_log)
+        return
 
-    # 4. Prepare Submission
-    submission_data = {
-        "username": username.strip(),
-        "agent_code": agent_code,
-        "answers": answers_payload,
-    }
-    status_update = f"Agent finished. Submitting {len(answers_payload)} answers for user '{username}'..."
-    print(status_update)
-
-    # 5. Submit
-    print(f"Submitting {len(answers_payload)} answers to: {submit_url}")
-    try:
-        response = requests.post(submit_url, json=submission_data, timeout=60)
-        response.raise_for_status()
-        result_data = response.json()
-        final_status = (
-            f"Submission Successful!\n"
-            f"User: {result_data.get('username')}\n"
-            f"Overall Score: {result_data.get('score', 'N/A')}% "
-            f"({result_data.get('correct_count', '?')}/{result_data.get('total_attempted', '?')} correct)\n"
-            f"Message: {result_data.get('message', 'No message received.')}"
+    if len(answers_payload) < len(tasks):
+        status_message = (
+            f"Answered {len(answers_payload)} of {len(tasks)} questions, nothing was submitted. "
+            f"Run again to retry the remaining questions; answered ones are kept in {checkpoint.path}."
         )
-        print("Submission successful.")
-        results_df = pd.DataFrame(results_log)
-        return final_status, results_df
-    except requests.exceptions.HTTPError as e:
-        error_detail = f"Server responded with status {e.response.status_code}."
-        try:
-            error_json = e.response.json()
-            error_detail += f" Detail: {error_json.get('detail', e.response.text)}"
-        except requests.exceptions.JSONDecodeError:
-            error_detail += f" Response: {e.response.text[:500]}"
-        status_message = f"Submission Failed: {error_detail}"
         print(status_message)
-        results_df = pd.DataFrame(results_log)
-        return status_message, results_df
-    except requests.exceptions.Timeout:
-        status_message = "Submission Failed: The request timed out."
-        print(status_message)
-        results_df = pd.DataFrame(results_log)
-        return status_message, results_df
-    except requests.exceptions.RequestException as e:
-        status_message = f"Submission Failed: Network error - {e}"
-        print(status_message)
-        results_df = pd.DataFrame(results_log)
-        return status_message, results_df
-    except Exception as e:
-        status_message = f"An unexpected error occurred during submission: {e}"
-        print(status_message)
-        results_df = pd.DataFrame(results_log)
-        return status_message, results_df
+        yield status_message, pd.DataFrame(results_log)
+        return
+
+    # 4. Prepare and submit (see evaluation.py, also used by the headless runner)
+    yield f"Agent finished. Submitting {len(answers_payload)} answers for user '{username}'...", pd.DataFrame(
+        results_log
+    )
+    status_message = submit_answers(username, agent_code, answers_payload, api_url)
+    yield status_message, pd.DataFrame(results_log)
 
 
 # --- Build Gradio Interface using Blocks ---
@@ -224,7 +175,15 @@ with gr.Blocks() as demo:
     )
     results_table = gr.DataFrame(label="Questions and Agent Answers", wrap=True)
 
-    run_button.click(fn=run_and_submit_all, outputs=[status_output, results_table])
+    run_button.click(
+        fn=run_and_submit_all,
+        outputs=[status_output, results_table],
+        concurrency_limit=RUN_CONCURRENCY,
+        concurrency_id="evaluation",
+    )
+
+# Runs are queued: RUN_CONCURRENCY of them stream at once, the others wait in line
+demo.queue(max_size=RUN_QUEUE_SIZE or None)
 
 if __name__ == "__main__":
     print("\n" + "-" * 30 + " App Starting " + "-" * 30)
@@ -249,7 +208,13 @@ if __name__ == "__main__":
             "ℹ️  SPACE_ID environment variable not found (running locally?). Repo URL cannot be determined."
         )
 
+    if os.getenv("STARTUP_REPORT"):
+        # Cold import cost of this app, measured in a fresh interpreter
+        print(format_report("app", profile_imports("app")) + "\n")
+
     print("-" * (60 + len(" App Starting ")) + "\n")
 
+    agent_registry.warm_up_in_background()
+
     print("Launching Gradio Interface for Basic Agent Evaluation...")
     demo.launch(debug=True, share=False)
@@ -0,0 +1,321 @@
+"""
+Offline benchmark of the agent pipeline.
+
+Drives `Agent` over a local question fixture with a scripted model and stubbed
+network/ML tools, and reports wall time, LLM latency, steps, tool calls, tokens and
+peak RSS per task and in aggregate as JSON.
+
+Usage:
+    python -m benchmarks.run_benchmark --output bench.json
+    python -m benchmarks.run_benchmark --compare baseline.json --output bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional
+
+from smolagents import ChatMessage, Model, Tool
+from smolagents.monitoring import LogLevel
+
+from agent import Agent
+from tools.retrieval import index_tool
+from tools.tools import INDEXED_TOOLS, TOOL_CLASSES
+from utils.sandbox import get_sandbox_pool
+from utils.task_runner import run_tasks
+from utils.tracing import summarize_spans, tracer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+DEFAULT_QUESTIONS = os.path.join(FIXTURES_DIR, "questions.json")
+
+# Tools that run locally and offline are benchmarked for real
+REAL_TOOLS = {"python_interpreter", "read_file", "search_context"}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def message_role(message: Any) -> str:
+    role = message["role"] if isinstance(message, dict) else message.role
+    return getattr(role, "value", role)
+
+
+def message_text(message: Any) -> str:
+    content = message["content"] if isinstance(message, dict) else message.content
+    if isinstance(content, list):
+        return "\n".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+class ScriptedModel(Model):
+    """
+    Model stub that replays the code steps scripted for each fixture question.
+
+    The question is recognized in the task message, and the step to emit is the number
+    of assistant messages already in the conversation.
+
+    Args:
+        questions (List[Dict[str, Any]]): Fixture questions with their scripted `steps`.
+        file_paths (Dict[str, Optional[str]]): Attachment path of each question, by task id.
+        latency (float): Simulated latency of every call in seconds.
+    """
+
+    def __init__(self, questions: List[Dict[str, Any]], file_paths: Dict[str, Optional[str]], latency: float):
+        super().__init__(model_id="scripted")
+        self.questions = questions
+        self.file_paths = file_paths
+        self.latency = latency
+
+    def generate(self, messages, stop_sequences=None, grammar=None, tools_to_call_from=None, **kwargs):
+        texts = [message_text(message) for message in messages]
+        prompt = "\n".join(texts)
+        question = next((q for q in self.questions if q["question"] in prompt), None)
+        step = sum(1 for message in messages if message_role(message) == "assistant")
+        if question is not None and step < len(question["steps"]):
+            code = question["steps"][step].replace("FILE_PATH", repr(self.file_paths.get(question["task_id"])))
+        else:
+            code = 'final_answer("unknown")'
+        output = f"Thought: Scripted step {step + 1}.\nCode:\n```py\n{code}\n```<end_code>"
+        time.sleep(self.latency)
+
+        self.last_input_token_count = estimate_tokens(prompt)
+        self.last_output_token_count = estimate_tokens(output)
+        usage = {"prompt_tokens": self.last_input_token_count, "completion_tokens": self.last_output_token_count}
+        return ChatMessage(role="assistant", content=output, raw={"usage": usage})
+
+
+def make_stub_tool(tool_class: type, output: str, latency: float) -> Tool:
+    """
+    Create a tool with the same interface as `tool_class` that returns a canned output.
+
+    Args:
+        tool_class (type): The real tool class whose name, description and inputs are copied.
+        output (str): Output returned by every call.
+        latency (float): Simulated latency of every call in seconds.
+
+    Returns:
+        Tool: The stub tool instance.
+    """
+
+    def forward(self, *args, **kwargs):
+        time.sleep(latency)
+        return output
+
+    stub_class = type(
+        f"Stub{tool_class.__name__}",
+        (Tool,),
+        {
+            "name": tool_class.name,
+            "description": tool_class.description,
+            "inputs": tool_class.inputs,
+            "output_type": tool_class.output_type,
+            "skip_forward_signature_validation": True,
+            "forward": forward,
+        },
+    )
+    return stub_class()
+
+
+def build_tools(tool_fixtures: Dict[str, Dict[str, Any]]) -> List[Tool]:
+    """Build the benchmark tool set: real local tools and stubs for everything else."""
+    tools = []
+    for tool_class in TOOL_CLASSES:
+        if tool_class.name in REAL_TOOLS:
+            tool = tool_class()
+        else:
+            fixture = tool_fixtures.get(tool_class.name, {})
+            tool = make_stub_tool(tool_class, fixture.get("output", ""), fixture.get("latency", 0.0))
+        tools.append(index_tool(tool) if tool.name in INDEXED_TOOLS else tool)
+    return tools
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of `values`, `q` in [0, 1]."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def run_benchmark(questions_path: str = DEFAULT_QUESTIONS, workers: int = 1, repeat: int = 1) -> Dict[str, Any]:
+    """
+    Run the benchmark and return the report.
+
+    Args:
+        questions_path (str): Path of the question fixture file.
+        workers (int): Number of questions answered concurrently.
+        repeat (int): Number of times the whole question set is run.
+
+    Returns:
+        Dict[str, Any]: Per-task results and aggregate metrics.
+    """
+    with open(questions_path, "r", encoding="utf-8") as file:
+        fixture = json.load(file)
+    questions = fixture["questions"]
+    files_dir = os.path.join(os.path.dirname(os.path.abspath(questions_path)), "files")
+    file_paths = {
+        q["task_id"]: os.path.join(files_dir, q["file_name"]) if q.get("file_name") else None
+        for q in questions
+    }
+
+    model = ScriptedModel(questions, file_paths, fixture.get("model", {}).get("latency", 0.0))
+    template = Agent(model=model, tools=build_tools(fixture.get("tools", {})))
+    template.agent.logger.level = LogLevel.OFF
+    if template.sandbox:
+        # Workers warm up once per process, like the app does while it starts
+        get_sandbox_pool().wait_warm()
+
+    def run_one(question: Dict[str, Any]) -> Dict[str, Any]:
+        agent = template.clone()
+        start = time.perf_counter()
+        with tracer.collect() as spans:
+            answer = agent(question["question"], file_paths[question["task_id"]])
+        wall = time.perf_counter() - start
+        metrics = summarize_spans(spans)
+        return {
+            "task_id": question["task_id"],
+            "answer": answer,
+            "correct": answer == question.get("expected_answer"),
+            "wall_seconds": round(wall, 4),
+            "llm_calls": metrics["llm_calls"],
+            "llm_seconds": round(metrics["llm_seconds"], 4),
+            "steps": metrics["steps"],
+            "input_tokens": metrics["input_tokens"],
+            "output_tokens": metrics["output_tokens"],
+            "tool_calls": metrics["tool_calls"],
+            "tool_seconds": {name: round(value, 4) for name, value in metrics["tool_seconds"].items()},
+            "tool_tokens": metrics["tool_tokens"],
+            "budget": metrics["budget"],
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        }
+
+    start = time.perf_counter()
+    results = run_tasks(questions * repeat, run_one, max_workers=workers, task_timeout=None)
+    total_wall = time.perf_counter() - start
+
+    tasks = []
+    for result in results:
+        if result["status"] == "ok":
+            tasks.append(result["result"])
+        else:
+            tasks.append({"task_id": result["task"]["task_id"], "error": result["error"]})
+    finished = [task for task in tasks if "error" not in task]
+
+    tool_calls: Dict[str, int] = defaultdict(int)
+    tool_seconds: Dict[str, float] = defaultdict(float)
+    for task in finished:
+        for name, count in task["tool_calls"].items():
+            tool_calls[name] += count
+        for name, seconds in task["tool_seconds"].items():
+            tool_seconds[name] += seconds
+    walls = [task["wall_seconds"] for task in finished]
+
+    return {
+        "environment": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "workers": workers,
+            "repeat": repeat,
+        },
+        "aggregate": {
+            "tasks": len(tasks),
+            "errors": len(tasks) - len(finished),
+            "accuracy": round(sum(task["correct"] for task in finished) / len(tasks), 4) if tasks else 0.0,
+            "total_wall_seconds": round(total_wall, 4),
+            "task_wall_mean": round(statistics.mean(walls), 4) if walls else 0.0,
+            "task_wall_p50": round(percentile(walls, 0.5), 4),
+            "task_wall_p95": round(percentile(walls, 0.95), 4),
+            "llm_calls": sum(task["llm_calls"] for task in finished),
+            "llm_seconds": round(sum(task["llm_seconds"] for task in finished), 4),
+            "steps": sum(task["steps"] for task in finished),
+            "input_tokens": sum(task["input_tokens"] for task in finished),
+            "output_tokens": sum(task["output_tokens"] for task in finished),
+            "tool_calls": dict(tool_calls),
+            "tool_seconds": {name: round(value, 4) for name, value in tool_seconds.items()},
+            "budget_hits": dict(Counter(task["budget"] for task in finished if task["budget"])),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        },
+        "tasks": tasks,
+    }
+
+
+def git_commit() -> Optional[str]:
+    """Short hash of the checked out commit, if available."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    List the aggregate metrics that regressed by more than `tolerance` (relative).
+
+    Args:
+        baseline (Dict[str, Any]): Report of the reference run.
+        current (Dict[str, Any]): Report of the current run.
+        tolerance (float): Allowed relative increase, e.g. 0.1 for 10%.
+
+    Returns:
+        List[str]: Human readable regressions, empty if there are none.
+    """
+    regressions = []
+    for key in ("total_wall_seconds", "task_wall_p95", "llm_calls", "steps", "input_tokens", "output_tokens"):
+        before, after = baseline["aggregate"].get(key), current["aggregate"].get(key)
+        if before and after is not None and after > before * (1 + tolerance):
+            regressions.append(f"{key}: {before} -> {after} (+{(after / before - 1) * 100:.1f}%)")
+    if current["aggregate"]["accuracy"] < baseline["aggregate"]["accuracy"]:
+        regressions.append(
+            f"accuracy: {baseline['aggregate']['accuracy']} -> {current['aggregate']['accuracy']}"
+        )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point, see `python -m benchmarks.run_benchmark --help`."""
+    parser = argparse.ArgumentParser(description="Offline benchmark of the agent pipeline.")
+    parser.add_argument("--questions", default=DEFAULT_QUESTIONS, help="Question fixture file")
+    parser.add_argument("--workers", type=int, default=1, help="Questions answered concurrently")
+    parser.add_argument("--repeat", type=int, default=1, help="Times the question set is run")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("--compare", help="Baseline JSON report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative regression")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.questions, workers=args.workers, repeat=args.repeat)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            regressions = compare(json.load(file), report, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
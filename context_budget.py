@@ -0,0 +1,250 @@
+import functools
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional, Tuple
+
+from smolagents.memory import ActionStep
+
+from utils.logger import get_logger
+from utils.tracing import current_span
+
+logger = get_logger(__name__)
+
+# Token budgets of a single tool observation and of all observations kept in a task's
+# memory (0 disables budgeting), and what to do with oversized outputs
+DEFAULT_OBSERVATION_TOKENS = int(os.getenv("CONTEXT_OBSERVATION_TOKENS", "3000"))
+DEFAULT_TASK_TOKENS = int(os.getenv("CONTEXT_TASK_TOKENS", "30000"))
+DEFAULT_OVERFLOW = os.getenv("CONTEXT_OVERFLOW", "spill")
+OVERFLOW_MODES = ("truncate", "summarize", "spill")
+
+# Observations compacted to make room in a task keep this many tokens
+COMPACTED_OBSERVATION_TOKENS = 200
+CHARS_PER_TOKEN = 4
+
+SUMMARY_PROMPT = (
+    "Summarize the following output of the `{tool}` tool in at most {tokens} tokens. Keep every "
+    "name, number, date and fact that could answer a question; drop boilerplate.\n\n{text}"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of a text (4 characters per token)."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class SpillStore:
+    """
+    Bounded in-memory store of oversized outputs, addressed by content handles.
+
+    Args:
+        max_chars (int): Maximum total size of the stored texts; the least recently
+            used texts are evicted beyond it.
+    """
+
+    def __init__(self, max_chars: int = 64 * 1024 * 1024):
+        self.max_chars = max_chars
+        self._texts: "OrderedDict[str, str]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def put(self, text: str) -> str:
+        """
+        Store a text and return its handle.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            str: Handle of the text, the same for identical texts.
+        """
+        handle = "ctx-" + hashlib.sha256(text.encode("utf-8", errors="replace")).hexdigest()[:10]
+        with self._lock:
+            if handle in self._texts:
+                self._texts.move_to_end(handle)
+                return handle
+            self._texts[handle] = text
+            self._size += len(text)
+            while self._size > self.max_chars and len(self._texts) > 1:
+                _, evicted = self._texts.popitem(last=False)
+                self._size -= len(evicted)
+        return handle
+
+    def get(self, handle: str) -> Optional[str]:
+        """Return the text of a handle, or None if it is unknown or was evicted."""
+        with self._lock:
+            text = self._texts.get(handle.strip())
+            if text is not None:
+                self._texts.move_to_end(handle.strip())
+            return text
+
+    def page(self, handle: str, page: int, page_chars: int) -> Tuple[Optional[str], int]:
+        """
+        Return one page of a stored text and the number of pages.
+
+        Args:
+            handle (str): Handle of the text.
+            page (int): Page number, 1-based.
+            page_chars (int): Characters per page.
+
+        Returns:
+            Tuple[Optional[str], int]: The page (None if the handle is unknown) and the page count.
+        """
+        text = self.get(handle)
+        if text is None:
+            return None, 0
+        pages = max(1, -(-len(text) // page_chars))
+        return text[(page - 1) * page_chars : page * page_chars], pages
+
+
+_spill_store = SpillStore()
+
+
+def get_spill_store() -> SpillStore:
+    """Return the process-wide spill store."""
+    return _spill_store
+
+
+class ContextBudget:
+    """
+    Token budgets that keep tool outputs from flooding the agent's memory.
+
+    Every tool output above `observation_tokens` is truncated, summarized by the model,
+    or spilled to the spill store and replaced by its first page and a handle the agent
+    can page through with the `read_context` tool. After every step, when the
+    observations kept in memory exceed `task_tokens`, the oldest ones are compacted.
+
+    Args:
+        observation_tokens (int): Budget of a single tool output.
+        task_tokens (int): Budget of all observations in a task's memory.
+        overflow (str): "truncate", "summarize" or "spill".
+        store (Optional[SpillStore]): Where spilled outputs are kept.
+    """
+
+    def __init__(
+        self,
+        observation_tokens: int = DEFAULT_OBSERVATION_TOKENS,
+        task_tokens: int = DEFAULT_TASK_TOKENS,
+        overflow: str = DEFAULT_OVERFLOW,
+        store: Optional[SpillStore] = None,
+    ):
+        if overflow not in OVERFLOW_MODES:
+            raise ValueError(f"Unknown overflow mode: {overflow}")
+        self.observation_tokens = observation_tokens
+        self.task_tokens = task_tokens
+        self.overflow = overflow
+        self.store = store or get_spill_store()
+        self.summarizer: Optional[Callable[[str, str, int], str]] = None
+
+    @property
+    def page_chars(self) -> int:
+        """Characters of one page of a spilled output."""
+        return self.observation_tokens * CHARS_PER_TOKEN
+
+    def _head(self, text: str, tokens: int) -> str:
+        return text[: tokens * CHARS_PER_TOKEN]
+
+    def compact(self, text: str, tool_name: str, tokens: Optional[int] = None) -> Tuple[str, bool]:
+        """
+        Fit a tool output into a token budget.
+
+        Args:
+            text (str): The output.
+            tool_name (str): Name of the tool that produced it.
+            tokens (Optional[int]): Budget, defaults to `observation_tokens`.
+
+        Returns:
+            Tuple[str, bool]: The output to keep and whether it was compacted.
+        """
+        tokens = tokens or self.observation_tokens
+        size = estimate_tokens(text)
+        if size <= tokens:
+            return text, False
+
+        if self.overflow == "summarize" and self.summarizer is not None:
+            try:
+                summary = self.summarizer(text, tool_name, tokens)
+                return f"[Summary of {size} tokens of {tool_name} output]\n{self._head(summary, tokens)}", True
+            except Exception as e:
+                logger.warning(f"Summarizing {tool_name} output failed, truncating instead: {e}")
+
+        if self.overflow == "truncate":
+            return f"{self._head(text, tokens)}\n[... truncated, {size - tokens} more tokens omitted]", True
+
+        handle = self.store.put(text)
+        pages = -(-len(text) // self.page_chars)
+        # The kept head is the first page, unless compacted below a page
+        next_page = 2 if tokens >= self.observation_tokens else 1
+        return (
+            f"{self._head(text, min(tokens, self.observation_tokens))}\n[... {size} tokens in total, "
+            f"truncated. The full output is stored as '{handle}' ({pages} page(s) of "
+            f"{self.observation_tokens} tokens): call read_context(handle='{handle}', page={next_page}) "
+            "to read on, or pass a pattern to find lines.]"
+        ), True
+
+    def wrap_tool(self, tool: Any) -> Any:
+        """
+        Compact the string outputs of a tool and record the tokens it contributed.
+
+        The tool's `forward` is wrapped in place; wrapping twice has no effect. Token
+        counts are added to the tool's trace span (`tokens`, `kept_tokens`).
+
+        Args:
+            tool (Any): The smolagents tool.
+
+        Returns:
+            Any: The same tool instance.
+        """
+        if getattr(tool, "_budgeted", False):
+            return tool
+        forward = tool.forward
+
+        @functools.wraps(forward)
+        def budgeted_forward(*args, **kwargs):
+            output = forward(*args, **kwargs)
+            if not isinstance(output, str):
+                return output
+            kept, compacted = self.compact(output, tool.name)
+            span = current_span()
+            if span is not None and span.kind == "tool":
+                span.attributes.update(
+                    tokens=estimate_tokens(output),
+                    kept_tokens=estimate_tokens(kept),
+                    compacted=compacted,
+                )
+            return kept
+
+        tool.forward = budgeted_forward
+        tool._budgeted = True
+        return tool
+
+    def enforce_task_budget(self, memory_step: Any, agent: Any = None) -> None:
+        """
+        Step callback compacting the oldest observations once a task exceeds `task_tokens`.
+
+        Compacted observations keep their beginning and, in spill mode, a handle to the
+        full text, so nothing is lost for good.
+        """
+        if agent is None or not isinstance(memory_step, ActionStep):
+            return
+        steps: List[ActionStep] = [
+            step for step in agent.memory.steps if isinstance(step, ActionStep) and step.observations
+        ]
+        total = sum(estimate_tokens(step.observations) for step in steps)
+        for step in steps[:-1]:
+            if total <= self.task_tokens:
+                break
+            before = estimate_tokens(step.observations)
+            if before <= COMPACTED_OBSERVATION_TOKENS * 2:
+                continue
+            step.observations, _ = self.compact(step.observations, "earlier step", COMPACTED_OBSERVATION_TOKENS)
+            total -= before - estimate_tokens(step.observations)
+            logger.info(f"Compacted the observation of step {step.step_number} to stay within the task budget")
+
+    @classmethod
+    def from_env(cls) -> Optional["ContextBudget"]:
+        """Budget configured by the CONTEXT_* environment variables, None if disabled."""
+        if DEFAULT_OBSERVATION_TOKENS <= 0:
+            return None
+        return cls()
@@ -0,0 +1,515 @@
+"""
+Headless evaluation runner: fetch the questions, answer them and submit the answers.
+
+The functions here are shared with the Gradio app. Run from the command line, the
+pending questions are sharded across worker processes, each with its own agent
+registry, so CPU-heavy tools (Whisper, pandas code) are not bound by one interpreter's
+GIL. Answers are checkpointed by every shard as they come in and merged into a single
+submission once every question has one.
+
+Usage:
+    python -m evaluation --shards 4 --username <hf-username>
+    python -m evaluation --shards 4 --no-submit --output results.json
+"""
+
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import sys
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+from answer_memo import MEMO_ENABLED, AnswerMemo, normalize_question
+from registry import AgentRegistry
+from utils.attachments import AttachmentPrefetcher
+from utils.checkpoint import CheckpointStore
+from utils.task_runner import DEFAULT_MAX_WORKERS, iter_task_results
+from utils.tracing import summarize_spans, tracer
+
+DEFAULT_API_URL = os.getenv("SCORING_API_URL", "https://agents-course-unit4-scoring.hf.space")
+MODEL_TYPE = os.getenv("MODEL_TYPE", "OpenAIServerModel")
+MODEL_ID = os.getenv("MODEL_ID", "gpt-4.1")
+
+
+def fetch_questions(api_url: str = DEFAULT_API_URL) -> List[Dict[str, Any]]:
+    """
+    Fetch the questions and keep those with a task id and a question.
+
+    Args:
+        api_url (str): Base URL of the scoring API.
+
+    Returns:
+        List[Dict[str, Any]]: The questions, in the order served.
+
+    Raises:
+        requests.RequestException: If the request fails.
+        ValueError: If the response is not a list of questions.
+    """
+    questions_url = f"{api_url}/questions"
+    print(f"Fetching questions from: {questions_url}")
+    response = requests.get(questions_url, timeout=15)
+    response.raise_for_status()
+    questions_data = response.json()
+    if not questions_data or not isinstance(questions_data, list):
+        raise ValueError("Fetched questions list is empty or invalid format.")
+    print(f"Fetched {len(questions_data)} questions.")
+
+    tasks = []
+    for item in questions_data:
+        if not item.get("task_id") or item.get("question") is None:
+            print(f"Skipping item with missing task_id or question: {item}")
+            continue
+        tasks.append(item)
+    return tasks
+
+
+def iter_questions(
+    registry: AgentRegistry,
+    tasks: List[Dict[str, Any]],
+    checkpoint: CheckpointStore,
+    api_url: str = DEFAULT_API_URL,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    label: str = "",
+    memo: Optional[AnswerMemo] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Answer the questions not checkpointed yet and yield each result as it finishes.
+
+    Answers are checkpointed as they come in.
+
+    With a memo, questions answered before with the same attachment and configuration
+    are answered from it without running the agent, identical questions of this run are
+    answered once, and near-duplicates of memoized questions are flagged.
+
+    Args:
+        registry (AgentRegistry): Registry handing out the per-task agents.
+        tasks (List[Dict[str, Any]]): The questions.
+        checkpoint (CheckpointStore): Checkpoint of the registry's configuration.
+        api_url (str): Base URL of the scoring API, where attachments are downloaded from.
+        max_workers (int): Questions answered concurrently.
+        label (str): Prefix of the progress lines, e.g. the shard.
+        memo (Optional[AnswerMemo]): Memo of the registry's configuration.
+
+    Yields:
+        Dict[str, Any]: Result of a task (see `iter_task_results`), in completion order,
+            with its trace summary under "summary" and how the memo was used under
+            "summary"["memo"].
+    """
+    pending_tasks = [item for item in tasks if item["task_id"] not in checkpoint]
+    if len(pending_tasks) < len(tasks):
+        print(f"{label}Resuming: {len(tasks) - len(pending_tasks)} tasks already answered in {checkpoint.path}")
+
+    # Attachments are downloaded in the background while the first tasks run
+    prefetcher = AttachmentPrefetcher(f"{api_url}/files")
+    prefetcher.prefetch([item["task_id"] for item in pending_tasks])
+
+    # Per-task trace summaries (steps, model and tool calls) shown in the results table
+    trace_summaries = {}
+
+    def run_agent(item: dict, file_path: Optional[str]) -> str:
+        agent = registry.new_agent()
+        with tracer.collect() as spans:
+            try:
+                return agent(item["question"], file_path)
+            finally:
+                trace_summaries[item["task_id"]] = summarize_spans(spans)
+
+    def solve_task(item: dict) -> str:
+        file_path = prefetcher.get(item["task_id"])
+        if memo is None:
+            return run_agent(item, file_path)
+        task_id = item["task_id"]
+        key = memo.key(item["question"], file_path)
+        # A duplicate of a question in flight waits for its answer instead of running again
+        with memo.lock(key):
+            answer = memo.get(key)
+            if answer is not None:
+                trace_summaries[task_id] = {**summarize_spans([]), "memo": "hit"}
+                return answer
+            duplicate = memo.near_duplicate(item["question"], key)
+            answer = run_agent(item, file_path)
+            summary = trace_summaries[task_id]
+            memo.record(key, item["question"], answer, task_id, confirmed=summary["budget"] is None)
+        if duplicate is not None:
+            summary["memo"] = f"near-duplicate of {duplicate[0]} ({duplicate[1]:.2f})"
+            print(f"{label}Task {task_id} is a near-duplicate of task {duplicate[0]} ({duplicate[1]:.2f})")
+        return answer
+
+    def report_progress(result: dict, done: int, total: int) -> None:
+        task_id = result["task"]["task_id"]
+        if result["status"] == "ok":
+            checkpoint.record(task_id, result["result"], duration=result["duration"])
+        print(
+            f"{label}[{done}/{total}] Task {task_id} finished with status "
+            f"'{result['status']}' in {result['duration']:.1f}s"
+        )
+
+    print(f"{label}Running agent on {len(pending_tasks)} questions with {max_workers} workers...")
+    try:
+        for result in iter_task_results(
+            pending_tasks, solve_task, max_workers=max_workers, on_progress=report_progress
+        ):
+            result["summary"] = trace_summaries.get(result["task"]["task_id"])
+            yield result
+    finally:
+        prefetcher.close()
+    if hasattr(registry.model, "report"):
+        print(f"{label}Model routes: {registry.model.report()}")
+    print(f"{label}Task budgets: {registry.template.run_budget.report()}")
+    if memo is not None:
+        print(f"{label}Answer memo: {memo.report()}")
+
+
+def run_questions(
+    registry: AgentRegistry,
+    tasks: List[Dict[str, Any]],
+    checkpoint: CheckpointStore,
+    api_url: str = DEFAULT_API_URL,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    label: str = "",
+    memo: Optional[AnswerMemo] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+    """
+    Answer the questions not checkpointed yet, see `iter_questions`.
+
+    Returns:
+        Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]]]: The task results in the
+            order of `tasks` and the trace summary of every task, by task id.
+    """
+    results = sorted(
+        iter_questions(registry, tasks, checkpoint, api_url, max_workers, label, memo),
+        key=lambda result: result["index"],
+    )
+    trace_summaries = {result["task"]["task_id"]: result["summary"] for result in results if result["summary"]}
+    return results, trace_summaries
+
+
+def result_row(
+    item: Dict[str, Any],
+    submitted_answer: Optional[str],
+    status: str,
+    duration: Optional[float] = None,
+    summary: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Row of the results table for one question.
+
+    Args:
+        item (Dict[str, Any]): The question.
+        submitted_answer (Optional[str]): Its answer, or the error.
+        status (str): "ok", "error" or "timeout" when run now, "checkpoint" when
+            answered by an earlier run, "pending" while waiting to run.
+        duration (Optional[float]): Seconds spent answering it.
+        summary (Optional[Dict[str, Any]]): Its trace summary, see `summarize_spans`.
+
+    Returns:
+        Dict[str, Any]: The row.
+    """
+    return {
+        "Task ID": item["task_id"],
+        "Question": item["question"],
+        "Status": status,
+        "Submitted Answer": submitted_answer,
+        "Duration (s)": round(duration, 1) if duration is not None else None,
+        "Steps": summary["steps"] if summary else None,
+        "LLM Calls": summary["llm_calls"] if summary else None,
+        "Tokens": summary["input_tokens"] + summary["output_tokens"] if summary else None,
+        "Tool Calls": sum(summary["tool_calls"].values()) if summary else None,
+        "Tool Tokens": sum(summary["tool_tokens"].values()) if summary else None,
+        "Slowest Tool": summary["slowest_tool"] if summary else None,
+        "Route": " > ".join(summary["routes"] or []) if summary else None,
+        "Budget Hit": summary["budget"] if summary else None,
+        "Memo": summary.get("memo") if summary else None,
+    }
+
+
+def collect_results(
+    tasks: List[Dict[str, Any]],
+    checkpoint: CheckpointStore,
+    results: List[Dict[str, Any]],
+    trace_summaries: Dict[str, Dict[str, Any]],
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, str]]]:
+    """
+    Build the results table and the answers to submit.
+
+    Args:
+        tasks (List[Dict[str, Any]]): Every question.
+        checkpoint (CheckpointStore): Checkpoint holding the answers.
+        results (List[Dict[str, Any]]): Results of the questions answered in this run.
+        trace_summaries (Dict[str, Dict[str, Any]]): Trace summaries of those questions.
+
+    Returns:
+        Tuple[List[Dict[str, Any]], List[Dict[str, str]]]: One row per question, and the
+            answers of the questions that have one.
+    """
+    errors = {result["task"]["task_id"]: result["error"] for result in results if result["status"] != "ok"}
+    durations = {result["task"]["task_id"]: result["duration"] for result in results if "duration" in result}
+    statuses = {result["task"]["task_id"]: result["status"] for result in results}
+
+    results_log = []
+    answers_payload = []
+    for item in tasks:
+        task_id = item["task_id"]
+        submitted_answer = checkpoint.get(task_id)
+        if submitted_answer is not None:
+            answers_payload.append({"task_id": task_id, "submitted_answer": submitted_answer})
+        status = statuses.get(task_id, "checkpoint" if submitted_answer is not None else "error")
+        if submitted_answer is None:
+            print(f"Error running agent on task {task_id}: {errors.get(task_id)}")
+            submitted_answer = f"AGENT ERROR: {errors.get(task_id)}"
+        results_log.append(
+            result_row(item, submitted_answer, status, durations.get(task_id), trace_summaries.get(task_id))
+        )
+    return results_log, answers_payload
+
+
+def submit_answers(
+    username: str, agent_code: str, answers_payload: List[Dict[str, str]], api_url: str = DEFAULT_API_URL
+) -> str:
+    """
+    Submit the answers and describe the outcome.
+
+    Args:
+        username (str): Hugging Face username the answers are submitted for.
+        agent_code (str): URL of the agent's code.
+        answers_payload (List[Dict[str, str]]): The answers.
+        api_url (str): Base URL of the scoring API.
+
+    Returns:
+        str: The score on success, the reason of the failure otherwise.
+    """
+    submit_url = f"{api_url}/submit"
+    submission_data = {
+        "username": username.strip(),
+        "agent_code": agent_code,
+        "answers": answers_payload,
+    }
+    print(f"Agent finished. Submitting {len(answers_payload)} answers for user '{username}'...")
+    print(f"Submitting {len(answers_payload)} answers to: {submit_url}")
+    try:
+        response = requests.post(submit_url, json=submission_data, timeout=60)
+        response.raise_for_status()
+        result_data = response.json()
+        final_status = (
+            f"Submission Successful!\n"
+            f"User: {result_data.get('username')}\n"
+            f"Overall Score: {result_data.get('score', 'N/A')}% "
+            f"({result_data.get('correct_count', '?')}/{result_data.get('total_attempted', '?')} correct)\n"
+            f"Message: {result_data.get('message', 'No message received.')}"
+        )
+        print("Submission successful.")
+        return final_status
+    except requests.exceptions.HTTPError as e:
+        error_detail = f"Server responded with status {e.response.status_code}."
+        try:
+            error_json = e.response.json()
+            error_detail += f" Detail: {error_json.get('detail', e.response.text)}"
+        except requests.exceptions.JSONDecodeError:
+            error_detail += f" Response: {e.response.text[:500]}"
+        status_message = f"Submission Failed: {error_detail}"
+    except requests.exceptions.Timeout:
+        status_message = "Submission Failed: The request timed out."
+    except requests.exceptions.RequestException as e:
+        status_message = f"Submission Failed: Network error - {e}"
+    except Exception as e:
+        status_message = f"An unexpected error occurred during submission: {e}"
+    print(status_message)
+    return status_message
+
+
+def run_shard(
+    index: int,
+    tasks: List[Dict[str, Any]],
+    api_url: str,
+    model_type: str,
+    model_id: str,
+    max_workers: int,
+    use_memo: bool = MEMO_ENABLED,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+    """
+    Answer a shard of the questions in this process, with its own agent registry.
+
+    Args:
+        index (int): Number of the shard, for the progress lines.
+        tasks (List[Dict[str, Any]]): The questions of the shard.
+        api_url (str): Base URL of the scoring API.
+        model_type (str): Model backend of the registry.
+        model_id (str): Model identifier of the registry.
+        max_workers (int): Questions answered concurrently in the shard.
+        use_memo (bool): Answer from the shared answer memo.
+
+    Returns:
+        Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]]]: See `run_questions`.
+    """
+    registry = AgentRegistry(model_type, model_id)
+    registry.warm_up()
+    checkpoint = CheckpointStore(registry.fingerprint())
+    memo = AnswerMemo(checkpoint.fingerprint) if use_memo else None
+    return run_questions(registry, tasks, checkpoint, api_url, max_workers, label=f"[shard {index}] ", memo=memo)
+
+
+def deal_shards(tasks: List[Dict[str, Any]], shards: int) -> List[List[Dict[str, Any]]]:
+    """
+    Deal questions round-robin to shards, identical questions to the same shard.
+
+    Identical questions (same normalized text and attachment name) then run once, the
+    others being answered from the memo of their shard.
+
+    Args:
+        tasks (List[Dict[str, Any]]): The questions.
+        shards (int): Number of shards.
+
+    Returns:
+        List[List[Dict[str, Any]]]: The questions of each shard.
+    """
+    groups: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    for item in tasks:
+        groups.setdefault((normalize_question(item["question"]), item.get("file_name") or ""), []).append(item)
+    dealt: List[List[Dict[str, Any]]] = [[] for _ in range(shards)]
+    for index, group in enumerate(groups.values()):
+        dealt[index % shards].extend(group)
+    return dealt
+
+
+def evaluate(
+    shards: int,
+    api_url: str = DEFAULT_API_URL,
+    model_type: str = MODEL_TYPE,
+    model_id: str = MODEL_ID,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    use_memo: bool = MEMO_ENABLED,
+    invalidate_memo: bool = False,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, str]], List[Dict[str, Any]]]:
+    """
+    Answer every question not checkpointed yet, sharded across worker processes.
+
+    Pending questions are dealt to `shards` processes started with "spawn" (see
+    `deal_shards`), so no shard inherits threads or connections of this one. A shard
+    that fails leaves its remaining questions unanswered, to be retried by the next run.
+
+    Args:
+        shards (int): Worker processes; 1 answers in this process.
+        api_url (str): Base URL of the scoring API.
+        model_type (str): Model backend of the agents.
+        model_id (str): Model identifier of the agents.
+        max_workers (int): Questions answered concurrently by each shard.
+        use_memo (bool): Answer from the answer memo.
+        invalidate_memo (bool): First delete the memoized answers of other configurations.
+
+    Returns:
+        Tuple[List[Dict[str, Any]], List[Dict[str, str]], List[Dict[str, Any]]]: The
+            results table, the answers and every question.
+    """
+    tasks = fetch_questions(api_url)
+    registry = AgentRegistry(model_type, model_id)
+    checkpoint = CheckpointStore(registry.fingerprint())
+    memo = AnswerMemo(checkpoint.fingerprint) if use_memo or invalidate_memo else None
+    if invalidate_memo:
+        memo.invalidate()
+    pending_tasks = [item for item in tasks if item["task_id"] not in checkpoint]
+    if len(pending_tasks) < len(tasks):
+        print(f"Resuming: {len(tasks) - len(pending_tasks)} tasks already answered in {checkpoint.path}")
+
+    shards = max(1, min(shards, len(pending_tasks)))
+    results: List[Dict[str, Any]] = []
+    trace_summaries: Dict[str, Dict[str, Any]] = {}
+    if shards == 1:
+        if pending_tasks:
+            registry.warm_up()
+            results, trace_summaries = run_questions(
+                registry, pending_tasks, checkpoint, api_url, max_workers, memo=memo if use_memo else None
+            )
+    else:
+        print(f"Running {len(pending_tasks)} questions in {shards} shards of {max_workers} workers each...")
+        dealt = deal_shards(pending_tasks, shards)
+        context = multiprocessing.get_context("spawn")
+        with concurrent.futures.ProcessPoolExecutor(max_workers=shards, mp_context=context) as pool:
+            futures = {
+                pool.submit(
+                    run_shard, index, dealt[index], api_url, model_type, model_id, max_workers, use_memo
+                ): index
+                for index in range(shards)
+            }
+            for future in concurrent.futures.as_completed(futures):
+                index = futures[future]
+                try:
+                    shard_results, shard_summaries = future.result()
+                except Exception as e:
+                    print(f"Shard {index} failed: {e}")
+                    results.extend(
+                        {"task": item, "status": "error", "result": None, "error": f"Shard {index} failed: {e}"}
+                        for item in dealt[index]
+                    )
+                    continue
+                results.extend(shard_results)
+                trace_summaries.update(shard_summaries)
+        # The shards checkpointed their answers in the shared file
+        checkpoint = CheckpointStore(checkpoint.fingerprint, checkpoint.path)
+
+    results_log, answers_payload = collect_results(tasks, checkpoint, results, trace_summaries)
+    return results_log, answers_payload, tasks
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point, see `python -m evaluation --help`."""
+    parser = argparse.ArgumentParser(description="Run the agent on every question and submit the answers.")
+    parser.add_argument("--shards", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS, help="Questions run at once per shard")
+    parser.add_argument("--api-url", default=DEFAULT_API_URL, help="Base URL of the scoring API")
+    parser.add_argument("--model-type", default=MODEL_TYPE, help="Model backend")
+    parser.add_argument("--model-id", default=MODEL_ID, help="Model identifier, or routes file of a RoutingModel")
+    parser.add_argument("--username", default=os.getenv("HF_USERNAME"), help="Hugging Face username to submit as")
+    parser.add_argument(
+        "--agent-code",
+        default=f"https://huggingface.co/spaces/{os.getenv('SPACE_ID')}/tree/main",
+        help="URL of the agent's code sent with the submission",
+    )
+    parser.add_argument("--no-submit", action="store_true", help="Answer the questions without submitting")
+    parser.add_argument("--output", help="Write the results table and answers to this JSON file")
+    parser.add_argument("--no-memo", action="store_true", help="Run the agent even on memoized questions")
+    parser.add_argument(
+        "--invalidate-memo",
+        action="store_true",
+        help="Delete memoized answers of other model/prompt configurations before running",
+    )
+    args = parser.parse_args(argv)
+
+    if not args.no_submit and not args.username:
+        parser.error("--username (or HF_USERNAME) is required to submit; pass --no-submit to only answer")
+
+    try:
+        results_log, answers_payload, tasks = evaluate(
+            args.shards,
+            args.api_url,
+            args.model_type,
+            args.model_id,
+            args.workers,
+            use_memo=MEMO_ENABLED and not args.no_memo,
+            invalidate_memo=args.invalidate_memo,
+        )
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"Error fetching questions: {e}")
+        return 1
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({"results": results_log, "answers": answers_payload}, file, indent=2, default=str)
+
+    if len(answers_payload) < len(tasks):
+        print(
+            f"Answered {len(answers_payload)} of {len(tasks)} questions, nothing was submitted. "
+            f"Run again to retry the remaining questions."
+        )
+        return 1
+    if args.no_submit:
+        print(f"Answered all {len(tasks)} questions, not submitted.")
+        return 0
+    status_message = submit_answers(args.username, args.agent_code, answers_payload, args.api_url)
+    return 0 if status_message.startswith("Submission Successful") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,27 @@
+import functools
 import os
-from typing import Any, Callable
+from typing import TYPE_CHECKING, Any, Callable
 
-from smolagents import HfApiModel, InferenceClientModel, LiteLLMModel, OpenAIServerModel
+# Backends are imported when first requested, so importing this module stays cheap
+if TYPE_CHECKING:
+    from smolagents import HfApiModel, InferenceClientModel, LiteLLMModel, OpenAIServerModel
 
+    from routing import RoutingModel
 
-def get_huggingface_api_model(model_id: str, **kwargs) -> HfApiModel:
+DEFAULT_CACHE_MODE = os.getenv("MODEL_CACHE_MODE", "off")
+DEFAULT_CACHE_PATH = os.getenv("MODEL_CACHE_PATH", os.path.join(".cache", "model_cache.jsonl"))
+# Requests go through the shared transport (rate limits, retries, hedging) unless set to "0"
+DEFAULT_TRANSPORT = os.getenv("MODEL_TRANSPORT", "1") != "0"
+
+# Environment variable holding the API key of each backend, used to share rate limits
+API_KEY_ENV = {
+    "HfApiModel": "HUGGINGFACEHUB_API_TOKEN",
+    "InferenceClientModel": "HUGGINGFACEHUB_API_TOKEN",
+    "OpenAIServerModel": "OPENAI_API_KEY",
+}
+
+
+def get_huggingface_api_model(model_id: str, **kwargs) -> "HfApiModel":
     """
     Returns a Hugging Face API model instance.
 
@@ -15,6 +32,8 @@ def get_huggingface_api_model(model_id: str, **kwargs) -> HfApiModel:
     Returns:
         HfApiModel: Hugging Face API model instance.
     """
+    from smolagents import HfApiModel
+
     api_key = os.getenv("HUGGINGFACEHUB_API_TOKEN")
     if not api_key:
         raise ValueError("HUGGINGFACEHUB_API_TOKEN is not set")
@@ -22,7 +41,7 @@ def get_huggingface_api_model(model_id: str, **kwargs) -> HfApiModel:
     return HfApiModel(model_id=model_id, token=api_key, **kwargs)
 
 
-def get_inference_client_model(model_id: str, **kwargs) -> InferenceClientModel:
+def get_inference_client_model(model_id: str, **kwargs) -> "InferenceClientModel":
     """
     Returns an Inference Client model instance.
 
@@ -33,6 +52,8 @@ def get_inference_client_model(model_id: str, **kwargs) -> InferenceClientModel:
     Returns:
         InferenceClientModel: Inference client model instance.
     """
+    from smolagents import InferenceClientModel
+
     api_key = os.getenv("HUGGINGFACEHUB_API_TOKEN")
     if not api_key:
         raise ValueError("HUGGINGFACEHUB_API_TOKEN is not set")
@@ -40,17 +61,23 @@ def get_inference_client_model(model_id: str, **kwargs) -> InferenceClientModel:
     return InferenceClientModel(model_id=model_id, token=api_key, **kwargs)
 
 
-def get_openai_server_model(model_id: str, **kwargs) -> OpenAIServerModel:
+def get_openai_server_model(model_id: str, transport: bool = DEFAULT_TRANSPORT, **kwargs) -> "OpenAIServerModel":
     """
     Returns an OpenAI server model instance.
 
     Args:
         model_id (str): The model identifier.
+        transport (bool): Whether requests go through the shared transport, which
+            retries them; the client's own retries are disabled only then.
         **kwargs: Additional keyword arguments for the model.
 
     Returns:
         OpenAIServerModel: OpenAI server model instance.
     """
+    from smolagents import OpenAIServerModel
+
+    from utils.transport import get_http_client
+
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise ValueError("OPENAI_API_KEY is not set")
@@ -59,12 +86,17 @@ def get_openai_server_model(model_id: str, **kwargs) -> OpenAIServerModel:
     if not api_base:
         raise ValueError("OPENAI_API_BASE is not set")
 
+    # Pooled keep-alive connections; retries are left to the shared transport if there is one
+    client_kwargs = {"http_client": get_http_client()}
+    if transport:
+        client_kwargs["max_retries"] = 0
+    kwargs.setdefault("client_kwargs", client_kwargs)
     return OpenAIServerModel(
         model_id=model_id, api_key=api_key, api_base=api_base, **kwargs
     )
 
 
-def get_lite_llm_model(model_id: str, **kwargs) -> LiteLLMModel:
+def get_lite_llm_model(model_id: str, **kwargs) -> "LiteLLMModel":
     """
     Returns a LiteLLM model instance.
 
@@ -75,16 +107,60 @@ def get_lite_llm_model(model_id: str, **kwargs) -> LiteLLMModel:
     Returns:
         LiteLLMModel: LiteLLM model instance.
     """
+    from smolagents import LiteLLMModel
+
     return LiteLLMModel(model_id=model_id, **kwargs)
 
 
-def get_model(model_type: str, model_id: str, **kwargs) -> Any:
+def get_routing_model(config_path: str, **kwargs) -> "RoutingModel":
+    """
+    Returns a routing model built from a routing configuration file.
+
+    Every route backend is created with `get_model`, so it gets its own cache and the
+    transport of its API key.
+
+    Args:
+        config_path (str): Path of the routing configuration (see `routing.load_routing_config`).
+        **kwargs: Additional keyword arguments for `get_model`, applied to every route.
+
+    Returns:
+        RoutingModel: The routing model.
+    """
+    from routing import RoutingModel, load_routing_config
+
+    config = load_routing_config(config_path)
+    routes = {
+        route["name"]: get_model(
+            route["model_type"], route["model_id"], **{**kwargs, **route.get("kwargs", {})}
+        )
+        for route in config["routes"]
+    }
+    return RoutingModel(routes, config)
+
+
+def get_model(
+    model_type: str,
+    model_id: str,
+    cache_mode: str = DEFAULT_CACHE_MODE,
+    cache_path: str = DEFAULT_CACHE_PATH,
+    transport: bool = DEFAULT_TRANSPORT,
+    **kwargs,
+) -> Any:
     """
     Returns a model instance based on the specified type.
 
+    Unless `cache_mode` is "off", the model is wrapped in a `CachingModel` that records
+    responses to `cache_path`. In "replay" mode no backend is created at all. Backend
+    requests go through the transport shared by everything using the same API key,
+    which adds rate limiting, retries with backoff and hedged requests.
+
     Args:
-        model_type (str): The type of the model (e.g., 'HfApiModel').
-        model_id (str): The model identifier.
+        model_type (str): The type of the model (e.g., 'HfApiModel'), or 'RoutingModel'.
+        model_id (str): The model identifier, or the routing configuration file of a
+            'RoutingModel'.
+        cache_mode (str): "off", "record", "replay" or "fallthrough". Defaults to MODEL_CACHE_MODE.
+        cache_path (str): JSONL file with recorded responses. Defaults to MODEL_CACHE_PATH.
+        transport (bool): Wrap the backend in a `TransportModel`. Defaults to MODEL_TRANSPORT.
         **kwargs: Additional keyword arguments for the model.
 
     Returns:
@@ -93,11 +169,34 @@ def get_model(model_type: str, model_id: str, **kwargs) -> Any:
     models: dict[str, Callable[..., Any]] = {
         "HfApiModel": get_huggingface_api_model,
         "InferenceClientModel": get_inference_client_model,
-        "OpenAIServerModel": get_openai_server_model,
+        "OpenAIServerModel": functools.partial(get_openai_server_model, transport=transport),
         "LiteLLMModel": get_lite_llm_model,
     }
 
+    if model_type == "RoutingModel":
+        return get_routing_model(
+            model_id, cache_mode=cache_mode, cache_path=cache_path, transport=transport, **kwargs
+        )
+
     if model_type not in models:
         raise ValueError(f"Unknown model type: {model_type}")
 
-    return models[model_type](model_id, **kwargs)
+    if cache_mode == "replay":
+        from model_cache import CachingModel
+
+        return CachingModel(None, cache_path, mode="replay", model_id=model_id, params=kwargs)
+
+    backend = models[model_type](model_id, **kwargs)
+    if transport:
+        from model_transport import TransportModel
+        from utils.transport import get_transport
+
+        backend = TransportModel(backend, get_transport(os.getenv(API_KEY_ENV.get(model_type, ""))))
+
+    if cache_mode == "off":
+        return backend
+
+    from model_cache import CachingModel
+
+    # Cache hits are served before the transport, so they do not count against rate limits
+    return CachingModel(backend, cache_path, mode=cache_mode)
@@ -0,0 +1,165 @@
+import dataclasses
+import enum
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from smolagents import ChatMessage, Model
+
+from utils.logger import get_logger
+from utils.tracing import message_tokens
+
+logger = get_logger(__name__)
+
+CACHE_MODES = ("record", "replay", "fallthrough")
+
+
+class ReplayMissError(KeyError):
+    """Raised in replay mode when a request has no recorded response."""
+
+
+def _to_jsonable(value: Any) -> Any:
+    """JSON fallback for the objects found in smolagents messages and tools."""
+    if isinstance(value, enum.Enum):
+        return value.value
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    if hasattr(value, "tobytes"):
+        # PIL images and numpy arrays are keyed by content
+        return {"sha256": hashlib.sha256(value.tobytes()).hexdigest()}
+    if hasattr(value, "name") and hasattr(value, "inputs"):
+        # smolagents tools are keyed by their public interface
+        return {"name": value.name, "description": value.description, "inputs": value.inputs}
+    return str(value)
+
+
+def make_request_key(model_id: Optional[str], **request: Any) -> str:
+    """
+    Build a stable key for a model request.
+
+    Args:
+        model_id (Optional[str]): The model identifier.
+        **request: Messages, stop sequences, tools and generation parameters.
+
+    Returns:
+        str: Hex digest identifying the request.
+    """
+    payload = json.dumps({"model_id": model_id, **request}, sort_keys=True, default=_to_jsonable)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CachingModel(Model):
+    """
+    Model wrapper that records responses to a JSONL fixture file and serves them back.
+
+    Modes:
+        - "record": always call the backend and (over)write the recorded response.
+        - "replay": only serve recorded responses, raise `ReplayMissError` otherwise.
+          No backend is needed, so whole agent runs can be replayed offline.
+        - "fallthrough": serve recorded responses, call and record the backend on a miss.
+
+    Args:
+        model (Optional[Model]): The backend model. May be None in replay mode.
+        path (str): Path of the JSONL fixture file.
+        mode (str): One of "record", "replay" or "fallthrough".
+        model_id (Optional[str]): Model identifier, defaults to the backend's.
+        params (Optional[Dict[str, Any]]): Default generation parameters, defaults to the
+            backend's. Needed in replay mode to match requests recorded with a backend.
+    """
+
+    def __init__(
+        self,
+        model: Optional[Model],
+        path: str,
+        mode: str = "fallthrough",
+        model_id: Optional[str] = None,
+        params: Optional[Dict[str, Any]] = None,
+    ):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode: {mode}")
+        if model is None and mode != "replay":
+            raise ValueError(f"A backend model is required in '{mode}' mode")
+        super().__init__(model_id=model_id or getattr(model, "model_id", None))
+        self.model = model
+        self.params = params if params is not None else dict(getattr(model, "kwargs", {}))
+        self.path = path
+        self.mode = mode
+        self.stats = {"hits": 0, "misses": 0, "tokens_saved": 0}
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    record = json.loads(line)
+                    self._records[record["key"]] = record
+        logger.info(f"Loaded {len(self._records)} recorded model responses from {self.path}")
+
+    def _save(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self._records[record["key"]] = record
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(record, default=_to_jsonable) + "\n")
+
+    def generate(
+        self,
+        messages: List[Dict[str, Any]],
+        stop_sequences: Optional[List[str]] = None,
+        grammar: Optional[str] = None,
+        tools_to_call_from: Optional[List[Any]] = None,
+        **kwargs,
+    ) -> ChatMessage:
+        key = make_request_key(
+            self.model_id,
+            messages=messages,
+            stop_sequences=stop_sequences,
+            grammar=grammar,
+            tools=tools_to_call_from,
+            params={**self.params, **kwargs},
+        )
+        record = self._records.get(key) if self.mode != "record" else None
+        if record is not None:
+            self.stats["hits"] += 1
+            self.stats["tokens_saved"] += record["input_tokens"] + record["output_tokens"]
+            self.last_input_token_count = 0
+            self.last_output_token_count = 0
+            # Replayed responses cost no tokens
+            return ChatMessage.from_dict(
+                dict(record["message"]), raw={"usage": {"prompt_tokens": 0, "completion_tokens": 0}}
+            )
+
+        self.stats["misses"] += 1
+        if self.mode == "replay":
+            raise ReplayMissError(f"No recorded response for request {key[:12]} in {self.path}")
+
+        message = self.model.generate(
+            messages,
+            stop_sequences=stop_sequences,
+            grammar=grammar,
+            tools_to_call_from=tools_to_call_from,
+            **kwargs,
+        )
+        input_tokens, output_tokens = message_tokens(message, self.model)
+        self.last_input_token_count = input_tokens or 0
+        self.last_output_token_count = output_tokens or 0
+        self._save(
+            {
+                "key": key,
+                "model_id": self.model_id,
+                "message": {
+                    "role": message.role,
+                    "content": message.content,
+                    "tool_calls": message.tool_calls,
+                },
+                "input_tokens": self.last_input_token_count,
+                "output_tokens": self.last_output_token_count,
+            }
+        )
+        return message
@@ -0,0 +1,74 @@
+import asyncio
+import copy
+from typing import Any, Dict, List, Optional, Tuple
+
+from smolagents import ChatMessage, Model
+
+from utils.tracing import message_tokens
+from utils.transport import Transport
+
+
+class TransportModel(Model):
+    """
+    Model wrapper that sends every request of a backend through a shared `Transport`,
+    adding rate limiting, retries with backoff and hedged requests to any backend.
+
+    Every attempt runs on a shallow copy of the backend, sharing its API client but not
+    its token counts, so a hedged request losing the race or a concurrent call cannot
+    overwrite the usage of the call that returned.
+
+    Args:
+        model (Model): The backend model.
+        transport (Transport): Transport shared by everything using the same API key.
+    """
+
+    def __init__(self, model: Model, transport: Transport):
+        super().__init__(model_id=getattr(model, "model_id", None))
+        self.model = model
+        self.transport = transport
+        self.kwargs = dict(getattr(model, "kwargs", {}))
+
+    def generate(
+        self,
+        messages: List[Dict[str, Any]],
+        stop_sequences: Optional[List[str]] = None,
+        grammar: Optional[str] = None,
+        tools_to_call_from: Optional[List[Any]] = None,
+        **kwargs,
+    ) -> ChatMessage:
+        message, backend = self.transport.call(
+            self._attempt,
+            messages,
+            stop_sequences=stop_sequences,
+            grammar=grammar,
+            tools_to_call_from=tools_to_call_from,
+            **kwargs,
+        )
+        self.last_input_token_count, self.last_output_token_count = message_tokens(message, backend)
+        return message
+
+    def _attempt(self, messages: List[Dict[str, Any]], **kwargs) -> Tuple[ChatMessage, Model]:
+        """One request on a copy of the backend, returned with the copy holding its token counts."""
+        backend = copy.copy(self.model)
+        return backend.generate(messages, **kwargs), backend
+
+    async def agenerate(
+        self,
+        messages: List[Dict[str, Any]],
+        stop_sequences: Optional[List[str]] = None,
+        grammar: Optional[str] = None,
+        tools_to_call_from: Optional[List[Any]] = None,
+        **kwargs,
+    ) -> ChatMessage:
+        """
+        Async version of `generate`, so many concurrent runs can share one backend from
+        an event loop; the blocking backend call runs in the default executor.
+        """
+        return await asyncio.to_thread(
+            self.generate,
+            messages,
+            stop_sequences=stop_sequences,
+            grammar=grammar,
+            tools_to_call_from=tools_to_call_from,
+            **kwargs,
+        )
@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Any, List, Optional
+
+from utils.checkpoint import config_fingerprint
+from utils.logger import get_logger
+
+if TYPE_CHECKING:
+    from smolagents import Tool
+
+    from agent import Agent
+
+logger = get_logger(__name__)
+
+
+class AgentRegistry:
+    """
+    Long-lived holder of the model, tools and template agent shared by every run.
+
+    Everything is built once, either eagerly with `warm_up` at process start or lazily on
+    first use, and `new_agent` hands out cheap per-task clones of the template agent.
+    The agent, model and tools modules (and smolagents with them) are only imported
+    when first needed, so creating a registry is free.
+
+    Args:
+        model_type (str): The type of the model (e.g., 'OpenAIServerModel').
+        model_id (str): The model identifier.
+        **model_kwargs: Additional keyword arguments for `get_model`.
+    """
+
+    def __init__(self, model_type: str, model_id: str, **model_kwargs):
+        self.model_type = model_type
+        self.model_id = model_id
+        self.model_kwargs = model_kwargs
+        self._model: Optional[Any] = None
+        self._tools: Optional[List["Tool"]] = None
+        self._template: Optional["Agent"] = None
+        self._lock = threading.RLock()
+
+    @property
+    def model(self) -> Any:
+        """The shared model backend."""
+        with self._lock:
+            if self._model is None:
+                from model import get_model
+
+                self._model = get_model(self.model_type, self.model_id, **self.model_kwargs)
+            return self._model
+
+    @property
+    def tools(self) -> List["Tool"]:
+        """The shared tool instances."""
+        with self._lock:
+            if self._tools is None:
+                from tools.tools import get_tools
+
+                self._tools = get_tools()
+            return self._tools
+
+    @property
+    def template(self) -> "Agent":
+        """The template agent every per-task agent is cloned from."""
+        with self._lock:
+            if self._template is None:
+                from agent import Agent
+
+                self._template = Agent(model=self.model, tools=self.tools)
+            return self._template
+
+    def fingerprint(self) -> str:
+        """
+        Return a fingerprint of the agent configuration (model, routing, prompt and Wikipedia snapshot).
+
+        Returns:
+            str: Hex digest identifying the configuration.
+        """
+        from agent import DEFAULT_PROMPT
+        from tools.wikipedia_snapshot import SNAPSHOT_PATH
+
+        config = {"model_type": self.model_type, "model_id": self.model_id, "prompt": DEFAULT_PROMPT}
+        if SNAPSHOT_PATH:
+            config["wikipedia_snapshot"] = os.path.abspath(SNAPSHOT_PATH)
+        if self.model_type == "RoutingModel":
+            from routing import load_routing_config
+
+            config["routing"] = load_routing_config(self.model_id)
+        return config_fingerprint(**config)
+
+    def new_agent(self) -> "Agent":
+        """
+        Return a fresh agent for a single task.
+
+        Returns:
+            Agent: A clone of the template agent with its own memory and executor.
+        """
+        return self.template.clone()
+
+    def warm_up(self) -> None:
+        """Build the model, tools and template agent ahead of the first request."""
+        start = time.perf_counter()
+        self.template
+        logger.info(f"Agent registry warmed up in {time.perf_counter() - start:.2f}s")
+
+    def warm_up_in_background(self) -> threading.Thread:
+        """
+        Run `warm_up` in a daemon thread, logging instead of raising on failure.
+
+        Returns:
+            threading.Thread: The started thread.
+        """
+
+        def target() -> None:
+            try:
+                self.warm_up()
+            except Exception as e:
+                logger.error(f"Agent registry warm up failed: {e}")
+
+        thread = threading.Thread(target=target, name="agent-warm-up", daemon=True)
+        thread.start()
+        return thread
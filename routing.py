@@ -0,0 +1,230 @@
+import contextvars
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from smolagents import ChatMessage, Model
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_active_route: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("active_route", default=None)
+
+# Answers that mean the agent gave up rather than answered
+LOW_CONFIDENCE_PATTERN = re.compile(
+    r"^\s*$|\b(unknown|not sure|i don't know|i do not know|cannot (be )?determined?|unable to|"
+    r"no information|not available|n/a)\b",
+    re.IGNORECASE,
+)
+
+DEFAULT_ESCALATE_ON = {"error": True, "max_steps": True, "low_confidence": True}
+
+
+def load_routing_config(path: str) -> Dict[str, Any]:
+    """
+    Load a routing configuration file.
+
+    The file lists the routes from cheapest to strongest, the rules choosing the first
+    route of a task and when to escalate to the next one, e.g.:
+
+        {
+            "routes": [
+                {"name": "fast", "model_type": "OpenAIServerModel", "model_id": "gpt-4.1-mini", "max_steps": 6},
+                {"name": "strong", "model_type": "OpenAIServerModel", "model_id": "gpt-4.1"}
+            ],
+            "rules": [
+                {"route": "strong", "file_extensions": [".mp3", ".png"]},
+                {"route": "strong", "keywords": ["youtube.com", "chess"]},
+                {"route": "strong", "min_question_chars": 400}
+            ],
+            "default": "fast",
+            "escalate_on": {"error": true, "max_steps": true, "low_confidence": true}
+        }
+
+    Args:
+        path (str): Path of the JSON file.
+
+    Returns:
+        Dict[str, Any]: The configuration.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        config = json.load(file)
+    names = [route["name"] for route in config.get("routes", [])]
+    if not names:
+        raise ValueError(f"No routes defined in {path}")
+    for rule in config.get("rules", []):
+        if rule.get("route") not in names:
+            raise ValueError(f"Rule {rule} refers to an unknown route")
+    if config.get("default", names[0]) not in names:
+        raise ValueError(f"Unknown default route: {config['default']}")
+    return config
+
+
+def rule_matches(rule: Dict[str, Any], question: str, file_path: Optional[str]) -> bool:
+    """
+    Tell whether a routing rule applies to a task; every condition of the rule must hold.
+
+    Supported conditions: `keywords` (any of them in the question, case-insensitive),
+    `pattern` (regular expression searched in the question), `file_extensions`,
+    `has_file`, `min_question_chars` and `max_question_chars`.
+
+    Args:
+        rule (Dict[str, Any]): The rule.
+        question (str): The question.
+        file_path (Optional[str]): The attached file, if any.
+
+    Returns:
+        bool: True if the rule applies.
+    """
+    lowered = question.lower()
+    extension = os.path.splitext(file_path)[1].lower() if file_path else None
+    checks = {
+        "keywords": lambda value: any(keyword.lower() in lowered for keyword in value),
+        "pattern": lambda value: re.search(value, question, re.IGNORECASE) is not None,
+        "file_extensions": lambda value: extension in {ext.lower() for ext in value},
+        "has_file": lambda value: bool(file_path) == value,
+        "min_question_chars": lambda value: len(question) >= value,
+        "max_question_chars": lambda value: len(question) <= value,
+    }
+    conditions = {key: value for key, value in rule.items() if key in checks}
+    return bool(conditions) and all(checks[key](value) for key, value in conditions.items())
+
+
+class RoutingModel(Model):
+    """
+    Model that dispatches every request to one of several backends (routes).
+
+    The route of the current context is selected with `use_route`; `plan` gives the
+    cascade of routes to try for a task, starting from the route picked by the first
+    matching rule and escalating towards the strongest one. `Agent` runs that cascade,
+    escalating on errors, step exhaustion or low-confidence answers, and reports every
+    attempt with `record`, so `stats` holds per-route latency and success rates.
+
+    Args:
+        routes (Dict[str, Model]): Backend of each route, from cheapest to strongest.
+        config (Dict[str, Any]): Routing configuration, see `load_routing_config`.
+    """
+
+    def __init__(self, routes: Dict[str, Model], config: Dict[str, Any]):
+        super().__init__(model_id="+".join(getattr(model, "model_id", None) or name for name, model in routes.items()))
+        self.routes = routes
+        self.route_names = list(routes)
+        self.rules = config.get("rules", [])
+        self.default_route = config.get("default", self.route_names[0])
+        self.escalate_on = {**DEFAULT_ESCALATE_ON, **config.get("escalate_on", {})}
+        self.max_steps = {route["name"]: route.get("max_steps") for route in config.get("routes", [])}
+        self.stats = {
+            name: {"attempts": 0, "successes": 0, "escalations": 0, "seconds": 0.0, "llm_calls": 0}
+            for name in self.route_names
+        }
+        self._lock = threading.Lock()
+
+    def plan(self, question: str, file_path: Optional[str] = None) -> List[str]:
+        """
+        Return the routes to try for a task, in order.
+
+        Args:
+            question (str): The question.
+            file_path (Optional[str]): The attached file, if any.
+
+        Returns:
+            List[str]: The first route and the stronger routes to escalate to.
+        """
+        first = next(
+            (rule["route"] for rule in self.rules if rule_matches(rule, question, file_path)),
+            self.default_route,
+        )
+        return self.route_names[self.route_names.index(first) :]
+
+    @contextmanager
+    def use_route(self, name: str) -> Iterator[Model]:
+        """
+        Send the requests made in the current context to the backend of `name`.
+
+        Args:
+            name (str): Route name.
+
+        Yields:
+            Model: The backend of the route.
+        """
+        token = _active_route.set(name)
+        try:
+            yield self.routes[name]
+        finally:
+            _active_route.reset(token)
+
+    def should_escalate(self, answer: Optional[str], error: Optional[BaseException], max_steps_reached: bool) -> Optional[str]:
+        """
+        Tell whether the result of an attempt calls for a stronger route, and why.
+
+        Args:
+            answer (Optional[str]): The answer, if any.
+            error (Optional[BaseException]): The error raised by the attempt, if any.
+            max_steps_reached (bool): Whether the agent ran out of steps.
+
+        Returns:
+            Optional[str]: "error", "max_steps" or "low_confidence", None to keep the answer.
+        """
+        if error is not None:
+            return "error" if self.escalate_on["error"] else None
+        if max_steps_reached and self.escalate_on["max_steps"]:
+            return "max_steps"
+        if self.escalate_on["low_confidence"] and LOW_CONFIDENCE_PATTERN.search(answer or ""):
+            return "low_confidence"
+        return None
+
+    def record(self, route: str, duration: float, success: bool, escalated: bool) -> None:
+        """Record the outcome of one attempt on a route."""
+        with self._lock:
+            stats = self.stats[route]
+            stats["attempts"] += 1
+            stats["successes"] += int(success)
+            stats["escalations"] += int(escalated)
+            stats["seconds"] += duration
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """
+        Per-route summary: attempts, success rate, escalations and mean latency.
+
+        Returns:
+            Dict[str, Dict[str, float]]: Summary of each route.
+        """
+        with self._lock:
+            return {
+                name: {
+                    **stats,
+                    "success_rate": stats["successes"] / stats["attempts"] if stats["attempts"] else 0.0,
+                    "mean_seconds": stats["seconds"] / stats["attempts"] if stats["attempts"] else 0.0,
+                }
+                for name, stats in self.stats.items()
+            }
+
+    def generate(
+        self,
+        messages: List[Dict[str, Any]],
+        stop_sequences: Optional[List[str]] = None,
+        grammar: Optional[str] = None,
+        tools_to_call_from: Optional[List[Any]] = None,
+        **kwargs,
+    ) -> ChatMessage:
+        name = _active_route.get() or self.default_route
+        model = self.routes[name]
+        start = time.perf_counter()
+        message = model.generate(
+            messages,
+            stop_sequences=stop_sequences,
+            grammar=grammar,
+            tools_to_call_from=tools_to_call_from,
+            **kwargs,
+        )
+        with self._lock:
+            self.stats[name]["llm_calls"] += 1
+        logger.debug(f"Route {name} answered in {time.perf_counter() - start:.2f}s")
+        self.last_input_token_count = model.last_input_token_count
+        self.last_output_token_count = model.last_output_token_count
+        return message
@@ -0,0 +1,172 @@
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from smolagents.memory import ActionStep
+from smolagents.utils import AgentMaxStepsError
+
+from utils.logger import get_logger
+from utils.tracing import message_tokens
+
+logger = get_logger(__name__)
+
+# Ceilings of one task: agent steps per run, wall-clock seconds and model tokens over
+# all runs of the task (0 disables either), and identical actions in a run before a
+# loop is declared (0 disables loop detection)
+DEFAULT_MAX_STEPS = int(os.getenv("AGENT_MAX_STEPS", "20"))
+DEFAULT_MAX_SECONDS = float(os.getenv("AGENT_MAX_SECONDS", "300"))
+DEFAULT_MAX_TOKENS = int(os.getenv("AGENT_MAX_TOKENS", "0"))
+DEFAULT_LOOP_REPEATS = int(os.getenv("AGENT_LOOP_REPEATS", "3"))
+
+REASONS = ("steps", "seconds", "tokens", "loop")
+
+
+class BudgetExceededError(AgentMaxStepsError):
+    """
+    The run was stopped by the budget controller before the agent gave an answer.
+
+    Args:
+        reason (str): "seconds", "tokens" or "loop".
+        logger (Any): The agent's logger.
+    """
+
+    def __init__(self, reason: str, logger: Any):
+        super().__init__(f"Budget exceeded: {reason}", logger)
+        self.reason = reason
+
+
+def action_key(step: ActionStep) -> Optional[str]:
+    """The action of a step with whitespace normalized, to compare steps with each other."""
+    if step.tool_calls:
+        action = " ".join(f"{call.name}:{call.arguments}" for call in step.tool_calls)
+    else:
+        action = step.model_output
+    return re.sub(r"\s+", " ", str(action)).strip() if action else None
+
+
+class BudgetTracker:
+    """
+    Budget consumed by one task, over every run of the agent on it.
+
+    Args:
+        budget (RunBudget): The ceilings.
+    """
+
+    def __init__(self, budget: "RunBudget"):
+        self.budget = budget
+        self.start = time.monotonic()
+        self.tokens = 0
+        self.reason: Optional[str] = None
+        self._actions: Counter = Counter()
+
+    @property
+    def exhausted(self) -> bool:
+        """Whether the task ran out of time or tokens, so no further run should start."""
+        return self.reason in ("seconds", "tokens")
+
+    def start_run(self) -> None:
+        """Reset the per-run state before the agent runs again on the task."""
+        # A step or loop stop only concerns the run it ended; time and tokens are per task
+        if not self.exhausted:
+            self.reason = None
+        self._actions.clear()
+
+    def count(self, step: Any, agent: Any) -> None:
+        """
+        Add the tokens of the model call of a step to the task.
+
+        Args:
+            step (Any): An action or planning step.
+            agent (Any): The CodeAgent, whose model counts are used when the backend
+                reports no usage.
+        """
+        message = getattr(step, "model_output_message", None)
+        if message is None:
+            return
+        input_tokens, output_tokens = message_tokens(message, agent.model)
+        self.tokens += (input_tokens or 0) + (output_tokens or 0)
+
+    def check(self, step: ActionStep, agent: Any) -> Optional[str]:
+        """
+        Count the tokens of a step and check the ceilings.
+
+        Args:
+            step (ActionStep): The step that just finished.
+            agent (Any): The CodeAgent that ran it.
+
+        Returns:
+            Optional[str]: "seconds", "tokens" or "loop" if the run must stop.
+        """
+        self.count(step, agent)
+
+        budget = self.budget
+        if budget.max_seconds and time.monotonic() - self.start >= budget.max_seconds:
+            return "seconds"
+        if budget.max_tokens and self.tokens >= budget.max_tokens:
+            return "tokens"
+        key = action_key(step)
+        if key and budget.loop_repeats:
+            self._actions[key] += 1
+            if self._actions[key] >= budget.loop_repeats:
+                return "loop"
+        return None
+
+
+class RunBudget:
+    """
+    Wall-clock, step and token ceilings of the agent's tasks, with loop detection.
+
+    `Agent` streams the steps of each run and checks them with the task's
+    `BudgetTracker`; when a ceiling is hit or the agent repeats the same action
+    `loop_repeats` times, the run stops and the model is asked for its best final
+    answer from what it gathered so far. The step ceiling is enforced by the agent's own
+    `max_steps`. `stats` counts how often each ceiling is hit.
+
+    Args:
+        max_steps (int): Steps of one run.
+        max_seconds (float): Wall-clock seconds of a task.
+        max_tokens (int): Model tokens of a task.
+        loop_repeats (int): Identical actions in a run that count as a loop.
+    """
+
+    def __init__(
+        self,
+        max_steps: int = DEFAULT_MAX_STEPS,
+        max_seconds: float = DEFAULT_MAX_SECONDS,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        loop_repeats: int = DEFAULT_LOOP_REPEATS,
+    ):
+        self.max_steps = max_steps
+        self.max_seconds = max_seconds
+        self.max_tokens = max_tokens
+        self.loop_repeats = loop_repeats
+        self.stats = {"tasks": 0, "forced_answers": 0, **{reason: 0 for reason in REASONS}}
+        self._lock = threading.Lock()
+
+    def start(self) -> BudgetTracker:
+        """Start tracking a new task."""
+        with self._lock:
+            self.stats["tasks"] += 1
+        return BudgetTracker(self)
+
+    def record(self, reason: str, forced: bool = True) -> None:
+        """Count a run stopped on `reason`, with a forced final answer or not."""
+        with self._lock:
+            self.stats[reason] += 1
+            self.stats["forced_answers"] += int(forced)
+
+    def report(self) -> Dict[str, Any]:
+        """
+        How often each ceiling was hit.
+
+        Returns:
+            Dict[str, Any]: Counts per ceiling and the mean number of hits per task.
+        """
+        with self._lock:
+            stats = dict(self.stats)
+        hits = sum(stats[reason] for reason in REASONS)
+        stats["hits_per_task"] = hits / stats["tasks"] if stats["tasks"] else 0.0
+        return stats
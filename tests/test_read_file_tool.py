@@ -0,0 +1,40 @@
+import re
+
+import pytest
+
+from tools.read_file_tool import MAX_OUTPUT_CHARS, ReadFileTool
+
+
+def read_all_pages(file_path: str) -> str:
+    tool = ReadFileTool()
+    first = tool.read_page(file_path, 1)
+    match = re.match(r"\[Page 1 of (\d+),[^\n]*\]\n", first)
+    if match is None:
+        return first
+    text = ""
+    for page in range(1, int(match.group(1)) + 1):
+        header, body = tool.read_page(file_path, page).split("\n", 1)
+        assert header.startswith(f"[Page {page} of ")
+        assert len(body) <= MAX_OUTPUT_CHARS
+        text += body
+    return text
+
+
+@pytest.mark.parametrize(
+    "lines",
+    [
+        [f"line {number}" for number in range(5000)],
+        [str(number) * 19999 for number in range(3)],
+        ["é" * 30000, "short", "ü" * 5],
+    ],
+    ids=["short lines", "lines close to a page", "line longer than a page"],
+)
+def test_pages_cover_every_line_once(tmp_path, lines):
+    file_path = tmp_path / "file.txt"
+    file_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    text = read_all_pages(str(file_path))
+
+    assert text == file_path.read_text(encoding="utf-8")
+    if len(lines[0]) <= MAX_OUTPUT_CHARS:
+        assert sorted(text.splitlines()) == sorted(lines)
@@ -0,0 +1,67 @@
+import json
+import subprocess
+from typing import Optional
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+def probe_duration(audio_path: str) -> Optional[float]:
+    """
+    Return the duration of an audio file in seconds using ffprobe.
+
+    Args:
+        audio_path (str): Path to the audio file.
+
+    Returns:
+        Optional[float]: Duration in seconds, or None if it cannot be determined.
+    """
+    cmd = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-show_entries",
+        "format=duration",
+        "-of",
+        "json",
+        audio_path,
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+        return float(json.loads(out)["format"]["duration"])
+    except Exception:
+        return None
+
+
+def load_audio_segment(
+    audio_path: str,
+    start: float = 0.0,
+    duration: Optional[float] = None,
+    sr: int = SAMPLE_RATE,
+) -> np.ndarray:
+    """
+    Decode a window of an audio file to a mono float32 waveform with ffmpeg.
+
+    Only the requested window is decoded, so memory stays proportional to `duration`
+    rather than to the length of the file.
+
+    Args:
+        audio_path (str): Path to the audio file.
+        start (float): Start of the window in seconds.
+        duration (Optional[float]): Length of the window in seconds, or None for the rest of the file.
+        sr (int): Target sample rate.
+
+    Returns:
+        np.ndarray: Waveform samples in the range [-1, 1]. Empty past the end of the file.
+    """
+    cmd = ["ffmpeg", "-nostdin", "-threads", "0", "-ss", f"{start:.3f}"]
+    if duration is not None:
+        cmd += ["-t", f"{duration:.3f}"]
+    cmd += ["-i", audio_path, "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sr), "-"]
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to load audio: {e.stderr.decode(errors='ignore')}") from e
+    return np.frombuffer(out, np.int16).flatten().astype(np.float32) / 32768.0
+
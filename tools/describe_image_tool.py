@@ -1,10 +1,10 @@
-import base64
 import os
 
-from openai import OpenAI
 from smolagents import Tool
 
-client = OpenAI()
+from utils.clients import get_openai_client, get_openai_transport
+
+from .images import JPEG_QUALITY, MAX_IMAGE_DIMENSION, OCR_MIN_CONFIDENCE, ocr_text, prepare_image
 
 
 class DescribeImageTool(Tool):
@@ -41,10 +41,20 @@ class DescribeImageTool(Tool):
     }
     output_type = "string"
 
+    # Vision model answering the requests
+    model = "gpt-4.1"
+
+    @property
+    def cache_version(self) -> str:
+        """Settings changing the descriptions, part of the tool cache key."""
+        return (
+            f"model={self.model},max_dimension={MAX_IMAGE_DIMENSION},"
+            f"quality={JPEG_QUALITY},ocr={OCR_MIN_CONFIDENCE}"
+        )
+
     def encode_image(self, image_path: str) -> str:
-        """Encode image to base64 string."""
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode("utf-8")
+        """Encode image to base64 string, downscaled and re-encoded if needed."""
+        return prepare_image(image_path)[1]
 
     def get_prompt(self, description_type: str, custom_prompt: str = None) -> str:
         """Get appropriate prompt based on description type."""
@@ -80,15 +90,22 @@ class DescribeImageTool(Tool):
             if not os.path.exists(image_path):
                 return f"Error: Image file not found at {image_path}"
 
-            # Encode the image
-            base64_image = self.encode_image(image_path)
+            # Text extraction is answered locally when OCR is confident enough
+            if description_type == "text":
+                text = ocr_text(image_path)
+                if text:
+                    return f"Text extracted from the image:\n{text}"
+
+            # Encode the image (cached, so several description types encode it once)
+            mime_type, base64_image = prepare_image(image_path)
 
             # Get appropriate prompt
             prompt = self.get_prompt(description_type, custom_prompt)
 
             # Make the API call
-            response = client.chat.completions.create(
-                model="gpt-4.1",
+            response = get_openai_transport().call(
+                get_openai_client().chat.completions.create,
+                model=self.model,
                 messages=[
                     {
                         "role": "user",
@@ -97,7 +114,7 @@ class DescribeImageTool(Tool):
                             {
                                 "type": "image_url",
                                 "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
+                                    "url": f"data:{mime_type};base64,{base64_image}"
                                 },
                             },
                         ],
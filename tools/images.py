@@ -0,0 +1,116 @@
+import base64
+import io
+import os
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Longest side sent to the vision model, larger images are downscaled
+MAX_IMAGE_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "1536"))
+JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+# Mean word confidence (0-100) above which local OCR is trusted
+OCR_MIN_CONFIDENCE = float(os.getenv("OCR_MIN_CONFIDENCE", "85"))
+# Supported images within the dimension limit and below this size are sent unchanged
+PASSTHROUGH_BYTES = 1 << 20
+
+# Formats accepted as-is by the OpenAI vision API
+SUPPORTED_FORMATS = {"JPEG": "image/jpeg", "PNG": "image/png", "GIF": "image/gif", "WEBP": "image/webp"}
+
+
+def _encode(image, image_format: str, **options) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, **options)
+    return buffer.getvalue()
+
+
+@lru_cache(maxsize=32)
+def _prepare(image_path: str, mtime_ns: int, size: int, max_dimension: int) -> Tuple[str, str]:
+    from PIL import Image
+
+    with open(image_path, "rb") as file:
+        original = file.read()
+    with Image.open(io.BytesIO(original)) as image:
+        image_format = image.format
+        fits = max(image.size) <= max_dimension
+        if image_format in SUPPORTED_FORMATS and fits and len(original) <= PASSTHROUGH_BYTES:
+            return SUPPORTED_FORMATS[image_format], base64.b64encode(original).decode("utf-8")
+
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+        # Images with transparency or few colors (screenshots, diagrams, boards) stay
+        # lossless, everything else becomes JPEG; the smaller encoding wins
+        if image.mode in ("RGBA", "LA", "P") or image_format == "PNG":
+            candidates = [("image/png", _encode(image, "PNG", optimize=True))]
+            if image.mode not in ("RGBA", "LA"):
+                candidates.append(("image/jpeg", _encode(image.convert("RGB"), "JPEG", quality=JPEG_QUALITY)))
+        else:
+            candidates = [("image/jpeg", _encode(image.convert("RGB"), "JPEG", quality=JPEG_QUALITY, optimize=True))]
+        if image_format in SUPPORTED_FORMATS and fits:
+            candidates.append((SUPPORTED_FORMATS[image_format], original))
+        mime_type, payload = min(candidates, key=lambda candidate: len(candidate[1]))
+    logger.info(f"Prepared {image_path}: {image_format} {len(original)} bytes -> {mime_type} {len(payload)} bytes")
+    return mime_type, base64.b64encode(payload).decode("utf-8")
+
+
+def prepare_image(image_path: str, max_dimension: int = MAX_IMAGE_DIMENSION) -> Tuple[str, str]:
+    """
+    Return the MIME type and base64 payload of an image, ready for a data URI.
+
+    Small images in a supported format and within `max_dimension` are sent unchanged;
+    others are downscaled and re-encoded, keeping whichever encoding is smallest.
+    Payloads are cached per file version, so describing the same image several times
+    encodes it once.
+
+    Args:
+        image_path (str): Path to the image file.
+        max_dimension (int): Maximum width and height in pixels.
+
+    Returns:
+        Tuple[str, str]: MIME type and base64 encoded image.
+    """
+    stat = os.stat(image_path)
+    return _prepare(os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size, max_dimension)
+
+
+def ocr_text(image_path: str, min_confidence: float = OCR_MIN_CONFIDENCE) -> Optional[str]:
+    """
+    Extract text from an image with local OCR (pytesseract), when it is reliable.
+
+    Args:
+        image_path (str): Path to the image file.
+        min_confidence (float): Minimum mean word confidence (0-100).
+
+    Returns:
+        Optional[str]: The extracted text, or None if OCR is unavailable, found no text
+            or is not confident enough.
+    """
+    try:
+        import pytesseract
+        from PIL import Image
+    except ImportError:
+        return None
+
+    try:
+        with Image.open(image_path) as image:
+            data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
+    except Exception as e:
+        logger.warning(f"Local OCR failed on {image_path}: {e}")
+        return None
+
+    confidences = [
+        float(confidence)
+        for confidence, word in zip(data["conf"], data["text"])
+        if word.strip() and float(confidence) >= 0
+    ]
+    if not confidences or sum(confidences) / len(confidences) < min_confidence:
+        return None
+
+    # Rebuild the lines from the word boxes
+    lines = {}
+    for index, word in enumerate(data["text"]):
+        if word.strip():
+            key = (data["block_num"][index], data["par_num"][index], data["line_num"][index])
+            lines.setdefault(key, []).append(word)
+    return "\n".join(" ".join(words) for _, words in sorted(lines.items()))
@@ -0,0 +1,405 @@
+import atexit
+import concurrent.futures
+import os
+import queue
+import re
+import socket
+import subprocess
+import sys
+import threading
+from dataclasses import dataclass
+from multiprocessing.connection import Connection
+from typing import Any, List, Optional, Sequence, Tuple
+
+from utils.logger import get_logger
+
+from .audio import load_audio_segment, probe_duration
+from .whisper_registry import DEFAULT_DEVICE, DEFAULT_FP16, DEFAULT_MODEL_SIZE, get_whisper_model
+
+logger = get_logger(__name__)
+
+# Audio is split into segments of SEGMENT_SECONDS overlapping by OVERLAP_SECONDS, and
+# the segments are transcribed by MEDIA_WORKERS processes
+SEGMENT_SECONDS = float(os.getenv("MEDIA_SEGMENT_SECONDS", "120"))
+OVERLAP_SECONDS = float(os.getenv("MEDIA_OVERLAP_SECONDS", "4"))
+DEFAULT_WORKERS = int(os.getenv("MEDIA_WORKERS", "0")) or min(4, os.cpu_count() or 1)
+# Transcripts longer than this are returned with timestamps and truncated
+MAX_TRANSCRIPT_CHARS = int(os.getenv("TRANSCRIPT_MAX_CHARS", "20000"))
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@dataclass
+class Segment:
+    """A piece of transcript with its start and end time in seconds."""
+
+    start: float
+    end: float
+    text: str
+
+
+def plan_segments(
+    start: float,
+    end: float,
+    segment_seconds: float = SEGMENT_SECONDS,
+    overlap_seconds: float = OVERLAP_SECONDS,
+) -> List[Tuple[float, float]]:
+    """
+    Split the window [start, end) into overlapping (start, duration) segments.
+
+    Args:
+        start (float): Start of the window in seconds.
+        end (float): End of the window in seconds.
+        segment_seconds (float): Length of each segment, overlap excluded.
+        overlap_seconds (float): Extra audio decoded after each segment, so words cut at
+            a boundary are heard whole by one of the two segments.
+
+    Returns:
+        List[Tuple[float, float]]: Start and duration of every segment.
+    """
+    segments = []
+    position = start
+    while position < end:
+        segments.append((position, min(segment_seconds + overlap_seconds, end - position)))
+        position += segment_seconds
+    return segments
+
+
+def stitch_segments(
+    chunks: Sequence[Tuple[float, List[Segment]]], overlap_seconds: float = OVERLAP_SECONDS
+) -> List[Segment]:
+    """
+    Merge the transcripts of overlapping audio segments.
+
+    Each overlap is cut in its middle: a transcript segment is kept by the audio segment
+    that contains its midpoint, so words heard twice are kept once.
+
+    Args:
+        chunks (Sequence[Tuple[float, List[Segment]]]): Start of every audio segment and
+            its transcript segments (absolute timestamps), in order.
+        overlap_seconds (float): Overlap between consecutive audio segments.
+
+    Returns:
+        List[Segment]: The stitched transcript.
+    """
+    stitched = []
+    for index, (start, segments) in enumerate(chunks):
+        low = start + overlap_seconds / 2 if index > 0 else float("-inf")
+        high = chunks[index + 1][0] + overlap_seconds / 2 if index + 1 < len(chunks) else float("inf")
+        for segment in segments:
+            if low <= (segment.start + segment.end) / 2 < high:
+                stitched.append(segment)
+    return stitched
+
+
+def _transcribe_window(
+    audio_path: str,
+    start: float,
+    duration: float,
+    model_size: str,
+    device: Optional[str],
+    threads: Optional[int],
+    fp16: Any,
+) -> List[Segment]:
+    """Transcribe one window of a file; runs in the worker processes."""
+    waveform = load_audio_segment(audio_path, start, duration)
+    if waveform.size == 0:
+        return []
+    result = get_whisper_model(model_size, device, threads, fp16).transcribe(waveform)
+    return [
+        Segment(start + segment["start"], start + segment["end"], segment["text"].strip())
+        for segment in result.get("segments", [])
+        if segment["text"].strip()
+    ]
+
+
+def serve(conn: Connection) -> None:
+    """
+    Worker loop: transcribe the windows sent by the parent until the connection closes.
+
+    Segments are sent back as (start, end, text) tuples.
+    """
+    while True:
+        try:
+            args = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            segments = _transcribe_window(*args)
+            conn.send(("ok", [(segment.start, segment.end, segment.text) for segment in segments]))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class TranscriptionWorker:
+    """
+    A transcription worker process and the connection to it.
+
+    Workers are started as `python -m tools.media`, so they import this module and
+    Whisper only, never the application's main module (and Gradio with it).
+    """
+
+    def __init__(self):
+        parent_socket, child_socket = socket.socketpair()
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "tools.media", str(child_socket.fileno())],
+            cwd=ROOT_DIR,
+            pass_fds=(child_socket.fileno(),),
+            stdin=subprocess.DEVNULL,
+        )
+        child_socket.close()
+        self.conn = Connection(parent_socket.detach())
+
+    def transcribe(self, *args: Any) -> List[Segment]:
+        """
+        Transcribe a window in the worker, see `_transcribe_window`.
+
+        Raises:
+            RuntimeError: If the transcription failed or the worker died.
+        """
+        try:
+            self.conn.send(args)
+            status, payload = self.conn.recv()
+        except (EOFError, OSError) as e:
+            raise RuntimeError(f"Transcription worker died: {e}") from e
+        if status != "ok":
+            raise RuntimeError(payload)
+        return [Segment(*segment) for segment in payload]
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def kill(self) -> None:
+        """Kill the worker process."""
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+        if self.alive():
+            self.process.kill()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+
+
+class TranscriptionPool:
+    """
+    Worker processes transcribing audio windows, kept alive so each loads its Whisper
+    model once.
+
+    Args:
+        workers (int): Number of worker processes, started on first use.
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS):
+        self.workers = workers
+        self._idle: "queue.Queue[TranscriptionWorker]" = queue.Queue()
+        self._started: List[TranscriptionWorker] = []
+        self._lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="transcribe")
+
+    def _acquire(self) -> TranscriptionWorker:
+        with self._lock:
+            if self._idle.empty() and len(self._started) < self.workers:
+                worker = TranscriptionWorker()
+                self._started.append(worker)
+                return worker
+        return self._idle.get()
+
+    def _run(self, *args: Any) -> List[Segment]:
+        worker = self._acquire()
+        try:
+            return worker.transcribe(*args)
+        finally:
+            if worker.alive():
+                self._idle.put(worker)
+            else:
+                # Replaced by a fresh worker on the next acquire
+                with self._lock:
+                    self._started.remove(worker)
+                worker.kill()
+
+    def submit(self, *args: Any) -> concurrent.futures.Future:
+        """Transcribe a window in a worker, see `_transcribe_window`."""
+        return self._executor.submit(self._run, *args)
+
+    def shutdown(self) -> None:
+        """Kill every worker."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            workers, self._started = self._started, []
+        for worker in workers:
+            worker.kill()
+
+
+_pool: Optional[TranscriptionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_transcription_pool(workers: int = DEFAULT_WORKERS) -> TranscriptionPool:
+    """
+    Return the process-wide transcription pool.
+
+    Args:
+        workers (int): Number of worker processes.
+
+    Returns:
+        TranscriptionPool: The shared pool.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.workers != workers:
+            if _pool is not None:
+                _pool.shutdown()
+            else:
+                atexit.register(lambda: _pool and _pool.shutdown())
+            _pool = TranscriptionPool(workers)
+        return _pool
+
+
+def transcription_version(model_size: str = DEFAULT_MODEL_SIZE, fp16: Any = DEFAULT_FP16) -> str:
+    """Fingerprint of the settings that change a transcript, for the tool cache."""
+    return (
+        f"whisper={model_size},fp16={fp16},segment={SEGMENT_SECONDS},"
+        f"overlap={OVERLAP_SECONDS},chars={MAX_TRANSCRIPT_CHARS}"
+    )
+
+
+def transcribe_parallel(
+    audio_path: str,
+    start: float = 0.0,
+    end: Optional[float] = None,
+    model_size: str = DEFAULT_MODEL_SIZE,
+    device: Optional[str] = DEFAULT_DEVICE,
+    fp16: Any = DEFAULT_FP16,
+    workers: int = DEFAULT_WORKERS,
+    segment_seconds: float = SEGMENT_SECONDS,
+    overlap_seconds: float = OVERLAP_SECONDS,
+) -> List[Segment]:
+    """
+    Transcribe a window of an audio file, segments being transcribed in parallel.
+
+    Short windows, single-worker setups and GPU devices are transcribed in this process
+    with the shared Whisper model; otherwise the CPU cores are split between the worker
+    processes of the transcription pool.
+
+    Args:
+        audio_path (str): Path to the audio file.
+        start (float): Start of the window in seconds.
+        end (Optional[float]): End of the window in seconds, None for the end of the file.
+        model_size (str): Whisper model name.
+        device (Optional[str]): Torch device, or None to let Whisper pick one.
+        fp16 (Any): Half precision setting, see `get_whisper_model`.
+        workers (int): Number of worker processes.
+        segment_seconds (float): Length of each segment.
+        overlap_seconds (float): Overlap between consecutive segments.
+
+    Returns:
+        List[Segment]: Transcript segments with absolute timestamps.
+    """
+    duration = probe_duration(audio_path)
+    if duration is not None:
+        end = duration if end is None else min(end, duration)
+    if end is None:
+        # Unknown duration: decode the whole window in one go
+        return _transcribe_window(audio_path, start, None, model_size, device, None, fp16)
+
+    windows = plan_segments(start, end, segment_seconds, overlap_seconds)
+    use_pool = workers > 1 and len(windows) > 1 and not (device or "").startswith("cuda")
+    if not use_pool:
+        chunks = [
+            (window_start, _transcribe_window(audio_path, window_start, length, model_size, device, None, fp16))
+            for window_start, length in windows
+        ]
+        return stitch_segments(chunks, overlap_seconds)
+
+    pool = get_transcription_pool(workers)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    logger.info(f"Transcribing {audio_path} ({end - start:.0f}s) in {len(windows)} segments on {workers} workers")
+    futures = [
+        pool.submit(audio_path, window_start, length, model_size, device, threads, fp16)
+        for window_start, length in windows
+    ]
+    chunks = [(window_start, future.result()) for (window_start, _), future in zip(windows, futures)]
+    return stitch_segments(chunks, overlap_seconds)
+
+
+def select_segments(
+    segments: List[Segment],
+    start_time: Optional[float] = None,
+    end_time: Optional[float] = None,
+    query: Optional[str] = None,
+    context: int = 1,
+) -> List[Segment]:
+    """
+    Keep the segments overlapping a time window and/or matching keywords.
+
+    Args:
+        segments (List[Segment]): Transcript segments.
+        start_time (Optional[float]): Start of the window in seconds.
+        end_time (Optional[float]): End of the window in seconds.
+        query (Optional[str]): Keywords; segments containing any of them are kept,
+            with `context` neighbouring segments on each side.
+        context (int): Number of neighbouring segments kept around a keyword match.
+
+    Returns:
+        List[Segment]: The selected segments, in order.
+    """
+    selected = [
+        segment
+        for segment in segments
+        if (start_time is None or segment.end > start_time) and (end_time is None or segment.start < end_time)
+    ]
+    if not query:
+        return selected
+
+    keywords = [word for word in re.findall(r"\w+", query.lower()) if len(word) > 2] or [query.lower()]
+    keep = set()
+    for index, segment in enumerate(selected):
+        text = segment.text.lower()
+        if any(keyword in text for keyword in keywords):
+            keep.update(range(max(0, index - context), min(len(selected), index + context + 1)))
+    return [selected[index] for index in sorted(keep)]
+
+
+def format_timestamp(seconds: float) -> str:
+    """Format seconds as [h:]mm:ss."""
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes:02d}:{secs:02d}"
+
+
+def format_transcript(segments: List[Segment], selected: bool = False) -> str:
+    """
+    Render a transcript for the agent.
+
+    A short full transcript is returned as plain text. Selections and long transcripts
+    are rendered one timestamped segment per line, truncated to MAX_TRANSCRIPT_CHARS.
+
+    Args:
+        segments (List[Segment]): Transcript segments.
+        selected (bool): Whether the segments are a selection of the transcript.
+
+    Returns:
+        str: The transcript.
+    """
+    if not segments:
+        return "No matching transcript segments." if selected else "The transcript is empty."
+    text = " ".join(segment.text for segment in segments)
+    if not selected and len(text) <= MAX_TRANSCRIPT_CHARS:
+        return text
+    lines = [f"[{format_timestamp(s.start)} - {format_timestamp(s.end)}] {s.text}" for s in segments]
+    rendered = "\n".join(lines)
+    if len(rendered) <= MAX_TRANSCRIPT_CHARS:
+        return rendered
+    return (
+        rendered[:MAX_TRANSCRIPT_CHARS]
+        + f"\n[... truncated, the transcript runs until {format_timestamp(segments[-1].end)}; "
+        "pass start_time/end_time or query to read a specific part]"
+    )
+
+
+if __name__ == "__main__":
+    fd = int(sys.argv[1])
+    serve(Connection(socket.socket(fileno=fd).detach()))
@@ -1,35 +1,225 @@
 import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-import whisper
 from smolagents import Tool
 
+from .audio import load_audio_segment, probe_duration
+from .media import (
+    DEFAULT_WORKERS,
+    SEGMENT_SECONDS,
+    Segment,
+    format_transcript,
+    select_segments,
+    transcribe_parallel,
+    transcription_version,
+)
+from .whisper_registry import (
+    DEFAULT_DEVICE,
+    DEFAULT_FP16,
+    DEFAULT_MODEL_SIZE,
+    DEFAULT_THREADS,
+    WhisperModel,
+    get_whisper_model,
+)
+
+# Whisper decodes audio in 30 second windows
+BATCH_CLIP_SECONDS = 30.0
+
 
 class OpenAISpeechToTextTool(Tool):
     """
     Tool to convert speech to text using OpenAI's Whisper model.
 
+    The Whisper model is loaded once per process and kept warm between calls. Long
+    files are split into overlapping segments transcribed in parallel by a process
+    pool, and the agent can ask for a time window or for the segments mentioning
+    some keywords instead of the full transcript. `iter_transcription` streams the
+    transcript window by window, and `transcribe_batch` transcribes several files in
+    one pass.
+
     Args:
         audio_path (str): Path to the audio file.
+        start_time (Optional[float]): Start of the time window in seconds.
+        end_time (Optional[float]): End of the time window in seconds.
+        query (Optional[str]): Keywords; only the matching segments are returned.
 
     Returns:
         str: Transcribed text from the audio file.
     """
 
     name = "transcribe_audio"
-    description = "Transcribes audio to text and returns the text"
+    description = (
+        "Transcribes audio to text and returns the text. Long recordings are returned with "
+        "timestamps; pass start_time/end_time (seconds) to transcribe only a time window, "
+        "or query to return only the segments mentioning some keywords."
+    )
     inputs = {
         "audio_path": {"type": "string", "description": "Path to the audio file"},
+        "start_time": {
+            "type": "number",
+            "description": "Start of the time window to transcribe, in seconds",
+            "nullable": True,
+        },
+        "end_time": {
+            "type": "number",
+            "description": "End of the time window to transcribe, in seconds",
+            "nullable": True,
+        },
+        "query": {
+            "type": "string",
+            "description": "Keywords; only the transcript segments mentioning them are returned",
+            "nullable": True,
+        },
     }
     output_type = "string"
 
-    def forward(self, audio_path: str) -> str:
-        try:
-            model = whisper.load_model("small")
+    def __init__(
+        self,
+        model_size: str = DEFAULT_MODEL_SIZE,
+        device: Optional[str] = DEFAULT_DEVICE,
+        threads: Optional[int] = DEFAULT_THREADS,
+        fp16: Any = DEFAULT_FP16,
+        workers: int = DEFAULT_WORKERS,
+        chunk_seconds: float = 300.0,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.model_size = model_size
+        self.device = device
+        self.threads = threads
+        self.fp16 = fp16
+        self.workers = workers
+        self.chunk_seconds = chunk_seconds
+        # Full transcripts by file version, so several windows or queries on the same
+        # file transcribe it once
+        self._transcripts: Dict[Tuple[str, int, int], List[Segment]] = {}
+        self._transcripts_lock = threading.Lock()
+
+    @property
+    def cache_version(self) -> str:
+        """Settings changing the transcripts, part of the tool cache key."""
+        return transcription_version(self.model_size, self.fp16)
+
+    @property
+    def model(self) -> WhisperModel:
+        """The shared Whisper model, loaded on first access."""
+        return get_whisper_model(self.model_size, self.device, self.threads, self.fp16)
+
+    def transcribe_batch(self, audio_paths: List[str]) -> List[str]:
+        """
+        Transcribe several audio files in one pass.
+
+        Clips of at most 30 seconds are decoded together in a single batch,
+        longer files are transcribed one by one.
+
+        Args:
+            audio_paths (List[str]): Paths to the audio files.
+
+        Returns:
+            List[str]: Transcribed text for each file, in order.
+        """
+        texts: List[Optional[str]] = [None] * len(audio_paths)
+        short_clips = []
+        for index, audio_path in enumerate(audio_paths):
+            duration = probe_duration(audio_path)
+            if duration is not None and duration <= BATCH_CLIP_SECONDS:
+                short_clips.append((index, load_audio_segment(audio_path)))
+            else:
+                texts[index] = self.transcribe(audio_path)
+
+        decoded = self.model.decode_batch([waveform for _, waveform in short_clips])
+        for (index, _), text in zip(short_clips, decoded):
+            texts[index] = text
+        return texts
 
+    def transcribe_segments(
+        self, audio_path: str, start_time: Optional[float] = None, end_time: Optional[float] = None
+    ) -> List[Segment]:
+        """
+        Transcribe a file, or only a time window of it, into timestamped segments.
+
+        Args:
+            audio_path (str): Path to the audio file.
+            start_time (Optional[float]): Start of the window in seconds.
+            end_time (Optional[float]): End of the window in seconds.
+
+        Returns:
+            List[Segment]: Transcript segments with absolute timestamps.
+        """
+        stat = os.stat(audio_path)
+        key = (os.path.abspath(audio_path), stat.st_mtime_ns, stat.st_size)
+        with self._transcripts_lock:
+            segments = self._transcripts.get(key)
+        if segments is not None:
+            return select_segments(segments, start_time, end_time)
+
+        windowed = start_time is not None or end_time is not None
+        segments = transcribe_parallel(
+            audio_path,
+            start=max(0.0, start_time or 0.0),
+            end=end_time,
+            model_size=self.model_size,
+            device=self.device,
+            fp16=self.fp16,
+            workers=self.workers,
+        )
+        if windowed:
+            return select_segments(segments, start_time, end_time)
+        with self._transcripts_lock:
+            self._transcripts[key] = segments
+        return segments
+
+    def iter_transcription(self, audio_path: str) -> Iterator[Tuple[float, str]]:
+        """
+        Transcribe a file window by window, yielding each window as soon as it is done.
+
+        Windows of `chunk_seconds` are transcribed one after the other with
+        `transcribe_segments`, so only one window is decoded at a time.
+
+        Args:
+            audio_path (str): Path to the audio file.
+
+        Yields:
+            Tuple[float, str]: Window start time in seconds and its transcribed text.
+        """
+        duration = probe_duration(audio_path)
+        if duration is None:
+            yield 0.0, format_transcript(self.transcribe_segments(audio_path))
+            return
+        start = 0.0
+        while start < duration:
+            end = start + self.chunk_seconds
+            # Segments crossing the window end belong to the window they start in
+            segments = [
+                segment
+                for segment in self.transcribe_segments(audio_path, start, end)
+                if start <= segment.start < end
+            ]
+            yield start, " ".join(segment.text for segment in segments)
+            start = end
+
+    def transcribe(self, audio_path: str) -> str:
+        """Transcribe a whole file, in parallel segments if it is long."""
+        duration = probe_duration(audio_path)
+        if duration is not None and duration <= SEGMENT_SECONDS:
+            return self.model.transcribe(audio_path)["text"]
+        return format_transcript(self.transcribe_segments(audio_path))
+
+    def forward(
+        self,
+        audio_path: str,
+        start_time: Optional[float] = None,
+        end_time: Optional[float] = None,
+        query: Optional[str] = None,
+    ) -> str:
+        try:
             if not os.path.exists(audio_path):
                 return f"Error: Audio file not found at {audio_path}"
 
-            result = model.transcribe(audio_path)
-            return result["text"]
+            if start_time is None and end_time is None and not query:
+                return self.transcribe(audio_path)
+            segments = self.transcribe_segments(audio_path, start_time, end_time)
+            return format_transcript(select_segments(segments, query=query), selected=True)
         except Exception as e:
             return f"Error transcribing audio: {str(e)}"
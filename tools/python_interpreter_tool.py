@@ -0,0 +1,34 @@
+from smolagents import PythonInterpreterTool
+
+from utils.sandbox import SANDBOX_ENABLED, SandboxError, get_sandbox_pool, run_in_worker
+
+
+class SandboxedPythonInterpreterTool(PythonInterpreterTool):
+    """
+    Python interpreter tool running each snippet in a fresh worker of the sandbox pool.
+
+    Snippets are limited in CPU time, wall time and memory (see `utils.sandbox`); a
+    snippet exceeding a limit gets its worker killed instead of stalling the agent.
+    With CODE_SANDBOX set to "0", snippets run in this process as in smolagents.
+
+    Args:
+        code (str): The python code to run.
+
+    Returns:
+        str: Printed output and value of the last expression.
+    """
+
+    def forward(self, code: str) -> str:
+        if not SANDBOX_ENABLED:
+            return super().forward(code)
+        pool = get_sandbox_pool()
+        worker = pool.acquire()
+        reason = None
+        try:
+            output, logs, _ = run_in_worker(worker, code, {}, self.authorized_imports)
+            return f"Stdout:\n{logs}\nOutput: {output}"
+        except SandboxError as e:
+            reason = e.reason
+            raise
+        finally:
+            pool.release(worker, reason)
@@ -0,0 +1,67 @@
+from typing import Any, Optional
+
+from smolagents import Tool
+
+
+class ReadContextTool(Tool):
+    """
+    Tool to page through tool outputs that were too large for the agent's context.
+
+    Oversized outputs are replaced by their first page and a handle (see
+    `context_budget.ContextBudget`); this tool returns the other pages, or the lines
+    of the output containing a pattern.
+
+    Args:
+        handle (str): Handle of the stored output, e.g. "ctx-0123456789".
+        page (Optional[int]): Page number, 1-based.
+        pattern (Optional[str]): Case-insensitive text; only the matching lines are returned.
+
+    Returns:
+        str: The requested page or lines.
+    """
+
+    name = "read_context"
+    description = (
+        "Reads a tool output that was too long and was truncated. Pass the handle given in the "
+        "truncation notice and a page number, or a pattern to get only the lines containing it."
+    )
+    inputs = {
+        "handle": {"type": "string", "description": "Handle of the stored output, e.g. 'ctx-0123456789'"},
+        "page": {"type": "integer", "description": "Page number, 1-based (default 2)", "nullable": True},
+        "pattern": {
+            "type": "string",
+            "description": "Case-insensitive text; only the lines containing it are returned",
+            "nullable": True,
+        },
+    }
+    output_type = "string"
+
+    def __init__(self, budget: Any, **kwargs):
+        super().__init__(**kwargs)
+        self.budget = budget
+
+    def forward(self, handle: str, page: Optional[int] = None, pattern: Optional[str] = None) -> str:
+        store, page_chars = self.budget.store, self.budget.page_chars
+        if pattern:
+            text = store.get(handle)
+            if text is None:
+                return f"Error: unknown or expired handle {handle!r}"
+            lines = [
+                f"{number}: {line}"
+                for number, line in enumerate(text.splitlines(), start=1)
+                if pattern.lower() in line.lower()
+            ]
+            if not lines:
+                return f"No lines of {handle} contain {pattern!r}"
+            matches = "\n".join(lines)
+            if len(matches) > page_chars:
+                matches = matches[:page_chars] + "\n[... more matches, use a more specific pattern]"
+            return matches
+
+        page = page or 2
+        text, pages = store.page(handle, page, page_chars)
+        if text is None:
+            return f"Error: unknown or expired handle {handle!r}"
+        if page < 1 or page > pages:
+            return f"Error: {handle} has {pages} pages"
+        return f"[{handle} page {page}/{pages}]\n{text}"
@@ -1,27 +1,457 @@
+import json
+import mmap
+import os
+import re
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import islice
+from typing import Any, Iterator, List, Optional, Tuple
+
 from smolagents import Tool
 
+# Upper bound on the characters returned by a single call, so large files are paged
+MAX_OUTPUT_CHARS = int(os.getenv("READ_FILE_MAX_CHARS", "20000"))
+PAGE_BYTES = MAX_OUTPUT_CHARS
+SAMPLE_ROWS = 5
+SCHEMA_ROWS = 1000
+MAX_GREP_MATCHES = 200
+SNIFF_BYTES = 8192
+
+TABLE_EXTENSIONS = {".csv", ".tsv"}
+EXCEL_EXTENSIONS = {".xlsx", ".xlsm", ".xls"}
+JSON_EXTENSIONS = {".json"}
+
+# Binary formats that are better handled by another tool
+BINARY_SIGNATURES = [
+    (b"%PDF", "PDF document"),
+    (b"\x89PNG", "PNG image (use describe_image)"),
+    (b"\xff\xd8\xff", "JPEG image (use describe_image)"),
+    (b"GIF8", "GIF image (use describe_image)"),
+    (b"ID3", "MP3 audio (use transcribe_audio)"),
+    (b"RIFF", "RIFF container (WAV audio or WEBP image)"),
+    (b"PK\x03\x04", "ZIP archive"),
+]
+
+
+@contextmanager
+def _mapped(file_path: str) -> Iterator[Any]:
+    """Memory-map a file read-only, yielding b"" for empty files."""
+    with open(file_path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
+def _is_binary(file_path: str) -> bool:
+    with open(file_path, "rb") as file:
+        return b"\x00" in file.read(SNIFF_BYTES)
+
+
+def _truncate(text: str, hint: str = "") -> str:
+    if len(text) <= MAX_OUTPUT_CHARS:
+        return text
+    return text[:MAX_OUTPUT_CHARS] + f"\n[... truncated at {MAX_OUTPUT_CHARS} characters{hint}]"
+
+
+@lru_cache(maxsize=32)
+def _page_starts(file_path: str, mtime_ns: int, size: int) -> Tuple[int, ...]:
+    """
+    Byte offsets at which the pages of a text file start.
+
+    A page is at most PAGE_BYTES long and ends after its last newline; a line longer
+    than a page is split at the byte limit, backing off to the start of a UTF-8
+    character. Since a byte decodes to at most one character, no page exceeds
+    MAX_OUTPUT_CHARS.
+    """
+    starts = [0]
+    with _mapped(file_path) as mapped:
+        start = 0
+        while size - start > PAGE_BYTES:
+            end = start + PAGE_BYTES
+            newline = mapped.rfind(b"\n", start, end)
+            if newline != -1:
+                end = newline + 1
+            else:
+                back = 0
+                while back < 3 and mapped[end - back] & 0xC0 == 0x80:
+                    back += 1
+                end -= back
+            starts.append(end)
+            start = end
+    return tuple(starts)
+
+
+def _count_lines(file_path: str, block_size: int = 1 << 20) -> int:
+    count, last = 0, b"\n"
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            count += block.count(b"\n")
+            last = block[-1:]
+    return count + (last != b"\n")
+
+
+def _select_json_path(data: Any, json_path: str) -> Any:
+    """
+    Select a value with a dotted path such as "results[0].name" or "a.b.2".
+
+    Args:
+        data (Any): Parsed JSON document.
+        json_path (str): Path to select, an optional leading "$" is ignored.
+
+    Returns:
+        Any: The selected value.
+    """
+    for key in re.findall(r"[^.\[\]]+", json_path.lstrip("$")):
+        if isinstance(data, list):
+            data = data[int(key)]
+        elif isinstance(data, dict):
+            data = data[key]
+        else:
+            raise KeyError(f"Cannot select '{key}' from a {type(data).__name__}")
+    return data
+
+
+def _describe_json(data: Any, depth: int = 0, max_depth: int = 3) -> List[str]:
+    """Outline the structure of a JSON value: keys, types and lengths."""
+    indent = "  " * depth
+    if isinstance(data, dict):
+        lines = [f"{indent}object with {len(data)} keys"]
+        if depth < max_depth:
+            for key, value in islice(data.items(), 50):
+                lines.append(f"{indent}  {key}:")
+                lines.extend(_describe_json(value, depth + 2, max_depth))
+        return lines
+    if isinstance(data, list):
+        lines = [f"{indent}array of {len(data)} items"]
+        if data and depth < max_depth:
+            lines.append(f"{indent}  [0]:")
+            lines.extend(_describe_json(data[0], depth + 2, max_depth))
+        return lines
+    return [f"{indent}{type(data).__name__}: {json.dumps(data)[:80]}"]
+
 
 class ReadFileTool(Tool):
     """
-    Tool to read a file and return its content.
+    Tool to read a file and return its content, or only the part of it that is needed.
+
+    Small text files are returned whole. Large files are memory-mapped and paged, and
+    can be queried by line range, byte range or regular expression. CSV and Excel files
+    are summarized as a schema plus sample rows, JSON documents can be outlined or
+    narrowed down with a path, and binary files are identified instead of dumped.
 
     Args:
         file_path (str): Path to the file to read.
+        start_line (Optional[int]): First line to return (1-based); negative for the last lines.
+        end_line (Optional[int]): Last line to return (inclusive).
+        pattern (Optional[str]): Regular expression, only matching lines are returned.
+        page (Optional[int]): Page of a large text file to return (1-based).
+        json_path (Optional[str]): Path of the value to select in a JSON file.
+        byte_offset (Optional[int]): Offset of the byte range to return.
+        byte_length (Optional[int]): Length of the byte range to return.
 
     Returns:
         str: Content of the file or error message.
     """
 
     name = "read_file"
-    description = "Reads a file and returns its content"
+    description = (
+        "Reads a file and returns its content. Large files are returned one page at a time. "
+        "CSV/Excel files return the schema and sample rows (use start_line/end_line for more rows), "
+        "JSON files can be narrowed with json_path (e.g. 'items[0].name'). "
+        "Use start_line/end_line for a line range (negative start_line for the last lines), "
+        "pattern to grep lines with a regular expression, and byte_offset/byte_length for raw bytes."
+    )
     inputs = {
         "file_path": {"type": "string", "description": "Path to the file to read"},
+        "start_line": {
+            "type": "integer",
+            "description": "First line (or table row) to return, 1-based; negative to return the last lines",
+            "nullable": True,
+        },
+        "end_line": {
+            "type": "integer",
+            "description": "Last line (or table row) to return, inclusive",
+            "nullable": True,
+        },
+        "pattern": {
+            "type": "string",
+            "description": "Regular expression; only matching lines are returned with their line numbers",
+            "nullable": True,
+        },
+        "page": {
+            "type": "integer",
+            "description": "Page of a large text file to return, 1-based",
+            "nullable": True,
+        },
+        "json_path": {
+            "type": "string",
+            "description": "Path of the value to return from a JSON file, e.g. 'data.items[0]'",
+            "nullable": True,
+        },
+        "byte_offset": {
+            "type": "integer",
+            "description": "Offset of the raw byte range to return",
+            "nullable": True,
+        },
+        "byte_length": {
+            "type": "integer",
+            "description": "Length of the raw byte range to return",
+            "nullable": True,
+        },
     }
     output_type = "string"
+    # Settings changing the results, part of the tool cache key
+    cache_version = f"chars={MAX_OUTPUT_CHARS}"
 
-    def forward(self, file_path: str) -> str:
+    def forward(
+        self,
+        file_path: str,
+        start_line: Optional[int] = None,
+        end_line: Optional[int] = None,
+        pattern: Optional[str] = None,
+        page: Optional[int] = None,
+        json_path: Optional[str] = None,
+        byte_offset: Optional[int] = None,
+        byte_length: Optional[int] = None,
+    ) -> str:
         try:
-            with open(file_path, "r") as file:
-                return file.read()
+            if not os.path.isfile(file_path):
+                return f"Error reading file: {file_path} does not exist"
+            extension = os.path.splitext(file_path)[1].lower()
+
+            if byte_offset is not None or byte_length is not None:
+                return self.read_bytes(file_path, byte_offset or 0, byte_length)
+            if pattern is not None:
+                return self.grep(file_path, pattern)
+            if extension in EXCEL_EXTENSIONS:
+                return self.read_excel(file_path, start_line, end_line)
+            if extension in TABLE_EXTENSIONS:
+                return self.read_table(file_path, start_line, end_line)
+            if extension in JSON_EXTENSIONS and start_line is None and end_line is None:
+                return self.read_json(file_path, json_path)
+            if _is_binary(file_path):
+                return self.describe_binary(file_path)
+            if start_line is not None or end_line is not None:
+                return self.read_lines(file_path, start_line, end_line)
+            return self.read_page(file_path, page or 1)
         except Exception as e:
             return f"Error reading file: {str(e)}"
+
+    def read_page(self, file_path: str, page: int) -> str:
+        """
+        Return one page of a text file, pages being split on line boundaries.
+
+        Args:
+            file_path (str): Path to the file.
+            page (int): Page number, 1-based.
+
+        Returns:
+            str: The page, with a header when the file has more than one page.
+        """
+        stat = os.stat(file_path)
+        starts = _page_starts(os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+        pages = len(starts)
+        if not 1 <= page <= pages:
+            return f"Error reading file: page {page} out of range (1-{pages})"
+        end = starts[page] if page < pages else stat.st_size
+        with _mapped(file_path) as mapped:
+            text = mapped[starts[page - 1] : end].decode("utf-8", errors="replace")
+        if pages == 1:
+            return text
+        # Pages fit in MAX_OUTPUT_CHARS on their own, the header is not counted
+        return f"[Page {page} of {pages}, {stat.st_size} bytes in total; pass page=N for another page]\n{text}"
+
+    def read_lines(self, file_path: str, start_line: Optional[int], end_line: Optional[int]) -> str:
+        """
+        Return a range of lines, streaming the file; a negative start returns the last lines.
+
+        Args:
+            file_path (str): Path to the file.
+            start_line (Optional[int]): First line, 1-based, or -N for the last N lines.
+            end_line (Optional[int]): Last line, inclusive.
+
+        Returns:
+            str: The selected lines.
+        """
+        with open(file_path, "r", encoding="utf-8", errors="replace") as file:
+            if start_line is not None and start_line < 0:
+                lines = list(deque(file, maxlen=-start_line))
+            else:
+                start = max(1, start_line or 1)
+                lines = list(islice(file, start - 1, end_line))
+        return _truncate("".join(lines), "; request a smaller line range")
+
+    def grep(self, file_path: str, pattern: str) -> str:
+        """
+        Return the lines matching a regular expression, with their line numbers.
+
+        Args:
+            file_path (str): Path to the file.
+            pattern (str): Regular expression.
+
+        Returns:
+            str: Matching lines as "line_number: line".
+        """
+        regex = re.compile(pattern)
+        matches = []
+        with open(file_path, "r", encoding="utf-8", errors="replace") as file:
+            for number, line in enumerate(file, start=1):
+                if regex.search(line):
+                    matches.append(f"{number}: {line.rstrip()}")
+                    if len(matches) >= MAX_GREP_MATCHES:
+                        matches.append(f"[... stopped after {MAX_GREP_MATCHES} matches]")
+                        break
+        if not matches:
+            return f"No lines match {pattern!r}"
+        return _truncate("\n".join(matches), "; use a more specific pattern")
+
+    def read_bytes(self, file_path: str, offset: int, length: Optional[int]) -> str:
+        """
+        Return a raw byte range, decoded as text or as a hex dump for binary data.
+
+        Args:
+            file_path (str): Path to the file.
+            offset (int): Offset of the first byte.
+            length (Optional[int]): Number of bytes, up to the output limit.
+
+        Returns:
+            str: The byte range.
+        """
+        length = min(length or MAX_OUTPUT_CHARS, MAX_OUTPUT_CHARS)
+        with _mapped(file_path) as mapped:
+            data = bytes(mapped[offset : offset + length])
+        if b"\x00" not in data:
+            return data.decode("utf-8", errors="replace")
+        return "\n".join(
+            f"{offset + index:08x}  {data[index : index + 16].hex(' ')}"
+            for index in range(0, min(len(data), MAX_OUTPUT_CHARS // 64 * 16), 16)
+        )
+
+    def read_table(self, file_path: str, start_line: Optional[int], end_line: Optional[int]) -> str:
+        """
+        Summarize a CSV/TSV file as schema and sample rows, or return a range of rows.
+
+        Args:
+            file_path (str): Path to the file.
+            start_line (Optional[int]): First data row, 1-based.
+            end_line (Optional[int]): Last data row, inclusive.
+
+        Returns:
+            str: The summary or the selected rows.
+        """
+        import pandas as pd
+
+        separator = "\t" if file_path.lower().endswith(".tsv") else ","
+        if start_line is not None or end_line is not None:
+            start = max(1, start_line or 1)
+            rows = None if end_line is None else max(0, end_line - start + 1)
+            frame = pd.read_csv(
+                file_path, sep=separator, skiprows=range(1, start), nrows=rows
+            )
+            frame.index += start
+            return _truncate(frame.to_string(), "; request a smaller row range")
+
+        frame = pd.read_csv(file_path, sep=separator, nrows=SCHEMA_ROWS)
+        frame.index += 1
+        rows = max(0, _count_lines(file_path) - 1)
+        schema = "\n".join(f"  {column}: {dtype}" for column, dtype in frame.dtypes.items())
+        return _truncate(
+            f"Table with {rows} rows and {len(frame.columns)} columns.\n"
+            f"Columns:\n{schema}\n"
+            f"First {min(SAMPLE_ROWS, len(frame))} rows:\n{frame.head(SAMPLE_ROWS).to_string()}\n"
+            "Use start_line/end_line to read more rows, or load the file with pandas in code."
+        )
+
+    def read_excel(self, file_path: str, start_line: Optional[int], end_line: Optional[int]) -> str:
+        """
+        Summarize every sheet of a workbook as dimensions, header and sample rows.
+
+        Args:
+            file_path (str): Path to the workbook.
+            start_line (Optional[int]): First row to return, 1-based (header included).
+            end_line (Optional[int]): Last row to return, inclusive.
+
+        Returns:
+            str: The summary or the selected rows of every sheet.
+        """
+        if start_line is not None or end_line is not None:
+            first = max(1, start_line or 1)
+            last = end_line or first + SAMPLE_ROWS
+        else:
+            first, last = 1, SAMPLE_ROWS + 1
+
+        def sheet_rows(title: str, dimensions: str, values: Iterator[tuple]) -> str:
+            rows = [f"  {number}: {list(row)}" for number, row in enumerate(values, start=first)]
+            return f"Sheet '{title}' ({dimensions}), rows {first}-{first + len(rows) - 1}:\n" + "\n".join(rows)
+
+        parts = []
+        if file_path.lower().endswith(".xls"):
+            import pandas as pd
+
+            # Legacy workbooks are small (at most 65536 rows), so sheets are read whole
+            sheets = pd.read_excel(file_path, sheet_name=None, header=None)
+            for name, frame in sheets.items():
+                frame = frame.astype(object).where(frame.notna(), None)
+                values = frame.iloc[first - 1 : last].itertuples(index=False, name=None)
+                parts.append(sheet_rows(name, f"{frame.shape[0]} rows x {frame.shape[1]} columns", values))
+        else:
+            from openpyxl import load_workbook
+
+            workbook = load_workbook(file_path, read_only=True, data_only=True)
+            try:
+                for sheet in workbook.worksheets:
+                    values = sheet.iter_rows(min_row=first, max_row=last, values_only=True)
+                    dimensions = f"{sheet.max_row} rows x {sheet.max_column} columns"
+                    parts.append(sheet_rows(sheet.title, dimensions, values))
+            finally:
+                workbook.close()
+        return _truncate(
+            "\n\n".join(parts)
+            + "\nUse start_line/end_line to read more rows, or load the file with pandas in code."
+        )
+
+    def read_json(self, file_path: str, json_path: Optional[str]) -> str:
+        """
+        Return a JSON document, a selected value, or an outline when it is too large.
+
+        Args:
+            file_path (str): Path to the file.
+            json_path (Optional[str]): Path of the value to return.
+
+        Returns:
+            str: The JSON text or an outline of its structure.
+        """
+        with open(file_path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        if json_path:
+            data = _select_json_path(data, json_path)
+        text = json.dumps(data, indent=2, ensure_ascii=False)
+        if len(text) <= MAX_OUTPUT_CHARS:
+            return text
+        outline = "\n".join(_describe_json(data))
+        return _truncate(
+            f"JSON value too large ({len(text)} characters), structure:\n{outline}\n"
+            "Use json_path to select a part of it."
+        )
+
+    def describe_binary(self, file_path: str) -> str:
+        """
+        Identify a binary file instead of returning its content.
+
+        Args:
+            file_path (str): Path to the file.
+
+        Returns:
+            str: The detected format and size.
+        """
+        with open(file_path, "rb") as file:
+            header = file.read(16)
+        kind = next((name for signature, name in BINARY_SIGNATURES if header.startswith(signature)), None)
+        size = os.path.getsize(file_path)
+        return (
+            f"Binary file ({kind or 'unknown format'}), {size} bytes. "
+            "Use byte_offset/byte_length for a hex dump of raw bytes."
+        )
@@ -0,0 +1,272 @@
+import contextvars
+import functools
+import hashlib
+import inspect
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+from smolagents import Tool
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Documents are split into chunks of about CHUNK_CHARS overlapping by CHUNK_OVERLAP_CHARS
+CHUNK_CHARS = int(os.getenv("RETRIEVAL_CHUNK_CHARS", "1200"))
+CHUNK_OVERLAP_CHARS = int(os.getenv("RETRIEVAL_CHUNK_OVERLAP_CHARS", "200"))
+DEFAULT_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+# Optional sentence-transformers model adding dense vectors to BM25, e.g. "all-MiniLM-L6-v2"
+EMBEDDING_MODEL = os.getenv("RETRIEVAL_EMBEDDING_MODEL", "")
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Constant of the reciprocal rank fusion of the BM25 and dense rankings
+RRF_K = 60
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were "
+    "which with what who when where how".split()
+)
+
+_current_index: contextvars.ContextVar[Optional["RetrievalIndex"]] = contextvars.ContextVar(
+    "retrieval_index", default=None
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens of a text, stopwords removed."""
+    return [token for token in re.findall(r"\w+", text.lower()) if token not in STOPWORDS]
+
+
+def chunk_text(text: str, chunk_chars: int = CHUNK_CHARS, overlap_chars: int = CHUNK_OVERLAP_CHARS) -> List[str]:
+    """
+    Split a text into overlapping chunks, preferably at paragraph or sentence ends.
+
+    Args:
+        text (str): The text.
+        chunk_chars (int): Target size of a chunk.
+        overlap_chars (int): Characters repeated at the start of the next chunk.
+
+    Returns:
+        List[str]: The chunks, in order.
+    """
+    text = text.strip()
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + chunk_chars)
+        if end < len(text):
+            # Cut at the last paragraph, line or sentence break of the second half
+            window = text[start + chunk_chars // 2 : end]
+            for separator in ("\n\n", "\n", ". "):
+                cut = window.rfind(separator)
+                if cut != -1:
+                    end = start + chunk_chars // 2 + cut + len(separator)
+                    break
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        # Start the next chunk at a line or word boundary inside the overlap
+        overlap_start = max(start + 1, end - overlap_chars)
+        boundary = max(text.rfind("\n", overlap_start, end), text.find(" ", overlap_start, end))
+        start = boundary + 1 if boundary != -1 else overlap_start
+    return chunks
+
+
+@functools.lru_cache(maxsize=2)
+def get_embedder(model_name: str) -> Any:
+    """
+    Load a sentence-transformers model on CPU, once per process.
+
+    Returns:
+        Any: The model, or None if sentence-transformers is not installed or loading failed.
+    """
+    try:
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer(model_name, device="cpu")
+    except Exception as e:
+        logger.warning(f"Dense retrieval disabled, could not load {model_name}: {e}")
+        return None
+
+
+@dataclass
+class Passage:
+    """A chunk of an indexed document."""
+
+    source: str
+    text: str
+
+
+class RetrievalIndex:
+    """
+    In-memory BM25 index of the chunks of fetched documents, with optional dense vectors.
+
+    With an embedding model, passages are ranked by the reciprocal rank fusion of their
+    BM25 and cosine similarity ranks; embeddings are computed with NumPy on CPU.
+
+    Args:
+        embedding_model (str): sentence-transformers model name, empty for BM25 only.
+    """
+
+    def __init__(self, embedding_model: str = EMBEDDING_MODEL):
+        self.embedding_model = embedding_model
+        self.passages: List[Passage] = []
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self._lengths: List[int] = []
+        self._documents = set()
+        self._vectors: List[Any] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.passages)
+
+    def add(self, text: str, source: str) -> int:
+        """
+        Chunk and index a document; documents already indexed are skipped.
+
+        Args:
+            text (str): The document.
+            source (str): Where it comes from, shown with its passages.
+
+        Returns:
+            int: Number of passages added.
+        """
+        digest = hashlib.sha256(text.encode("utf-8", errors="replace")).digest()
+        chunks = chunk_text(text)
+        vectors = self._embed(chunks) if chunks else None
+        with self._lock:
+            if digest in self._documents:
+                return 0
+            self._documents.add(digest)
+            for chunk in chunks:
+                index = len(self.passages)
+                tokens = tokenize(chunk)
+                self.passages.append(Passage(source, chunk))
+                self._lengths.append(len(tokens))
+                for term, count in Counter(tokens).items():
+                    self._postings[term][index] = count
+            if vectors is not None:
+                self._vectors.extend(vectors)
+        return len(chunks)
+
+    def _embed(self, texts: List[str]) -> Any:
+        if not self.embedding_model:
+            return None
+        embedder = get_embedder(self.embedding_model)
+        if embedder is None:
+            return None
+        return embedder.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+
+    def _bm25(self, query: str) -> Dict[int, float]:
+        count = len(self.passages)
+        average = sum(self._lengths) / count
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for index, frequency in postings.items():
+                norm = frequency + BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[index] / average)
+                scores[index] += idf * frequency * (BM25_K1 + 1) / norm
+        return scores
+
+    def search(self, query: str, top_k: int = DEFAULT_TOP_K) -> List[Passage]:
+        """
+        Return the passages most relevant to a query.
+
+        Args:
+            query (str): The query.
+            top_k (int): Maximum number of passages.
+
+        Returns:
+            List[Passage]: The passages, most relevant first.
+        """
+        with self._lock:
+            if not self.passages:
+                return []
+            bm25 = self._bm25(query)
+            ranking = sorted(bm25, key=bm25.get, reverse=True)
+            if self._vectors and len(self._vectors) == len(self.passages):
+                ranking = self._fuse(query, ranking)
+            return [self.passages[index] for index in ranking[:top_k]]
+
+    def _fuse(self, query: str, bm25_ranking: List[int]) -> List[int]:
+        import numpy as np
+
+        query_vector = self._embed([query])
+        if query_vector is None:
+            return bm25_ranking
+        similarities = np.vstack(self._vectors) @ query_vector[0]
+        dense_ranking = np.argsort(-similarities).tolist()
+        scores: Dict[int, float] = defaultdict(float)
+        for ranking in (bm25_ranking, dense_ranking):
+            for rank, index in enumerate(ranking):
+                scores[index] += 1 / (RRF_K + rank + 1)
+        return sorted(scores, key=scores.get, reverse=True)
+
+
+_fallback_index = RetrievalIndex()
+
+
+def get_task_index() -> RetrievalIndex:
+    """Return the index of the running task, or a process-wide index outside of tasks."""
+    index = _current_index.get()
+    return _fallback_index if index is None else index
+
+
+@contextmanager
+def task_index(embedding_model: str = EMBEDDING_MODEL) -> Iterator[RetrievalIndex]:
+    """
+    Give the current context a fresh index, so concurrent tasks do not see each other's documents.
+
+    Yields:
+        RetrievalIndex: The new index.
+    """
+    token = _current_index.set(RetrievalIndex(embedding_model))
+    try:
+        yield _current_index.get()
+    finally:
+        _current_index.reset(token)
+
+
+def index_tool(tool: Tool) -> Tool:
+    """
+    Index the text outputs of a tool in the index of the running task.
+
+    The tool's `forward` is wrapped in place; outputs are indexed in full, before any
+    truncation of what the agent sees. The first argument of the call (URL, query,
+    file path) is recorded as the source of the passages.
+
+    Args:
+        tool (Tool): The tool to wrap.
+
+    Returns:
+        Tool: The same tool instance.
+    """
+    forward = tool.forward
+    signature = inspect.signature(forward)
+
+    @functools.wraps(forward)
+    def indexed_forward(*args, **kwargs):
+        result = forward(*args, **kwargs)
+        if isinstance(result, str) and result.strip() and not result.startswith("Error"):
+            bound = signature.bind(*args, **kwargs)
+            first = next(iter(bound.arguments.values()), "")
+            try:
+                get_task_index().add(result, f"{tool.name}: {first}")
+            except Exception as e:
+                logger.warning(f"Indexing the output of {tool.name} failed: {e}")
+        return result
+
+    tool.forward = indexed_forward
+    return tool
@@ -0,0 +1,49 @@
+from typing import Optional
+
+from smolagents import Tool
+
+from .retrieval import DEFAULT_TOP_K, get_task_index
+
+
+class SearchContextTool(Tool):
+    """
+    Tool to search the pages and documents fetched so far in the current task.
+
+    Every output of the web, Wikipedia, file and transcript tools is chunked and indexed
+    (see `tools.retrieval`), so the agent can ask for the few passages relevant to a
+    fact instead of rereading whole documents.
+
+    Args:
+        query (str): What to look for.
+        top_k (Optional[int]): Number of passages to return.
+
+    Returns:
+        str: The most relevant passages with their sources.
+    """
+
+    name = "search_context"
+    description = (
+        "Searches every web page, Wikipedia article, file and transcript fetched so far in this "
+        "task and returns only the passages most relevant to the query, with their source. "
+        "Use it to find a fact in long documents instead of reading them again."
+    )
+    inputs = {
+        "query": {"type": "string", "description": "What to look for, e.g. keywords or a question"},
+        "top_k": {
+            "type": "integer",
+            "description": f"Number of passages to return (default {DEFAULT_TOP_K})",
+            "nullable": True,
+        },
+    }
+    output_type = "string"
+
+    def forward(self, query: str, top_k: Optional[int] = None) -> str:
+        index = get_task_index()
+        if not len(index):
+            return "Nothing has been fetched yet in this task; fetch a page or document first."
+        passages = index.search(query, top_k or DEFAULT_TOP_K)
+        if not passages:
+            return f"No passages match {query!r}."
+        return "\n\n".join(
+            f"[{rank}] ({passage.source})\n{passage.text}" for rank, passage in enumerate(passages, start=1)
+        )
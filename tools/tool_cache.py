@@ -0,0 +1,253 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from smolagents import Tool
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_CACHE_DIR = os.getenv("TOOL_CACHE_DIR", ".cache")
+DEFAULT_TTL = float(os.getenv("TOOL_CACHE_TTL", str(7 * 24 * 3600))) or None
+DEFAULT_MAX_DISK_BYTES = int(os.getenv("TOOL_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+
+class ToolCache:
+    """
+    Two-tier key/value cache for tool results: an in-memory LRU in front of an sqlite file.
+
+    Entries expire after `ttl` seconds. When the on-disk tier grows beyond `max_disk_bytes`,
+    the least recently used entries are evicted. Values must be JSON serializable.
+
+    Args:
+        path (Optional[str]): Path of the sqlite file, or None for a memory-only cache.
+        max_memory_entries (int): Maximum number of entries kept in memory.
+        ttl (Optional[float]): Time to live of an entry in seconds, or None for no expiry.
+        max_disk_bytes (int): Maximum total size of the values stored on disk.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_memory_entries: int = 256,
+        ttl: Optional[float] = DEFAULT_TTL,
+        max_disk_bytes: int = DEFAULT_MAX_DISK_BYTES,
+    ):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.ttl = ttl
+        self.max_disk_bytes = max_disk_bytes
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._memory: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT, size INTEGER, created REAL, accessed REAL)"
+            )
+            self._db.commit()
+            self._purge_expired()
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def _purge_expired(self) -> None:
+        if self._db is not None and self.ttl is not None:
+            with self._lock:
+                self._db.execute("DELETE FROM cache WHERE created < ?", (time.time() - self.ttl,))
+                self._db.commit()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        Look up a key.
+
+        Args:
+            key (str): Cache key.
+
+        Returns:
+            Tuple[bool, Any]: Whether the key was found and the cached value.
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and not self._expired(entry[1]):
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return True, entry[0]
+            self._memory.pop(key, None)
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created FROM cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and not self._expired(row[1]):
+                    self._db.execute("UPDATE cache SET accessed = ? WHERE key = ?", (time.time(), key))
+                    self._db.commit()
+                    value = json.loads(row[0])
+                    self._remember(key, value, row[1])
+                    self.stats["disk_hits"] += 1
+                    return True, value
+
+            self.stats["misses"] += 1
+            return False, None
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        Store a value in both tiers.
+
+        Args:
+            key (str): Cache key.
+            value (Any): JSON serializable value.
+        """
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            if self._db is not None:
+                data = json.dumps(value)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                    (key, data, len(data), now, now),
+                )
+                self._evict_disk()
+                self._db.commit()
+            self.stats["stores"] += 1
+
+    def _remember(self, key: str, value: Any, created: float) -> None:
+        self._memory[key] = (value, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self) -> None:
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        rows = self._db.execute("SELECT key, size FROM cache ORDER BY accessed ASC").fetchall()
+        for key, size in rows:
+            if total <= self.max_disk_bytes:
+                break
+            self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._memory.pop(key, None)
+            total -= size
+            self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        """Remove every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM cache")
+                self._db.commit()
+
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from either tier."""
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+
+def file_digest(file_path: str) -> str:
+    """Return the sha256 hex digest of a file's content, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_cache_key(tool_name: str, arguments: Dict[str, Any], version: str = "") -> str:
+    """
+    Build a cache key from a tool name, its call arguments and its configuration.
+
+    String arguments are stripped, and arguments that point to an existing file are
+    replaced by a hash of the file content, so a renamed or re-downloaded copy of the
+    same file still hits the cache.
+
+    Args:
+        tool_name (str): Name of the tool.
+        arguments (Dict[str, Any]): Call arguments, with defaults applied.
+        version (str): Fingerprint of the tool settings that change its results.
+
+    Returns:
+        str: Hex digest identifying the call.
+    """
+    normalized = {}
+    for name, value in sorted(arguments.items()):
+        if isinstance(value, str):
+            value = value.strip()
+            if value and os.path.isfile(value):
+                value = {"file_sha256": file_digest(value)}
+        normalized[name] = value
+    call = {"tool": tool_name, "arguments": normalized}
+    if version:
+        call["version"] = version
+    payload = json.dumps(call, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cache_tool(tool: Tool, cache: ToolCache) -> Tool:
+    """
+    Make a tool serve repeated calls from `cache`.
+
+    The tool's `forward` is wrapped in place. Results that look like errors (strings
+    starting with "Error") and results that are not JSON serializable are not cached.
+    Tools whose results depend on their settings (model, output limits) expose them as a
+    `cache_version` string, so changing a setting does not serve results of the old one.
+
+    Args:
+        tool (Tool): The tool to wrap.
+        cache (ToolCache): Cache to store the results in.
+
+    Returns:
+        Tool: The same tool instance.
+    """
+    forward = tool.forward
+    signature = inspect.signature(forward)
+
+    @functools.wraps(forward)
+    def cached_forward(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = make_cache_key(tool.name, dict(bound.arguments), getattr(tool, "cache_version", ""))
+        hit, value = cache.get(key)
+        if hit:
+            return value
+        result = forward(*args, **kwargs)
+        if isinstance(result, str) and result.startswith("Error"):
+            return result
+        try:
+            cache.set(key, result)
+        except (TypeError, ValueError):
+            logger.debug(f"Result of {tool.name} is not cacheable")
+        return result
+
+    tool.forward = cached_forward
+    return tool
+
+
+_default_cache: Optional[ToolCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_tool_cache() -> ToolCache:
+    """
+    Return the process-wide tool cache stored under TOOL_CACHE_DIR.
+
+    Returns:
+        ToolCache: The shared cache.
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ToolCache(path=os.path.join(DEFAULT_CACHE_DIR, "tool_cache.sqlite"))
+        return _default_cache
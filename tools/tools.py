@@ -1,34 +1,75 @@
-from typing import List
+import os
+from typing import List, Optional
 
-from smolagents import (
-    DuckDuckGoSearchTool,
-    PythonInterpreterTool,
-    Tool,
-    VisitWebpageTool,
-    WikipediaSearchTool,
-)
+from smolagents import Tool
 
 from .describe_image_tool import DescribeImageTool
 from .openai_speech_to_text_tool import OpenAISpeechToTextTool
+from .python_interpreter_tool import SandboxedPythonInterpreterTool
 from .read_file_tool import ReadFileTool
+from .retrieval import index_tool
+from .search_context_tool import SearchContextTool
+from .tool_cache import ToolCache, cache_tool, get_default_tool_cache
+from .web_tools import VisitWebpagesTool, VisitWebpageTool, WebSearchTool, WikipediaSearchTool
+from .wikipedia_snapshot import SNAPSHOT_PATH
+from .wikipedia_snapshot_tool import WikipediaSnapshotTool
 from .youtube_transcription_tool import YouTubeTranscriptionTool
 
+TOOL_CLASSES = [
+    WebSearchTool,
+    SandboxedPythonInterpreterTool,
+    WikipediaSearchTool,
+    VisitWebpageTool,
+    VisitWebpagesTool,
+    OpenAISpeechToTextTool,
+    YouTubeTranscriptionTool,
+    ReadFileTool,
+    DescribeImageTool,
+    SearchContextTool,
+]
+
+# Tools whose result depends on more than their arguments, or that index their pages
+# themselves, are never cached
+UNCACHED_TOOLS = {SandboxedPythonInterpreterTool.name, SearchContextTool.name, VisitWebpagesTool.name}
 
-def get_tools() -> List[Tool]:
+# Tools whose outputs are indexed for `search_context`
+INDEXED_TOOLS = {
+    VisitWebpageTool.name,
+    WikipediaSearchTool.name,
+    ReadFileTool.name,
+    OpenAISpeechToTextTool.name,
+    YouTubeTranscriptionTool.name,
+}
+
+
+def get_tools(cache: Optional[ToolCache] = None, wikipedia_snapshot: str = SNAPSHOT_PATH) -> List[Tool]:
     """
     Returns a list of available tools for the agent.
 
+    Results of deterministic tools are cached in `cache`, or in the shared on-disk
+    tool cache unless the TOOL_CACHE environment variable is set to "0". Outputs of
+    the tools fetching documents are indexed for the `search_context` tool.
+
+    Args:
+        cache (Optional[ToolCache]): Cache for tool results.
+        wikipedia_snapshot (str): Local Wikipedia snapshot answering `wikipedia_search`
+            instead of the live API; empty for the live API.
+
     Returns:
         List[Tool]: List of initialized tool instances.
     """
     tools = [
-        DuckDuckGoSearchTool(),
-        PythonInterpreterTool(),
-        WikipediaSearchTool(),
-        VisitWebpageTool(),
-        OpenAISpeechToTextTool(),
-        YouTubeTranscriptionTool(),
-        ReadFileTool(),
-        DescribeImageTool(),
+        WikipediaSnapshotTool(wikipedia_snapshot)
+        if wikipedia_snapshot and tool_class is WikipediaSearchTool
+        else tool_class()
+        for tool_class in TOOL_CLASSES
     ]
-    return tools
+    uncached = set(UNCACHED_TOOLS)
+    if wikipedia_snapshot:
+        # Snapshot lookups are as fast as the cache, and must not mix with live results
+        uncached.add(WikipediaSnapshotTool.name)
+    if cache is None and os.getenv("TOOL_CACHE", "1") != "0":
+        cache = get_default_tool_cache()
+    if cache is not None:
+        tools = [tool if tool.name in uncached else cache_tool(tool, cache) for tool in tools]
+    return [index_tool(tool) if tool.name in INDEXED_TOOLS else tool for tool in tools]
@@ -0,0 +1,325 @@
+import concurrent.futures
+import contextvars
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.logger import get_logger
+from utils.tracing import tracer
+
+logger = get_logger(__name__)
+
+USER_AGENT = os.getenv(
+    "WEB_USER_AGENT", "Mozilla/5.0 (compatible; GAIA-agent/1.0; +https://huggingface.co/learn/agents-course)"
+)
+TIMEOUT = float(os.getenv("WEB_TIMEOUT", "20"))
+POOL_SIZE = int(os.getenv("WEB_POOL_SIZE", "16"))
+# Pages fetched at once by `fetch_many`
+FETCH_WORKERS = int(os.getenv("WEB_FETCH_WORKERS", "8"))
+# Pages whose validators (ETag, Last-Modified) and body are kept for conditional requests
+VALIDATOR_CACHE_SIZE = int(os.getenv("WEB_VALIDATOR_CACHE_SIZE", "256"))
+SEARCH_URL = os.getenv("WEB_SEARCH_URL", "https://html.duckduckgo.com/html/")
+WIKIPEDIA_API_URL = os.getenv("WIKIPEDIA_API_URL", "https://{language}.wikipedia.org/w/api.php")
+
+# Elements that never hold the main content of a page
+BOILERPLATE_TAGS = ["script", "style", "noscript", "nav", "footer", "header", "aside", "form", "iframe", "svg"]
+# Containers of the main content, most specific first
+MAIN_CONTENT_SELECTORS = ["#mw-content-text", "main", "article", "[role=main]", "#content", ".content", "body"]
+
+_task_pages: contextvars.ContextVar[Optional[Dict[str, "Page"]]] = contextvars.ContextVar("task_pages", default=None)
+
+
+@dataclass
+class Page:
+    """A fetched web page."""
+
+    url: str
+    status: int
+    content_type: str
+    text: str
+    final_url: str = ""
+    revalidated: bool = False
+
+
+class WebClient:
+    """
+    HTTP client shared by the web tools: one pooled session with retries, and
+    conditional requests for pages fetched before.
+
+    The ETag and Last-Modified validators of recently fetched pages are kept with
+    their body; fetching such a page again sends If-None-Match / If-Modified-Since,
+    and a 304 answer reuses the kept body.
+
+    Args:
+        pool_size (int): Connections kept per host.
+        timeout (float): Timeout of a request, in seconds.
+    """
+
+    def __init__(self, pool_size: int = POOL_SIZE, timeout: float = TIMEOUT):
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent": USER_AGENT, "Accept-Language": "en-US,en;q=0.8"})
+        retry = Retry(total=2, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=None)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._validators: "OrderedDict[str, Tuple[Dict[str, str], Page]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "not_modified": 0, "memo_hits": 0}
+
+    def _remember(self, url: str, response: requests.Response, page: Page) -> None:
+        validators = {}
+        if response.headers.get("ETag"):
+            validators["If-None-Match"] = response.headers["ETag"]
+        if response.headers.get("Last-Modified"):
+            validators["If-Modified-Since"] = response.headers["Last-Modified"]
+        if not validators:
+            return
+        with self._lock:
+            self._validators[url] = (validators, page)
+            self._validators.move_to_end(url)
+            while len(self._validators) > VALIDATOR_CACHE_SIZE:
+                self._validators.popitem(last=False)
+
+    def fetch(self, url: str) -> Page:
+        """
+        Fetch a page, from the memo of the running task when it was fetched already.
+
+        Args:
+            url (str): The URL.
+
+        Returns:
+            Page: The page.
+
+        Raises:
+            requests.RequestException: If the request fails or the status is an error.
+        """
+        memo = _task_pages.get()
+        if memo is not None and url in memo:
+            self.stats["memo_hits"] += 1
+            return memo[url]
+
+        with self._lock:
+            known = self._validators.get(url)
+        headers = dict(known[0]) if known else {}
+        with tracer.span("fetch", "http", url=url) as span:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            self.stats["requests"] += 1
+            span.attributes["status"] = response.status_code
+            if response.status_code == 304 and known:
+                self.stats["not_modified"] += 1
+                page = Page(**{**known[1].__dict__, "revalidated": True})
+            else:
+                response.raise_for_status()
+                page = Page(
+                    url=url,
+                    status=response.status_code,
+                    content_type=response.headers.get("Content-Type", ""),
+                    text=response.text,
+                    final_url=response.url,
+                )
+                self._remember(url, response, page)
+            span.attributes["chars"] = len(page.text)
+
+        if memo is not None:
+            memo[url] = page
+        return page
+
+    def fetch_many(
+        self, urls: List[str], max_workers: int = FETCH_WORKERS
+    ) -> List[Tuple[str, Optional[Page], Optional[str]]]:
+        """
+        Fetch several pages concurrently.
+
+        Args:
+            urls (List[str]): The URLs; duplicates are fetched once.
+            max_workers (int): Pages fetched at the same time.
+
+        Returns:
+            List[Tuple[str, Optional[Page], Optional[str]]]: URL, page and error of every
+                distinct URL, in the order given.
+        """
+        unique = list(dict.fromkeys(url.strip() for url in urls if url and url.strip()))
+        if not unique:
+            return []
+        workers = max(1, min(max_workers, len(unique)))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="web-fetch") as pool:
+            # Each fetch runs in a copy of this context, so it sees the task memo and trace
+            futures = [pool.submit(contextvars.copy_context().run, self.fetch, url) for url in unique]
+            results = []
+            for url, future in zip(unique, futures):
+                try:
+                    results.append((url, future.result(), None))
+                except Exception as e:
+                    results.append((url, None, str(e)))
+        return results
+
+    def search(self, query: str, max_results: int = 10) -> List[Dict[str, str]]:
+        """
+        Search the web with the DuckDuckGo HTML endpoint.
+
+        Args:
+            query (str): The query.
+            max_results (int): Maximum number of results.
+
+        Returns:
+            List[Dict[str, str]]: Results with "title", "url" and "snippet".
+        """
+        with tracer.span("search", "http", query=query):
+            response = self.session.post(SEARCH_URL, data={"q": query}, timeout=self.timeout)
+            self.stats["requests"] += 1
+            response.raise_for_status()
+        soup = parse_html(response.text)
+        results = []
+        for result in soup.select(".result"):
+            link = result.select_one("a.result__a")
+            if link is None or not link.get("href"):
+                continue
+            snippet = result.select_one(".result__snippet")
+            results.append(
+                {
+                    "title": link.get_text(" ", strip=True),
+                    "url": _unwrap_redirect(link["href"]),
+                    "snippet": snippet.get_text(" ", strip=True) if snippet else "",
+                }
+            )
+            if len(results) >= max_results:
+                break
+        return results
+
+    def wikipedia_article(self, query: str, language: str = "en") -> Optional[Dict[str, str]]:
+        """
+        Return the plain text of the Wikipedia article best matching a query.
+
+        The query is tried as a title first (following redirects), then searched.
+
+        Args:
+            query (str): Article title or search terms.
+            language (str): Wikipedia language code.
+
+        Returns:
+            Optional[Dict[str, str]]: "title", "url" and "text" of the article, None if nothing matches.
+        """
+        api_url = WIKIPEDIA_API_URL.format(language=language)
+        params = {
+            "action": "query",
+            "prop": "extracts|info",
+            "explaintext": 1,
+            "inprop": "url",
+            "redirects": 1,
+            "format": "json",
+            "formatversion": 2,
+        }
+        for attempt in ("title", "search"):
+            if attempt == "title":
+                lookup = {"titles": query}
+            else:
+                lookup = {"generator": "search", "gsrsearch": query, "gsrlimit": 1}
+            with tracer.span("wikipedia", "http", query=query):
+                response = self.session.get(api_url, params={**params, **lookup}, timeout=self.timeout)
+                self.stats["requests"] += 1
+                response.raise_for_status()
+            pages = response.json().get("query", {}).get("pages", [])
+            page = next((page for page in pages if not page.get("missing") and page.get("extract")), None)
+            if page is not None:
+                return {"title": page["title"], "url": page.get("fullurl", ""), "text": page["extract"]}
+        return None
+
+
+def _unwrap_redirect(href: str) -> str:
+    """Target of a DuckDuckGo redirect link (//duckduckgo.com/l/?uddg=<url>)."""
+    parsed = urlparse(href)
+    target = parse_qs(parsed.query).get("uddg")
+    if target:
+        return unquote(target[0])
+    return "https:" + href if href.startswith("//") else href
+
+
+def parse_html(html: str):
+    """Parse HTML with lxml when available."""
+    from bs4 import BeautifulSoup
+
+    try:
+        return BeautifulSoup(html, "lxml")
+    except Exception:
+        return BeautifulSoup(html, "html.parser")
+
+
+def extract_main_content(html: str) -> Tuple[str, str]:
+    """
+    Extract the title and the main content of an HTML page as Markdown.
+
+    Scripts, navigation, headers, footers and forms are dropped, and the first matching
+    main content container (`main`, `article`, Wikipedia's content...) is kept.
+
+    Args:
+        html (str): The page.
+
+    Returns:
+        Tuple[str, str]: The title and the Markdown content.
+    """
+    from markdownify import markdownify
+
+    soup = parse_html(html)
+    title = soup.title.get_text(strip=True) if soup.title else ""
+    for element in soup(BOILERPLATE_TAGS):
+        element.decompose()
+    container = next(
+        (
+            element
+            for element in (soup.select_one(selector) for selector in MAIN_CONTENT_SELECTORS)
+            if element is not None and len(element.get_text(strip=True)) > 200
+        ),
+        soup.body or soup,
+    )
+    markdown = markdownify(str(container), heading_style="ATX", strip=["img"]).strip()
+    markdown = re.sub(r"[ \t]+\n", "\n", markdown)
+    return title, re.sub(r"\n{3,}", "\n\n", markdown)
+
+
+def page_to_text(page: Page) -> str:
+    """Readable text of a fetched page: main content of HTML pages, other text as is."""
+    content_type = page.content_type.split(";")[0].strip().lower()
+    if content_type and not any(kind in content_type for kind in ("text", "html", "json", "xml")):
+        return f"The page is not text ({content_type}); download {page.url} to a file and read it instead."
+    if "html" in page.content_type or page.text.lstrip()[:100].lower().startswith(("<!doctype html", "<html")):
+        title, content = extract_main_content(page.text)
+        return f"# {title}\n\n{content}" if title else content
+    return page.text
+
+
+_client: Optional[WebClient] = None
+_client_lock = threading.Lock()
+
+
+def get_web_client() -> WebClient:
+    """Return the process-wide web client."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = WebClient()
+        return _client
+
+
+@contextmanager
+def task_memo() -> Iterator[Dict[str, Page]]:
+    """
+    Give the current context a fresh page memo, so a task fetches every URL once.
+
+    Yields:
+        Dict[str, Page]: Pages fetched in the context, by URL.
+    """
+    token = _task_pages.set({})
+    try:
+        yield _task_pages.get()
+    finally:
+        _task_pages.reset(token)
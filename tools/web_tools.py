@@ -0,0 +1,156 @@
+import os
+from typing import List, Optional
+
+from smolagents import Tool
+
+from .retrieval import get_task_index
+from .web import get_web_client, page_to_text
+
+# Pages longer than this are truncated by visit_webpage
+MAX_PAGE_CHARS = int(os.getenv("WEB_PAGE_MAX_CHARS", "40000"))
+# Characters of each page returned by visit_webpages; the full pages are indexed
+BATCH_PAGE_CHARS = int(os.getenv("WEB_BATCH_PAGE_CHARS", "6000"))
+
+
+def _truncate(text: str, limit: int, hint: str) -> str:
+    if len(text) <= limit:
+        return text
+    return text[:limit] + f"\n[... truncated, {len(text) - limit} more characters; {hint}]"
+
+
+class WebSearchTool(Tool):
+    """
+    Tool to search the web through the shared web client.
+
+    Args:
+        query (str): The search query.
+
+    Returns:
+        str: Titles, URLs and snippets of the top results.
+    """
+
+    name = "web_search"
+    description = "Performs a web search (think a Google search) and returns the top results with their URL."
+    inputs = {"query": {"type": "string", "description": "The search query to perform."}}
+    output_type = "string"
+
+    def __init__(self, max_results: int = 10, **kwargs):
+        super().__init__(**kwargs)
+        self.max_results = max_results
+        self.cache_version = f"results={max_results}"
+
+    def forward(self, query: str) -> str:
+        try:
+            results = get_web_client().search(query, self.max_results)
+        except Exception as e:
+            return f"Error searching the web: {e}"
+        if not results:
+            return "No results found! Try a less restrictive/shorter query."
+        return "## Search Results\n\n" + "\n\n".join(
+            f"[{result['title']}]({result['url']})\n{result['snippet']}" for result in results
+        )
+
+
+class VisitWebpageTool(Tool):
+    """
+    Tool to read the main content of a web page as Markdown.
+
+    Pages are fetched once per task and revalidated with conditional requests when
+    fetched again in later tasks.
+
+    Args:
+        url (str): The URL of the page.
+
+    Returns:
+        str: The main content of the page.
+    """
+
+    name = "visit_webpage"
+    description = (
+        "Visits a webpage at the given URL and returns its main content as markdown. "
+        "To read several pages, use visit_webpages instead."
+    )
+    inputs = {"url": {"type": "string", "description": "The url of the webpage to visit."}}
+    output_type = "string"
+    # Settings changing the results, part of the tool cache key
+    cache_version = f"chars={MAX_PAGE_CHARS}"
+
+    def forward(self, url: str) -> str:
+        try:
+            text = page_to_text(get_web_client().fetch(url))
+        except Exception as e:
+            return f"Error fetching the webpage: {e}"
+        return _truncate(text, MAX_PAGE_CHARS, "use search_context to find a passage")
+
+
+class VisitWebpagesTool(Tool):
+    """
+    Tool to read several web pages at once, fetched concurrently.
+
+    Every page is returned truncated to BATCH_PAGE_CHARS characters and indexed in full
+    for `search_context`, so the agent can look for a fact across all of them.
+
+    Args:
+        urls (List[str]): The URLs of the pages.
+
+    Returns:
+        str: The main content of every page, in order, with its URL.
+    """
+
+    name = "visit_webpages"
+    description = (
+        "Visits several webpages at once (fetched in parallel) and returns the beginning of the "
+        "main content of each, as markdown. The full pages can then be searched with search_context."
+    )
+    inputs = {"urls": {"type": "array", "description": "The urls of the webpages to visit."}}
+    output_type = "string"
+
+    def forward(self, urls: List[str]) -> str:
+        if isinstance(urls, str):
+            urls = [urls]
+        sections = []
+        for url, page, error in get_web_client().fetch_many(urls):
+            if page is None:
+                sections.append(f"## {url}\n\nError fetching the webpage: {error}")
+                continue
+            try:
+                text = page_to_text(page)
+            except Exception as e:
+                sections.append(f"## {url}\n\nError reading the webpage: {e}")
+                continue
+            get_task_index().add(text, f"{self.name}: {url}")
+            sections.append(f"## {url}\n\n" + _truncate(text, BATCH_PAGE_CHARS, "use search_context to find a passage"))
+        return "\n\n---\n\n".join(sections) if sections else "Error: no URL given."
+
+
+class WikipediaSearchTool(Tool):
+    """
+    Tool to read a Wikipedia article through the MediaWiki API.
+
+    The query is tried as an article title first, then searched.
+
+    Args:
+        query (str): The topic to look up.
+
+    Returns:
+        str: The text of the article and its URL.
+    """
+
+    name = "wikipedia_search"
+    description = "Searches Wikipedia and returns the full text of the article on the given topic, along with the page URL."
+    inputs = {"query": {"type": "string", "description": "The topic to search on Wikipedia."}}
+    output_type = "string"
+
+    def __init__(self, language: str = "en", **kwargs):
+        super().__init__(**kwargs)
+        self.language = language
+        self.cache_version = f"language={language}"
+
+    def forward(self, query: str) -> str:
+        try:
+            article: Optional[dict] = get_web_client().wikipedia_article(query, self.language)
+        except Exception as e:
+            return f"Error fetching Wikipedia article: {e}"
+        if article is None:
+            return f"No Wikipedia page found for '{query}'. Try a different query."
+        return f"Wikipedia Page: {article['title']}\n\nContent: {article['text']}\n\nRead more: {article['url']}"
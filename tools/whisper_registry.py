@@ -0,0 +1,143 @@
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_MODEL_SIZE = os.getenv("WHISPER_MODEL_SIZE", "small")
+DEFAULT_DEVICE = os.getenv("WHISPER_DEVICE") or None
+DEFAULT_THREADS = int(os.getenv("WHISPER_THREADS", "0")) or None
+DEFAULT_FP16 = os.getenv("WHISPER_FP16", "auto")
+
+
+class WhisperModel:
+    """
+    A loaded Whisper model shared by every caller in the process.
+
+    Whisper installs temporary hooks on the model while decoding, so concurrent
+    inference on one instance is serialized with a lock.
+
+    Args:
+        model (Any): The loaded `whisper.Whisper` model.
+        fp16 (bool): Whether to run inference in half precision.
+        lock (Optional[threading.Lock]): Lock of the weights, shared by the instances
+            wrapping the same model with different settings.
+    """
+
+    def __init__(self, model: Any, fp16: bool, lock: Optional[threading.Lock] = None):
+        self.model = model
+        self.fp16 = fp16
+        self.lock = lock or threading.Lock()
+
+    def transcribe(self, audio: Any, **kwargs) -> Dict[str, Any]:
+        """
+        Transcribe a file path or a 16 kHz waveform with `whisper.transcribe`.
+
+        Args:
+            audio (Any): Path to an audio file or a float32 waveform.
+            **kwargs: Additional keyword arguments for `whisper.transcribe`.
+
+        Returns:
+            Dict[str, Any]: Whisper result with "text", "segments" and "language".
+        """
+        kwargs.setdefault("fp16", self.fp16)
+        with self.lock:
+            return self.model.transcribe(audio, **kwargs)
+
+    def decode_batch(self, waveforms: List[np.ndarray], **kwargs) -> List[str]:
+        """
+        Decode several clips of at most 30 seconds in a single batched forward pass.
+
+        Args:
+            waveforms (List[np.ndarray]): 16 kHz float32 waveforms, longer clips are trimmed.
+            **kwargs: Additional `whisper.DecodingOptions` fields.
+
+        Returns:
+            List[str]: Decoded text for each clip, in order.
+        """
+        import torch
+        import whisper
+
+        if not waveforms:
+            return []
+        mels = torch.stack(
+            [
+                whisper.log_mel_spectrogram(
+                    whisper.pad_or_trim(torch.from_numpy(waveform)),
+                    n_mels=self.model.dims.n_mels,
+                )
+                for waveform in waveforms
+            ]
+        ).to(self.model.device)
+        options = whisper.DecodingOptions(fp16=self.fp16, **kwargs)
+        with self.lock:
+            results = whisper.decode(self.model, mels, options)
+        return [result.text.strip() for result in results]
+
+
+_models: Dict[Tuple[str, Optional[str], bool], WhisperModel] = {}
+_models_lock = threading.Lock()
+# Torch CPU threads set by the first request asking for a number, None if none did
+_threads: Optional[int] = None
+
+
+def _set_threads(threads: Optional[int]) -> None:
+    global _threads
+    if not threads or threads == _threads:
+        return
+    if _threads is not None:
+        # The torch thread count is process-wide, so models cannot differ in it
+        raise ValueError(f"Whisper already runs on {_threads} torch threads in this process, not {threads}")
+    import torch
+
+    torch.set_num_threads(threads)
+    _threads = threads
+
+
+def get_whisper_model(
+    model_size: str = DEFAULT_MODEL_SIZE,
+    device: Optional[str] = DEFAULT_DEVICE,
+    threads: Optional[int] = DEFAULT_THREADS,
+    fp16: Any = DEFAULT_FP16,
+) -> WhisperModel:
+    """
+    Return a process-wide Whisper model, loading it on first use.
+
+    Models are keyed by size, device and half precision setting; the weights of a size
+    and device are loaded once and shared whatever the precision. Defaults come from
+    the WHISPER_MODEL_SIZE, WHISPER_DEVICE, WHISPER_THREADS and WHISPER_FP16
+    environment variables.
+
+    Args:
+        model_size (str): Whisper model name (e.g. "tiny", "base", "small").
+        device (Optional[str]): Torch device, or None to let Whisper pick one.
+        threads (Optional[int]): Number of torch CPU threads, or None to keep the current one.
+        fp16 (Any): True/False for half precision, or "auto" to use it on CUDA only.
+
+    Returns:
+        WhisperModel: The loaded model.
+
+    Raises:
+        ValueError: If `threads` differs from the thread count an earlier call set.
+    """
+    with _models_lock:
+        _set_threads(threads)
+        loaded = next((model for key, model in _models.items() if key[:2] == (model_size, device)), None)
+        if loaded is None:
+            import whisper
+
+            logger.info(f"Loading Whisper model '{model_size}'")
+            weights = whisper.load_model(model_size, device=device)
+            logger.info(f"Whisper model '{model_size}' loaded on {weights.device}")
+        else:
+            weights = loaded.model
+        if isinstance(fp16, str):
+            fp16 = weights.device.type == "cuda" if fp16 == "auto" else fp16.lower() in ("1", "true")
+        key = (model_size, device, bool(fp16))
+        if key not in _models:
+            _models[key] = WhisperModel(weights, fp16=bool(fp16), lock=loaded.lock if loaded else None)
+        return _models[key]
@@ -0,0 +1,236 @@
+import argparse
+import datetime
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, Iterable, Optional, Union
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Local Wikipedia snapshot answering `wikipedia_search` instead of the live API (empty: live)
+SNAPSHOT_PATH = os.getenv("WIKIPEDIA_SNAPSHOT", "")
+# Bytes of the snapshot file memory-mapped by each connection
+MMAP_BYTES = int(os.getenv("WIKIPEDIA_SNAPSHOT_MMAP_MB", "1024")) * 1024 * 1024
+
+# Weights of the title and text columns in the full-text ranking
+TITLE_WEIGHT = 10.0
+TEXT_WEIGHT = 1.0
+# Upper bound of revision dates when no date is asked for
+LATEST = "9999"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    revision_date TEXT NOT NULL DEFAULT '',
+    url TEXT NOT NULL DEFAULT '',
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS articles_title ON articles (title COLLATE NOCASE, revision_date);
+CREATE TABLE IF NOT EXISTS redirects (
+    source TEXT PRIMARY KEY COLLATE NOCASE,
+    target TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+    title, text, content='articles', content_rowid='id', tokenize='porter unicode61'
+);
+"""
+
+
+def revision_bound(as_of: Union[str, int, None]) -> str:
+    """
+    Exclusive upper bound of the revision dates visible "as of" a date.
+
+    Revision dates are ISO 8601 strings, so they compare as text; "2019" admits every
+    revision of 2019, "2019-05" every revision up to the end of May 2019.
+
+    Args:
+        as_of (Union[str, int, None]): A year, "YYYY-MM" or "YYYY-MM-DD"; None for the latest revision.
+
+    Returns:
+        str: The bound.
+
+    Raises:
+        ValueError: If `as_of` is not such a date.
+    """
+    if as_of is None or str(as_of).strip() == "":
+        return LATEST
+    value = str(as_of).strip()
+    match = re.fullmatch(r"(\d{4})(?:-(\d{1,2})(?:-(\d{1,2}))?)?", value)
+    if not match:
+        raise ValueError(f"Expected a year, YYYY-MM or YYYY-MM-DD, got {value!r}")
+    year, month, day = match.groups()
+    if month and not 1 <= int(month) <= 12:
+        raise ValueError(f"Expected a month between 1 and 12, got {value!r}")
+    if day:
+        end = datetime.date(int(year), int(month), int(day)) + datetime.timedelta(days=1)
+        return end.isoformat()
+    if month:
+        end = datetime.date(int(year) + int(month) // 12, int(month) % 12 + 1, 1)
+        return end.isoformat()[:7]
+    return str(int(year) + 1)
+
+
+def fts_query(query: str, operator: str = "AND") -> str:
+    """FTS5 query matching the words of `query`, each quoted so no word is read as syntax."""
+    words = re.findall(r"\w+", query.lower())
+    return f" {operator} ".join(f'"{word}"' for word in words)
+
+
+class WikipediaSnapshot:
+    """
+    Read-only Wikipedia snapshot stored in sqlite, with a full-text index of titles and text.
+
+    The file is memory-mapped (`PRAGMA mmap_size`), so lookups read pages straight from
+    the OS page cache and take milliseconds. A snapshot may keep several revisions of an
+    article, each with its revision date, so questions about the state of an article in
+    a given year get the revision of that time. Each thread gets its own connection.
+
+    Args:
+        path (str): The snapshot file, built with `build_snapshot`.
+        mmap_bytes (int): Bytes of the file memory-mapped by each connection.
+
+    Raises:
+        FileNotFoundError: If the snapshot does not exist.
+    """
+
+    def __init__(self, path: str, mmap_bytes: int = MMAP_BYTES):
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"Wikipedia snapshot not found: {path}")
+        self.path = path
+        self.mmap_bytes = mmap_bytes
+        self._local = threading.local()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """The connection of the calling thread."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(f"file:{os.path.abspath(self.path)}?mode=ro", uri=True)
+            connection.execute(f"PRAGMA mmap_size = {int(self.mmap_bytes)}")
+            connection.execute("PRAGMA query_only = 1")
+            self._local.connection = connection
+        return connection
+
+    def _latest_revision(self, title: str, bound: str) -> Optional[Dict[str, str]]:
+        row = self.connection.execute(
+            "SELECT title, url, revision_date, text FROM articles "
+            "WHERE title = ? COLLATE NOCASE AND revision_date < ? "
+            "ORDER BY revision_date DESC LIMIT 1",
+            (title, bound),
+        ).fetchone()
+        if row is None:
+            return None
+        return {"title": row[0], "url": row[1], "revision_date": row[2], "text": row[3]}
+
+    def _search_title(self, query: str, bound: str) -> Optional[str]:
+        for operator in ("AND", "OR"):
+            match = fts_query(query, operator)
+            if not match:
+                return None
+            row = self.connection.execute(
+                "SELECT articles.title FROM articles_fts JOIN articles ON articles.id = articles_fts.rowid "
+                "WHERE articles_fts MATCH ? AND articles.revision_date < ? "
+                "ORDER BY bm25(articles_fts, ?, ?) LIMIT 1",
+                (match, bound, TITLE_WEIGHT, TEXT_WEIGHT),
+            ).fetchone()
+            if row is not None:
+                return row[0]
+        return None
+
+    def article(self, query: str, as_of: Union[str, int, None] = None) -> Optional[Dict[str, str]]:
+        """
+        Return the article best matching a query, as it was at a date.
+
+        The query is tried as a title first (following redirects, ignoring case), then
+        searched in titles and text.
+
+        Args:
+            query (str): Article title or search terms.
+            as_of (Union[str, int, None]): A year, "YYYY-MM" or "YYYY-MM-DD"; None for the latest revision.
+
+        Returns:
+            Optional[Dict[str, str]]: "title", "url", "revision_date" and "text" of the
+                article, None if nothing matches.
+        """
+        bound = revision_bound(as_of)
+        query = query.strip().replace("_", " ")
+        redirect = self.connection.execute("SELECT target FROM redirects WHERE source = ?", (query,)).fetchone()
+        article = self._latest_revision(redirect[0] if redirect else query, bound)
+        if article is not None:
+            return article
+        title = self._search_title(query, bound)
+        return self._latest_revision(title, bound) if title else None
+
+    def close(self) -> None:
+        """Close the connection of the calling thread."""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+def build_snapshot(path: str, records: Iterable[dict]) -> int:
+    """
+    Build or extend a snapshot from article records.
+
+    Records are dicts with "title" and "text", and optionally "url", "revision_date"
+    (ISO 8601, also read from "timestamp") and "redirects" (titles redirecting to the
+    article). The JSON lines written by WikiExtractor's `--json` mode are such records.
+
+    Args:
+        path (str): The snapshot file.
+        records (Iterable[dict]): The articles.
+
+    Returns:
+        int: Number of articles added.
+    """
+    connection = sqlite3.connect(path)
+    try:
+        connection.executescript(SCHEMA)
+        count = 0
+        for record in records:
+            title = record["title"].strip()
+            cursor = connection.execute(
+                "INSERT INTO articles (title, revision_date, url, text) VALUES (?, ?, ?, ?)",
+                (
+                    title,
+                    record.get("revision_date") or record.get("timestamp") or "",
+                    record.get("url") or "",
+                    record["text"],
+                ),
+            )
+            connection.execute(
+                "INSERT INTO articles_fts (rowid, title, text) VALUES (?, ?, ?)",
+                (cursor.lastrowid, title, record["text"]),
+            )
+            connection.executemany(
+                "INSERT OR REPLACE INTO redirects (source, target) VALUES (?, ?)",
+                [(source, title) for source in record.get("redirects", [])],
+            )
+            count += 1
+        connection.execute("INSERT INTO articles_fts (articles_fts) VALUES ('optimize')")
+        connection.commit()
+        connection.execute("VACUUM")
+    finally:
+        connection.close()
+    return count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build a Wikipedia snapshot from JSON lines of articles.")
+    parser.add_argument("dump", help="JSON lines file, one article per line.")
+    parser.add_argument("snapshot", help="sqlite file to create or extend.")
+    args = parser.parse_args()
+
+    with open(args.dump, encoding="utf-8") as f:
+        count = build_snapshot(args.snapshot, (json.loads(line) for line in f if line.strip()))
+    logger.info(f"Added {count} articles to {args.snapshot}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+from typing import Optional
+
+from smolagents import Tool
+
+from .wikipedia_snapshot import WikipediaSnapshot
+
+
+class WikipediaSnapshotTool(Tool):
+    """
+    Drop-in `wikipedia_search` tool answering from a local Wikipedia snapshot.
+
+    Lookups need no network and return the same article on every run; with `as_of`,
+    the latest revision up to that date is returned.
+
+    Args:
+        query (str): The topic to look up.
+        as_of (Optional[str]): A year, "YYYY-MM" or "YYYY-MM-DD".
+
+    Returns:
+        str: The text of the article, its revision date and its URL.
+    """
+
+    name = "wikipedia_search"
+    description = (
+        "Searches Wikipedia and returns the full text of the article on the given topic, along with the page URL. "
+        "Pass as_of to read the article as it was at that date, e.g. for questions about a given year."
+    )
+    inputs = {
+        "query": {"type": "string", "description": "The topic to search on Wikipedia."},
+        "as_of": {
+            "type": "string",
+            "description": "Optional year ('2019'), month ('2019-05') or date ('2019-05-31') of the revision to read.",
+            "nullable": True,
+        },
+    }
+    output_type = "string"
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.snapshot = WikipediaSnapshot(path)
+
+    def forward(self, query: str, as_of: Optional[str] = None) -> str:
+        try:
+            article = self.snapshot.article(query, as_of)
+        except Exception as e:
+            return f"Error reading the Wikipedia snapshot: {e}"
+        if article is None:
+            when = f" as of {as_of}" if as_of else ""
+            return f"No Wikipedia page found for '{query}'{when}. Try a different query."
+        revision = f"\n\nRevision: {article['revision_date']}" if article["revision_date"] else ""
+        return (
+            f"Wikipedia Page: {article['title']}{revision}\n\nContent: {article['text']}\n\nRead more: {article['url']}"
+        )
@@ -1,26 +1,282 @@
+import os
+import re
+import threading
+from typing import Any, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
 from smolagents import Tool
-from youtube_transcript_api import YouTubeTranscriptApi
+
+from utils.logger import get_logger
+
+from .media import Segment, format_transcript, select_segments, transcribe_parallel, transcription_version
+from .tool_cache import DEFAULT_CACHE_DIR, ToolCache, file_digest
+
+logger = get_logger(__name__)
+
+DEFAULT_LANGUAGE = os.getenv("YOUTUBE_LANGUAGE", "en")
+TRANSCRIPT_STORE_MAX_BYTES = int(os.getenv("YOUTUBE_TRANSCRIPTS_MAX_BYTES", str(128 * 1024 * 1024)))
+
+VIDEO_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{11}$")
+# Path prefixes followed by the video id: /shorts/<id>, /embed/<id>, /live/<id>, /v/<id>
+VIDEO_PATH_PREFIXES = ("shorts", "embed", "live", "v", "e")
+
+
+def _on_domain(host: str, domain: str) -> bool:
+    return host == domain or host.endswith("." + domain)
+
+
+def parse_video_id(video_url: str) -> str:
+    """
+    Extract the 11 character video id from any form of YouTube URL, or a bare id.
+
+    Handles watch URLs with extra parameters (`&t=`, `&list=`), youtu.be short links,
+    shorts, embed and live URLs, and mobile or music subdomains.
+
+    Args:
+        video_url (str): YouTube URL or video id.
+
+    Returns:
+        str: The video id.
+
+    Raises:
+        ValueError: If no video id can be found.
+    """
+    value = video_url.strip().strip("<>\"'")
+    if VIDEO_ID_PATTERN.match(value):
+        return value
+    if "://" not in value:
+        value = "https://" + value
+
+    url = urlparse(value)
+    host = (url.hostname or "").lower()
+    parts = [part for part in url.path.split("/") if part]
+    candidates = []
+    if _on_domain(host, "youtu.be"):
+        candidates = parts[:1]
+    elif _on_domain(host, "youtube.com") or _on_domain(host, "youtube-nocookie.com"):
+        candidates = parse_qs(url.query).get("v", [])
+        if len(parts) >= 2 and parts[0] in VIDEO_PATH_PREFIXES:
+            candidates.append(parts[1])
+    for candidate in candidates:
+        if VIDEO_ID_PATTERN.match(candidate):
+            return candidate
+    raise ValueError(f"Could not find a YouTube video id in {video_url!r}")
+
+
+def _raw_entries(fetched: Any) -> List[dict]:
+    """Transcript entries as dicts, for both the 0.x and 1.x youtube-transcript-api."""
+    if hasattr(fetched, "to_raw_data"):
+        return fetched.to_raw_data()
+    return [
+        entry if isinstance(entry, dict) else {"text": entry.text, "start": entry.start, "duration": entry.duration}
+        for entry in fetched
+    ]
 
 
 class YouTubeTranscriptionTool(Tool):
     """
     Tool to fetch the transcript of a YouTube video given its URL.
 
+    Transcripts are kept in a persistent store keyed by video id and language, with
+    least recently used entries evicted when it grows too large. When no caption
+    exists in the requested language, generated captions, translated captions and
+    captions in other languages are tried in that order; when the video has no
+    captions at all, a local audio file of the video can be transcribed with Whisper
+    instead. Long transcripts are returned with timestamps, and the agent can ask for
+    a time window or for the segments mentioning some keywords.
+
     Args:
         video_url (str): YouTube video URL.
+        language (Optional[str]): Preferred transcript language code.
+        start_time (Optional[float]): Start of the time window in seconds.
+        end_time (Optional[float]): End of the time window in seconds.
+        query (Optional[str]): Keywords; only the matching segments are returned.
+        audio_path (Optional[str]): Local audio of the video, transcribed if there are no captions.
 
     Returns:
-        str: Transcript of the video as a single string.
+        str: Transcript of the video, or of the selected part of it.
     """
 
     name = "youtube_transcription"
-    description = "Fetches the transcript of a YouTube video given its URL"
+    description = (
+        "Fetches the transcript of a YouTube video given its URL. Long transcripts are returned "
+        "with timestamps; pass start_time/end_time (seconds) for a time window, or query to "
+        "return only the segments mentioning some keywords. If the video has no captions, pass "
+        "audio_path with a local audio file of the video to transcribe it instead."
+    )
     inputs = {
         "video_url": {"type": "string", "description": "YouTube video URL"},
+        "language": {
+            "type": "string",
+            "description": "Preferred transcript language code, e.g. 'en' (default)",
+            "nullable": True,
+        },
+        "start_time": {
+            "type": "number",
+            "description": "Start of the time window, in seconds",
+            "nullable": True,
+        },
+        "end_time": {
+            "type": "number",
+            "description": "End of the time window, in seconds",
+            "nullable": True,
+        },
+        "query": {
+            "type": "string",
+            "description": "Keywords; only the transcript segments mentioning them are returned",
+            "nullable": True,
+        },
+        "audio_path": {
+            "type": "string",
+            "description": "Local audio file of the video, transcribed when the video has no captions",
+            "nullable": True,
+        },
     }
     output_type = "string"
 
-    def forward(self, video_url: str) -> str:
-        video_id = video_url.strip().split("v=")[-1]
-        transcript = YouTubeTranscriptApi.get_transcript(video_id)
-        return " ".join([entry["text"] for entry in transcript])
+    # Settings changing the transcripts, part of the tool cache key
+    cache_version = f"language={DEFAULT_LANGUAGE},{transcription_version()}"
+
+    def __init__(self, transcript_api: Any = None, store: Optional[ToolCache] = None, **kwargs):
+        super().__init__(**kwargs)
+        self._transcript_api = transcript_api
+        self._store = store
+        self._lock = threading.Lock()
+
+    @property
+    def transcript_api(self) -> Any:
+        """The transcript API client (a stub can be injected in the constructor)."""
+        with self._lock:
+            if self._transcript_api is None:
+                from youtube_transcript_api import YouTubeTranscriptApi
+
+                self._transcript_api = YouTubeTranscriptApi()
+            return self._transcript_api
+
+    @property
+    def store(self) -> ToolCache:
+        """The persistent transcript store."""
+        with self._lock:
+            if self._store is None:
+                self._store = ToolCache(
+                    path=os.path.join(DEFAULT_CACHE_DIR, "youtube_transcripts.sqlite"),
+                    ttl=None,
+                    max_disk_bytes=TRANSCRIPT_STORE_MAX_BYTES,
+                )
+            return self._store
+
+    def fetch_transcript(self, video_id: str, language: str = DEFAULT_LANGUAGE) -> Tuple[List[Segment], str]:
+        """
+        Fetch the transcript of a video, falling back on other caption tracks.
+
+        The order is: manual captions in `language` (or English), generated captions in
+        those languages, a caption track translated to `language`, any caption track.
+
+        Args:
+            video_id (str): The video id.
+            language (str): Preferred language code.
+
+        Returns:
+            Tuple[List[Segment], str]: The transcript and a description of the track used.
+        """
+        api = self.transcript_api
+        transcripts = api.list(video_id) if hasattr(api, "list") else api.list_transcripts(video_id)
+        languages = list(dict.fromkeys([language, DEFAULT_LANGUAGE, "en"]))
+        transcript, source = None, None
+        for finder, kind in (
+            (transcripts.find_manually_created_transcript, "manual"),
+            (transcripts.find_generated_transcript, "auto-generated"),
+        ):
+            try:
+                transcript, source = finder(languages), kind
+                break
+            except Exception:
+                continue
+        if transcript is None:
+            available = list(transcripts)
+            if not available:
+                raise LookupError(f"No captions available for video {video_id}")
+            transcript = next((t for t in available if getattr(t, "is_translatable", False)), available[0])
+            source = "original"
+            if getattr(transcript, "is_translatable", False):
+                try:
+                    transcript, source = transcript.translate(language), "translated"
+                except Exception:
+                    pass
+
+        segments = [
+            Segment(entry["start"], entry["start"] + entry.get("duration", 0.0), entry["text"])
+            for entry in _raw_entries(transcript.fetch())
+        ]
+        return segments, f"{source} captions ({getattr(transcript, 'language_code', language)})"
+
+    def get_segments(
+        self, video_id: str, language: str, audio_path: Optional[str] = None
+    ) -> Tuple[List[Segment], str]:
+        """
+        Return the transcript of a video from the store, fetching or transcribing it on a miss.
+
+        Captions are stored under the video; a local transcription only under the content
+        of the audio file and the Whisper settings, so it never stands for the video's
+        captions and the captions are looked up again on the next call.
+
+        Args:
+            video_id (str): The video id.
+            language (str): Preferred language code.
+            audio_path (Optional[str]): Local audio used when the video has no captions.
+
+        Returns:
+            Tuple[List[Segment], str]: The transcript and a description of its source.
+        """
+        key = f"{video_id}:{language}"
+        hit, value = self.store.get(key)
+        if hit:
+            return [Segment(*entry) for entry in value["segments"]], value["source"]
+
+        try:
+            segments, source = self.fetch_transcript(video_id, language)
+        except Exception as e:
+            if not audio_path:
+                raise
+            if not os.path.exists(audio_path):
+                raise FileNotFoundError(f"Audio file not found at {audio_path}") from e
+            key = f"audio:{file_digest(audio_path)}:{transcription_version()}"
+            hit, value = self.store.get(key)
+            if hit:
+                return [Segment(*entry) for entry in value["segments"]], value["source"]
+            logger.info(f"No captions for {video_id} ({e}), transcribing {audio_path} locally")
+            segments, source = transcribe_parallel(audio_path), "local Whisper transcription"
+
+        self.store.set(
+            key, {"source": source, "segments": [[s.start, s.end, s.text] for s in segments]}
+        )
+        return segments, source
+
+    def forward(
+        self,
+        video_url: str,
+        language: Optional[str] = None,
+        start_time: Optional[float] = None,
+        end_time: Optional[float] = None,
+        query: Optional[str] = None,
+        audio_path: Optional[str] = None,
+    ) -> str:
+        try:
+            video_id = parse_video_id(video_url)
+        except ValueError as e:
+            return f"Error: {e}"
+
+        try:
+            segments, source = self.get_segments(video_id, language or DEFAULT_LANGUAGE, audio_path)
+        except Exception as e:
+            return (
+                f"Error fetching the transcript of video {video_id}: {e}. "
+                "If the video has no captions, pass audio_path with a local audio file of it."
+            )
+
+        selected = start_time is not None or end_time is not None or bool(query)
+        segments = select_segments(segments, start_time, end_time, query)
+        transcript = format_transcript(segments, selected=selected)
+        if source.startswith("manual"):
+            return transcript
+        return f"[Transcript from {source}]\n{transcript}"
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_ATTACHMENTS_DIR = os.getenv("ATTACHMENTS_DIR", os.path.join(".cache", "attachments"))
+# Seconds a task without attachment is remembered before the files endpoint is asked again
+MISSING_TTL = float(os.getenv("ATTACHMENTS_MISSING_TTL", "3600"))
+
+
+def filename_from_response(response: requests.Response, task_id: str) -> str:
+    """
+    Get the attachment filename from the Content-Disposition header or the URL.
+
+    Args:
+        response (requests.Response): Response of the files endpoint.
+        task_id (str): The task identifier.
+
+    Returns:
+        str: Filename to store the attachment under.
+    """
+    content_disposition = response.headers.get("Content-Disposition")
+    if content_disposition and "filename=" in content_disposition:
+        filename = content_disposition.split("filename=")[-1].strip('"')
+    else:
+        filename = response.url.split("/")[-1]
+        if not filename or filename == str(task_id):
+            filename = f"file_{task_id}"
+    return os.path.basename(filename)
+
+
+class AttachmentPrefetcher:
+    """
+    Downloads task attachments ahead of time into a content-addressed local cache.
+
+    Bodies are streamed to disk in chunks over a pooled `requests.Session` and stored as
+    `<cache_dir>/<sha256>/<filename>`, so identical files are kept once. The mapping of
+    attachment URLs to files is persisted, so reruns do not touch the network for known
+    tasks; tasks without a file are only remembered for `missing_ttl` seconds.
+
+    Args:
+        files_url (str): Base URL of the files endpoint (`{files_url}/{task_id}`).
+        cache_dir (str): Directory of the local attachment cache.
+        max_workers (int): Number of concurrent downloads.
+        timeout (float): Connect/read timeout of a request in seconds.
+        chunk_size (int): Size of the chunks streamed to disk.
+        missing_ttl (float): Seconds a task without attachment is remembered.
+    """
+
+    def __init__(
+        self,
+        files_url: str,
+        cache_dir: str = DEFAULT_ATTACHMENTS_DIR,
+        max_workers: int = 8,
+        timeout: float = 15,
+        chunk_size: int = 1024 * 1024,
+        missing_ttl: float = MISSING_TTL,
+    ):
+        self.files_url = files_url.rstrip("/")
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.missing_ttl = missing_ttl
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._index_path = os.path.join(cache_dir, "index.json")
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index: Dict[str, Dict[str, Any]] = self._load_index()
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        # Entries are {"path": file or None, "time": when it was looked up}, by attachment URL
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        return {url: entry for url, entry in index.items() if isinstance(entry, dict)}
+
+    def _save_index(self) -> None:
+        # Keep the entries written meanwhile by other processes (e.g. evaluation shards)
+        self._index = {**self._load_index(), **self._index}
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            json.dump(self._index, file)
+        os.replace(tmp_path, self._index_path)
+
+    def download(self, task_id: str) -> Optional[str]:
+        """
+        Download the attachment of a task, or return it from the local cache.
+
+        Args:
+            task_id (str): The task identifier.
+
+        Returns:
+            Optional[str]: Path to the attachment, or None if the task has no file.
+        """
+        url = f"{self.files_url}/{task_id}"
+        with self._lock:
+            entry = self._index.get(url)
+            if entry is not None:
+                cached = entry["path"]
+                if cached is None and time.time() - entry["time"] < self.missing_ttl:
+                    return None
+                if cached is not None and os.path.exists(cached):
+                    return cached
+
+        file_path = None
+        with self.session.get(url, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 200:
+                file_path = self._store(response, task_id)
+            elif response.status_code != 404:
+                response.raise_for_status()
+
+        with self._lock:
+            self._index[url] = {"path": file_path, "time": time.time()}
+            self._save_index()
+        if file_path:
+            logger.info(f"Downloaded file for task {task_id} to {file_path}")
+        return file_path
+
+    def _store(self, response: requests.Response, task_id: str) -> Optional[str]:
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    file.write(chunk)
+            if size == 0:
+                return None
+            target_dir = os.path.join(self.cache_dir, digest.hexdigest())
+            file_path = os.path.join(target_dir, filename_from_response(response, task_id))
+            os.makedirs(target_dir, exist_ok=True)
+            if os.path.exists(file_path):
+                return file_path
+            existing = os.listdir(target_dir)
+            if existing:
+                # Same content under another name: hard link instead of storing a copy
+                try:
+                    os.link(os.path.join(target_dir, existing[0]), file_path)
+                    return file_path
+                except OSError:
+                    pass
+            os.replace(tmp_path, file_path)
+            return file_path
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def prefetch(self, task_ids: Iterable[str]) -> None:
+        """
+        Start downloading the attachments of the given tasks in the background.
+
+        Args:
+            task_ids (Iterable[str]): Identifiers of the tasks to prefetch.
+        """
+        with self._lock:
+            for task_id in task_ids:
+                if task_id not in self._futures:
+                    self._futures[task_id] = self._executor.submit(self.download, task_id)
+
+    def get(self, task_id: str) -> Optional[str]:
+        """
+        Return the attachment of a task, waiting for its prefetch if it is still running.
+
+        Download errors are logged and reported as a missing file.
+
+        Args:
+            task_id (str): The task identifier.
+
+        Returns:
+            Optional[str]: Path to the attachment, or None if there is none.
+        """
+        self.prefetch([task_id])
+        try:
+            return self._futures[task_id].result()
+        except Exception as e:
+            logger.error(f"Error downloading file for task {task_id}: {e}")
+            return None
+
+    def close(self) -> None:
+        """Stop pending downloads and release the HTTP connections."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+DEFAULT_CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", os.path.join(".cache", "checkpoints.jsonl"))
+
+
+def config_fingerprint(**config: Any) -> str:
+    """
+    Hash an agent configuration (model, prompt, tools...) into a short identifier.
+
+    Args:
+        **config: JSON serializable configuration values.
+
+    Returns:
+        str: Hex digest of the configuration.
+    """
+    payload = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class CheckpointStore:
+    """
+    Append-only JSONL store of per-task answers, keyed by task id and agent configuration.
+
+    Every answer is flushed and fsynced as soon as it is recorded, so a crashed run can be
+    resumed by skipping the tasks that already have an answer for the same configuration.
+
+    Args:
+        fingerprint (str): Fingerprint of the agent configuration, see `config_fingerprint`.
+        path (str): Path of the JSONL checkpoint file.
+    """
+
+    def __init__(self, fingerprint: str, path: str = DEFAULT_CHECKPOINT_PATH):
+        self.fingerprint = fingerprint
+        self.path = path
+        self._answers: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash mid-write
+                    continue
+                if record.get("config") == self.fingerprint:
+                    self._answers[record["task_id"]] = record
+
+    def get(self, task_id: str) -> Optional[str]:
+        """
+        Return the checkpointed answer of a task, if any.
+
+        Args:
+            task_id (str): The task identifier.
+
+        Returns:
+            Optional[str]: The answer, or None if the task has not been answered yet.
+        """
+        record = self._answers.get(task_id)
+        return record["submitted_answer"] if record else None
+
+    def record(self, task_id: str, submitted_answer: str, **extra: Any) -> None:
+        """
+        Durably append the answer of a task.
+
+        Args:
+            task_id (str): The task identifier.
+            submitted_answer (str): The agent's answer.
+            **extra: Additional JSON serializable fields stored with the answer.
+        """
+        record = {
+            "task_id": task_id,
+            "config": self.fingerprint,
+            "submitted_answer": submitted_answer,
+            "timestamp": time.time(),
+            **extra,
+        }
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(record, default=str) + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+            self._answers[task_id] = record
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._answers
+
+    def __len__(self) -> int:
+        return len(self._answers)
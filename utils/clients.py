@@ -0,0 +1,64 @@
+import os
+import threading
+from typing import Any, Dict
+
+from utils.transport import Transport, get_async_http_client, get_http_client, get_transport
+
+# Clients by whether their calls go through the shared transport
+_openai_clients: Dict[bool, Any] = {}
+_async_openai_clients: Dict[bool, Any] = {}
+_openai_client_lock = threading.Lock()
+
+
+def get_openai_client(transport: bool = True) -> Any:
+    """
+    Return the process-wide OpenAI client, creating it on first use.
+
+    The client is thread-safe and uses the pooled keep-alive HTTP client, so every tool
+    and agent in the process shares it. Calls are meant to go through
+    `get_openai_transport().call(...)`, so the client's own retries are disabled;
+    callers that do not use the transport get a client keeping the SDK's retries.
+
+    Args:
+        transport (bool): Whether calls go through `get_openai_transport()`.
+
+    Returns:
+        openai.OpenAI: The shared client.
+    """
+    with _openai_client_lock:
+        if transport not in _openai_clients:
+            from openai import OpenAI
+
+            retries = {"max_retries": 0} if transport else {}
+            _openai_clients[transport] = OpenAI(http_client=get_http_client(), **retries)
+        return _openai_clients[transport]
+
+
+def get_async_openai_client(transport: bool = True) -> Any:
+    """
+    Return the process-wide async OpenAI client, creating it on first use.
+
+    Args:
+        transport (bool): Whether calls go through `get_openai_transport().acall`;
+            the client's own retries are disabled only then.
+
+    Returns:
+        openai.AsyncOpenAI: The shared async client.
+    """
+    with _openai_client_lock:
+        if transport not in _async_openai_clients:
+            from openai import AsyncOpenAI
+
+            retries = {"max_retries": 0} if transport else {}
+            _async_openai_clients[transport] = AsyncOpenAI(http_client=get_async_http_client(), **retries)
+        return _async_openai_clients[transport]
+
+
+def get_openai_transport() -> Transport:
+    """
+    Return the transport (rate limit, retries, hedging) of the OpenAI API key.
+
+    Returns:
+        Transport: The transport shared with the OpenAI model backend.
+    """
+    return get_transport(os.getenv("OPENAI_API_KEY"))
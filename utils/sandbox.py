@@ -0,0 +1,460 @@
+import atexit
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.connection import Connection
+from typing import Any, Dict, List, Optional, Tuple
+
+from smolagents.local_python_executor import (
+    BASE_BUILTIN_MODULES,
+    BASE_PYTHON_TOOLS,
+    DEFAULT_MAX_LEN_OUTPUT,
+    InterpreterError,
+    PythonExecutor,
+    evaluate_python_code,
+)
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Generated code runs in worker processes unless CODE_SANDBOX is "0"
+SANDBOX_ENABLED = os.getenv("CODE_SANDBOX", "1") != "0" and os.name == "posix"
+# Limits of one code snippet: CPU seconds, wall seconds (tool calls excluded) and
+# memory of the worker on top of what it uses once warm
+CPU_SECONDS = float(os.getenv("SANDBOX_CPU_SECONDS", "60"))
+WALL_SECONDS = float(os.getenv("SANDBOX_WALL_SECONDS", "120"))
+MEMORY_MB = int(os.getenv("SANDBOX_MEMORY_MB", "2048"))
+# Number of warm workers kept ready (one per concurrent task by default), and the
+# modules they import before being handed out
+WARM_WORKERS = int(os.getenv("SANDBOX_WARM_WORKERS", os.getenv("AGENT_MAX_WORKERS", "4")))
+PRELOAD_MODULES = [name for name in os.getenv("SANDBOX_PRELOAD", "numpy,pandas").split(",") if name]
+# Seconds a new worker may take to import the preloaded modules
+STARTUP_TIMEOUT = 120.0
+# Healthy workers are reset and reused for this many runs before being replaced
+MAX_RUNS_PER_WORKER = int(os.getenv("SANDBOX_MAX_RUNS_PER_WORKER", "50"))
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class SandboxError(InterpreterError):
+    """
+    A code snippet exceeded a limit or its worker died; the worker's variables are lost.
+
+    Args:
+        message (str): The error message.
+        reason (str): "wall_limit" or "crashed".
+    """
+
+    def __init__(self, message: str, reason: str = "crashed"):
+        super().__init__(message)
+        self.reason = reason
+
+
+class CPUTimeExceeded(Exception):
+    pass
+
+
+class _ToolProxy:
+    """Callable standing for a tool of the parent process inside a worker."""
+
+    def __init__(self, conn: Connection, name: str):
+        self.conn = conn
+        self.name = name
+
+    def __call__(self, *args, **kwargs):
+        self.conn.send(("tool", self.name, args, kwargs))
+        ok, value = self.conn.recv()
+        if not ok:
+            raise RuntimeError(value)
+        return value
+
+
+def _limit_memory(megabytes: int) -> None:
+    """Cap the address space of this process at its current size plus `megabytes`."""
+    import resource
+
+    with open("/proc/self/statm") as file:
+        current = int(file.read().split()[0]) * resource.getpagesize()
+    limit = current + megabytes * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, resource.getrlimit(resource.RLIMIT_AS)[1]))
+
+
+def _limit_cpu(seconds: Optional[float]) -> None:
+    """Raise CPUTimeExceeded once this process used `seconds` more CPU time (None lifts the limit)."""
+    import resource
+
+    hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+    if seconds is None:
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = int(usage.ru_utime + usage.ru_stime + seconds) + 1
+    resource.setrlimit(resource.RLIMIT_CPU, (soft if hard == resource.RLIM_INFINITY else min(soft, hard), hard))
+
+
+def _on_cpu_limit(signum, frame):
+    raise CPUTimeExceeded(f"CPU time limit of {CPU_SECONDS:.0f}s exceeded")
+
+
+def serve(conn: Connection) -> None:
+    """
+    Worker loop: preload modules, then run code snippets sent by the parent.
+
+    Messages from the parent are ("variables", dict), ("reset",) and ("run", code,
+    tool names, authorized imports, max print length); each run is answered with
+    ("done", ok, output, logs, is_final_answer, error), after ("tool", ...) requests
+    for the tools the snippet calls.
+    """
+    for name in PRELOAD_MODULES:
+        try:
+            __import__(name)
+        except ImportError:
+            pass
+    if MEMORY_MB > 0:
+        _limit_memory(MEMORY_MB)
+    signal.signal(signal.SIGXCPU, _on_cpu_limit)
+    conn.send(("ready",))
+
+    state: Dict[str, Any] = {"__name__": "__main__"}
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message[0] == "variables":
+            state.update(message[1])
+            continue
+        if message[0] == "reset":
+            state = {"__name__": "__main__"}
+            continue
+        _, code, tool_names, authorized_imports, max_print_outputs_length = message
+        tools = {name: _ToolProxy(conn, name) for name in tool_names}
+        output, is_final_answer, error = None, False, None
+        _limit_cpu(CPU_SECONDS if CPU_SECONDS > 0 else None)
+        try:
+            output, is_final_answer = evaluate_python_code(
+                code,
+                static_tools={**tools, **BASE_PYTHON_TOOLS},
+                custom_tools={},
+                state=state,
+                authorized_imports=authorized_imports,
+                max_print_outputs_length=max_print_outputs_length,
+            )
+        except Exception as e:
+            error = str(e)
+        finally:
+            _limit_cpu(None)
+        logs = str(state.get("_print_outputs", ""))
+        try:
+            conn.send(("done", error is None, output, logs, is_final_answer, error))
+        except Exception:
+            # Unpicklable output: send its text instead
+            conn.send(("done", error is None, str(output), logs, is_final_answer, error))
+
+
+class SandboxWorker:
+    """A worker process and the connection to it."""
+
+    def __init__(self):
+        parent_socket, child_socket = socket.socketpair()
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "utils.sandbox", str(child_socket.fileno())],
+            cwd=ROOT_DIR,
+            pass_fds=(child_socket.fileno(),),
+            stdin=subprocess.DEVNULL,
+        )
+        child_socket.close()
+        self.conn = Connection(parent_socket.detach())
+        self.ready = False
+        self.runs = 0
+        self._ready_lock = threading.Lock()
+
+    def wait_ready(self, timeout: float = STARTUP_TIMEOUT) -> bool:
+        """Wait until the worker imported its preloaded modules."""
+        with self._ready_lock:
+            if not self.ready and self.conn.poll(timeout):
+                try:
+                    self.ready = self.conn.recv() == ("ready",)
+                except (EOFError, OSError):
+                    return False
+            return self.ready
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def kill(self) -> None:
+        """Kill the worker process."""
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+        if self.alive():
+            self.process.kill()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+
+
+class SandboxPool:
+    """
+    Pool of warm worker processes running untrusted code, one worker per agent run.
+
+    `size` workers are started ahead of time and have the preloaded modules imported,
+    so handing one out is immediate. A released worker has its variables cleared and
+    goes back to the pool; workers that exceeded a limit, died or served
+    MAX_RUNS_PER_WORKER runs are killed and replaced in the background.
+
+    Args:
+        size (int): Number of warm workers kept ready.
+    """
+
+    def __init__(self, size: int = WARM_WORKERS):
+        self.size = size
+        self._idle: List[SandboxWorker] = []
+        self._busy: set = set()
+        self._lock = threading.Lock()
+        self.stats = {"started": 0, "killed": 0, "cpu_limit": 0, "wall_limit": 0, "crashed": 0}
+        self._top_up()
+
+    def _top_up(self) -> None:
+        with self._lock:
+            missing = self.size - len(self._idle)
+            for _ in range(max(0, missing)):
+                self._idle.append(SandboxWorker())
+                self.stats["started"] += 1
+
+    def wait_warm(self, timeout: float = STARTUP_TIMEOUT) -> int:
+        """
+        Wait until the idle workers imported their preloaded modules.
+
+        Returns:
+            int: Number of warm workers.
+        """
+        with self._lock:
+            idle = list(self._idle)
+        deadline = time.monotonic() + timeout
+        return sum(worker.wait_ready(max(0.0, deadline - time.monotonic())) for worker in idle)
+
+    def acquire(self) -> SandboxWorker:
+        """Return a warm worker, starting one if none is ready."""
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop(0)
+                if worker.alive():
+                    break
+                worker.kill()
+            else:
+                worker = SandboxWorker()
+                self.stats["started"] += 1
+            self._busy.add(worker)
+        threading.Thread(target=self._top_up, daemon=True).start()
+        if not worker.wait_ready():
+            self.release(worker, "crashed")
+            raise SandboxError("The code sandbox worker failed to start")
+        return worker
+
+    def release(self, worker: SandboxWorker, reason: Optional[str] = None) -> None:
+        """
+        Return a worker handed out by `acquire` to the pool, or kill it.
+
+        Args:
+            worker (SandboxWorker): The worker.
+            reason (Optional[str]): "wall_limit" or "crashed" if it must be killed.
+        """
+        worker.runs += 1
+        reusable = reason is None and worker.alive() and worker.runs < MAX_RUNS_PER_WORKER
+        if reusable:
+            try:
+                worker.conn.send(("reset",))
+            except OSError:
+                reusable = False
+        with self._lock:
+            self._busy.discard(worker)
+            if reusable:
+                # Warm workers are handed out first; spares beyond `size` are dropped
+                self._idle.insert(0, worker)
+                surplus = self._idle[self.size :]
+                del self._idle[self.size :]
+            else:
+                surplus = [worker]
+                if reason:
+                    self.stats[reason] += 1
+            self.stats["killed"] += len(surplus)
+        for extra in surplus:
+            extra.kill()
+        if not reusable:
+            threading.Thread(target=self._top_up, daemon=True).start()
+
+    def shutdown(self) -> None:
+        """Kill every worker."""
+        with self._lock:
+            workers = self._idle + list(self._busy)
+            self._idle, self._busy = [], set()
+        for worker in workers:
+            worker.kill()
+
+
+_pool: Optional[SandboxPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_sandbox_pool() -> SandboxPool:
+    """Return the process-wide sandbox pool, started on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SandboxPool()
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def run_in_worker(
+    worker: SandboxWorker,
+    code: str,
+    tools: Dict[str, Any],
+    authorized_imports: List[str],
+    max_print_outputs_length: int = DEFAULT_MAX_LEN_OUTPUT,
+    wall_seconds: float = WALL_SECONDS,
+) -> Tuple[Any, str, bool]:
+    """
+    Run a snippet in a worker, serving its tool calls in this process.
+
+    Args:
+        worker (SandboxWorker): The worker.
+        code (str): The code.
+        tools (Dict[str, Any]): Tools callable from the code, by name.
+        authorized_imports (List[str]): Modules the code may import.
+        max_print_outputs_length (int): Maximum length of the printed outputs.
+        wall_seconds (float): Wall time limit, time spent in tool calls excluded.
+
+    Returns:
+        Tuple[Any, str, bool]: Output, printed logs and whether `final_answer` was called.
+
+    Raises:
+        InterpreterError: If the code failed, with the printed logs as `logs`;
+            SandboxError if it exceeded a limit or killed its worker, which must then
+            be released.
+    """
+    worker.conn.send(("run", code, list(tools), authorized_imports, max_print_outputs_length))
+    deadline = time.monotonic() + wall_seconds if wall_seconds > 0 else None
+    while True:
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            if not worker.conn.poll(timeout):
+                raise SandboxError(
+                    f"Code execution exceeded the wall time limit of {wall_seconds:.0f}s and was stopped. "
+                    "Variables defined in earlier steps were lost.",
+                    reason="wall_limit",
+                )
+            message = worker.conn.recv()
+        except (EOFError, OSError) as e:
+            raise SandboxError(
+                "Code execution crashed, probably by exceeding the memory or CPU limit. "
+                "Variables defined in earlier steps were lost."
+            ) from e
+
+        if message[0] == "tool":
+            _, name, args, kwargs = message
+            started = time.monotonic()
+            try:
+                reply = (True, tools[name](*args, **kwargs))
+            except Exception as e:
+                reply = (False, f"{type(e).__name__}: {e}")
+            try:
+                worker.conn.send(reply)
+            except Exception:
+                worker.conn.send((True, str(reply[1])))
+            if deadline is not None:
+                deadline += time.monotonic() - started
+            continue
+
+        _, ok, output, logs, is_final_answer, error = message
+        if not ok:
+            exception = InterpreterError(error)
+            exception.logs = logs
+            raise exception
+        return output, logs, is_final_answer
+
+
+class SandboxedPythonExecutor(PythonExecutor):
+    """
+    CodeAgent executor running the agent's code in a worker of the sandbox pool.
+
+    The worker is acquired on the first snippet and keeps the variables of the run
+    between steps; it is killed and replaced when a snippet exceeds its CPU, wall time
+    or memory limit, and released by `close`. Tool calls made by the code run in this
+    process, so tools keep their caches, traces and budgets.
+
+    Args:
+        additional_authorized_imports (List[str]): Modules the code may import.
+        max_print_outputs_length (Optional[int]): Maximum length of the printed outputs.
+        pool (Optional[SandboxPool]): Pool to take workers from.
+    """
+
+    def __init__(
+        self,
+        additional_authorized_imports: List[str],
+        max_print_outputs_length: Optional[int] = None,
+        pool: Optional[SandboxPool] = None,
+    ):
+        self.authorized_imports = list(set(BASE_BUILTIN_MODULES) | set(additional_authorized_imports))
+        self.max_print_outputs_length = max_print_outputs_length or DEFAULT_MAX_LEN_OUTPUT
+        self.pool = pool
+        self.tools: Dict[str, Any] = {}
+        self.state: Dict[str, Any] = {}
+        self._variables: Dict[str, Any] = {}
+        self._worker: Optional[SandboxWorker] = None
+
+    def send_variables(self, variables: dict):
+        self._variables.update(variables)
+
+    def send_tools(self, tools: Dict[str, Any]):
+        self.tools = dict(tools)
+
+    def __call__(self, code_action: str) -> Tuple[Any, str, bool]:
+        pool = self.pool or get_sandbox_pool()
+        if self._worker is None:
+            self._worker = pool.acquire()
+            if self._variables:
+                self._worker.conn.send(("variables", self._variables))
+        self.state["_print_outputs"] = ""
+        try:
+            output, logs, is_final_answer = run_in_worker(
+                self._worker, code_action, self.tools, self.authorized_imports, self.max_print_outputs_length
+            )
+        except SandboxError as e:
+            logger.warning(f"Killing sandbox worker: {e}")
+            pool.release(self._worker, e.reason)
+            self._worker = None
+            raise
+        except InterpreterError as e:
+            # The agent shows what the snippet printed before failing
+            self.state["_print_outputs"] = getattr(e, "logs", "")
+            if "CPU time limit" in str(e):
+                pool.stats["cpu_limit"] += 1
+            raise
+        self.state["_print_outputs"] = logs
+        return output, logs, is_final_answer
+
+    def close(self) -> None:
+        """Release the worker of this run."""
+        if self._worker is not None:
+            (self.pool or get_sandbox_pool()).release(self._worker)
+            self._worker = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+if __name__ == "__main__":
+    fd = int(sys.argv[1])
+    serve(Connection(socket.socket(fileno=fd).detach()))
@@ -0,0 +1,126 @@
+import argparse
+import subprocess
+import sys
+from typing import List, Optional, Tuple
+
+ImportCost = Tuple[str, float, float]
+
+
+def profile_imports(module: str, python: str = sys.executable) -> List[ImportCost]:
+    """
+    Measure the import cost of a module and everything it pulls in.
+
+    The module is imported in a fresh interpreter with `-X importtime`, so the numbers
+    reflect a cold start and are not affected by what the caller already imported.
+
+    Args:
+        module (str): Name of the module to import (e.g. "app").
+        python (str): Python executable to use.
+
+    Returns:
+        List[ImportCost]: (module, self seconds, cumulative seconds) for every imported
+            module, in import order.
+    """
+    completed = subprocess.run(
+        [python, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+
+    costs = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        costs.append((name.rstrip(), int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    return costs
+
+
+def _indent(name: str) -> int:
+    return len(name) - len(name.lstrip())
+
+
+def module_cost(module: str, costs: List[ImportCost]) -> float:
+    """
+    Return the cumulative import time of `module` in seconds.
+
+    Args:
+        module (str): Name of the profiled module.
+        costs (List[ImportCost]): Output of `profile_imports`.
+
+    Returns:
+        float: Cumulative import time, excluding interpreter startup.
+    """
+    return next(cumulative_s for name, _, cumulative_s in reversed(costs) if name.strip() == module)
+
+
+def direct_imports(module: str, costs: List[ImportCost]) -> List[ImportCost]:
+    """
+    Keep only the imports triggered directly by `module`, heaviest first.
+
+    Args:
+        module (str): Name of the profiled module.
+        costs (List[ImportCost]): Output of `profile_imports`.
+
+    Returns:
+        List[ImportCost]: Direct imports sorted by cumulative cost.
+    """
+    # -X importtime lists the children of a module right before the module itself
+    root = max(index for index, (name, _, _) in enumerate(costs) if name.strip() == module)
+    root_indent = _indent(costs[root][0])
+    direct = []
+    for name, self_s, cumulative_s in reversed(costs[:root]):
+        if _indent(name) <= root_indent:
+            break
+        if _indent(name) == root_indent + 2:
+            direct.append((name.strip(), self_s, cumulative_s))
+    return sorted(direct, key=lambda cost: cost[2], reverse=True)
+
+
+def format_report(module: str, costs: List[ImportCost], top: int = 15) -> str:
+    """
+    Render a human readable import cost report.
+
+    Args:
+        module (str): Name of the profiled module.
+        costs (List[ImportCost]): Output of `profile_imports`.
+        top (int): Number of heaviest modules to list.
+
+    Returns:
+        str: The report.
+    """
+    lines = [
+        f"Import cost of '{module}': {module_cost(module, costs):.2f}s",
+        "  cumulative      self  module",
+    ]
+    for name, self_s, cumulative_s in direct_imports(module, costs)[:top]:
+        lines.append(f"  {cumulative_s:9.3f}s {self_s:8.3f}s  {name}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point, see `python -m utils.startup --help`."""
+    parser = argparse.ArgumentParser(description="Report the cold import cost of a module.")
+    parser.add_argument("module", nargs="?", default="app", help="Module to profile (default: app)")
+    parser.add_argument("--top", type=int, default=15, help="Number of modules to list")
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=None,
+        help="Fail with exit code 1 if the total import time exceeds this many seconds",
+    )
+    args = parser.parse_args(argv)
+
+    costs = profile_imports(args.module)
+    print(format_report(args.module, costs, top=args.top))
+    total = module_cost(args.module, costs)
+    if args.budget is not None and total > args.budget:
+        print(f"Import time {total:.2f}s exceeds the budget of {args.budget:.2f}s")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
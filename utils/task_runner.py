@@ -0,0 +1,145 @@
+import contextvars
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_MAX_WORKERS = int(os.getenv("AGENT_MAX_WORKERS", "4"))
+DEFAULT_TASK_TIMEOUT = float(os.getenv("AGENT_TASK_TIMEOUT", "0")) or None
+
+_POLL_INTERVAL = 0.5
+
+
+def iter_task_results(
+    tasks: Sequence[Any],
+    worker: Callable[[Any], Any],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    task_timeout: Optional[float] = DEFAULT_TASK_TIMEOUT,
+    on_progress: Optional[Callable[[Dict[str, Any], int, int], None]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Run `worker` over `tasks` on a bounded thread pool and yield results as they finish.
+
+    Each yielded result is a dict with the keys `index` (position in `tasks`), `task`,
+    `status` ("ok", "error" or "timeout"), `result`, `error` and `duration` (seconds
+    spent running the task). The timeout of a task starts when a worker picks it up,
+    not when it is queued. Threads cannot be killed, so a timed out task is abandoned:
+    its result is discarded and its worker slot is freed once the call returns.
+
+    Args:
+        tasks (Sequence[Any]): Task payloads passed one by one to `worker`.
+        worker (Callable[[Any], Any]): Function that processes a single task.
+        max_workers (int): Maximum number of tasks running at the same time.
+        task_timeout (Optional[float]): Per-task timeout in seconds, or None for no limit.
+        on_progress (Optional[Callable[[Dict[str, Any], int, int], None]]): Called with
+            each result, the number of finished tasks and the total number of tasks.
+
+    Yields:
+        Dict[str, Any]: Result of a single task, in completion order.
+    """
+    total = len(tasks)
+    if total == 0:
+        return
+
+    started_at: Dict[int, float] = {}
+    finished_at: Dict[int, float] = {}
+
+    def run(index: int) -> Any:
+        started_at[index] = time.monotonic()
+        try:
+            return worker(tasks[index])
+        finally:
+            finished_at[index] = time.monotonic()
+
+    def make_result(index: int, status: str, result: Any = None, error: str = "") -> Dict[str, Any]:
+        end = finished_at.get(index, time.monotonic())
+        start = started_at.get(index, end)
+        return {
+            "index": index,
+            "task": tasks[index],
+            "status": status,
+            "result": result,
+            "error": error,
+            "duration": end - start,
+        }
+
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, min(max_workers, total)), thread_name_prefix="agent-task"
+    )
+    pending: Dict[Future, int] = {
+        # Copy the caller's context so context variables (e.g. tracing) reach the workers
+        executor.submit(contextvars.copy_context().run, run, index): index
+        for index in range(total)
+    }
+    done_count = 0
+    try:
+        while pending:
+            done, _ = wait(
+                list(pending),
+                timeout=_POLL_INTERVAL if task_timeout else None,
+                return_when=FIRST_COMPLETED,
+            )
+            finished = []
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    finished.append(make_result(index, "ok", result=future.result()))
+                except Exception as e:
+                    finished.append(make_result(index, "error", error=str(e)))
+
+            if task_timeout:
+                now = time.monotonic()
+                for future, index in list(pending.items()):
+                    start = started_at.get(index)
+                    if start is not None and now - start > task_timeout:
+                        del pending[future]
+                        future.cancel()
+                        logger.warning(f"Task {index} timed out after {task_timeout:.0f}s")
+                        finished.append(
+                            make_result(index, "timeout", error=f"Timed out after {task_timeout:.0f}s")
+                        )
+
+            for result in finished:
+                done_count += 1
+                if on_progress:
+                    on_progress(result, done_count, total)
+                yield result
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def run_tasks(
+    tasks: Sequence[Any],
+    worker: Callable[[Any], Any],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    task_timeout: Optional[float] = DEFAULT_TASK_TIMEOUT,
+    on_progress: Optional[Callable[[Dict[str, Any], int, int], None]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Run `worker` over `tasks` concurrently and return the results in the original order.
+
+    Args:
+        tasks (Sequence[Any]): Task payloads passed one by one to `worker`.
+        worker (Callable[[Any], Any]): Function that processes a single task.
+        max_workers (int): Maximum number of tasks running at the same time.
+        task_timeout (Optional[float]): Per-task timeout in seconds, or None for no limit.
+        on_progress (Optional[Callable[[Dict[str, Any], int, int], None]]): Progress callback,
+            see `iter_task_results`.
+
+    Returns:
+        List[Dict[str, Any]]: One result per task, see `iter_task_results`.
+    """
+    results = list(
+        iter_task_results(
+            tasks,
+            worker,
+            max_workers=max_workers,
+            task_timeout=task_timeout,
+            on_progress=on_progress,
+        )
+    )
+    return sorted(results, key=lambda result: result["index"])
@@ -0,0 +1,374 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+_collectors: contextvars.ContextVar[tuple] = contextvars.ContextVar("span_collectors", default=())
+
+
+class Span:
+    """
+    A timed unit of work: a task, an agent step, a model call or a tool call.
+
+    Args:
+        name (str): Name of the span (e.g. the tool name).
+        kind (str): One of "task", "step", "model", "tool" or "http".
+        parent (Optional[Span]): Enclosing span, if any.
+        attributes (Optional[Dict[str, Any]]): Sizes, counts and other details.
+        start (Optional[float]): Start timestamp, defaults to now.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        kind: str,
+        parent: Optional["Span"] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+        start: Optional[float] = None,
+    ):
+        self.name = name
+        self.kind = kind
+        self.span_id = uuid.uuid4().hex[:16]
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes or {}
+        self.start = start if start is not None else time.time()
+        self.end: Optional[float] = None
+
+    @property
+    def duration(self) -> float:
+        """Duration in seconds, up to now if the span is still open."""
+        return (self.end if self.end is not None else time.time()) - self.start
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON serializable representation of the span."""
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "end": self.end,
+            "duration": round(self.duration, 6),
+            "attributes": self.attributes,
+        }
+
+
+class LoggerSink:
+    """Writes finished spans to the `utils.logger` log as structured JSON lines."""
+
+    def __init__(self, level: int = logging.INFO):
+        self.level = level
+        self.logger = get_logger("trace")
+
+    def emit(self, span: Span) -> None:
+        self.logger.log(self.level, json.dumps(span.to_dict(), default=str))
+
+
+class JsonlSink:
+    """Appends finished spans to a JSONL file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def emit(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(line + "\n")
+
+
+class MemorySink:
+    """Keeps finished spans in memory, mostly for tests and benchmarks."""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def emit(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans.clear()
+
+
+class Tracer:
+    """
+    Creates spans and sends them to the configured sinks when they finish.
+
+    The current span is tracked in a context variable, so spans opened while another
+    span is active become its children, including across `utils.task_runner` workers.
+
+    Args:
+        sinks (Optional[List[Any]]): Objects with an `emit(span)` method.
+    """
+
+    def __init__(self, sinks: Optional[List[Any]] = None):
+        self.sinks = list(sinks or [])
+
+    def add_sink(self, sink: Any) -> None:
+        """Add a sink receiving every span finished from now on."""
+        self.sinks.append(sink)
+
+    @contextmanager
+    def span(self, name: str, kind: str, **attributes: Any) -> Iterator[Span]:
+        """
+        Open a span for the duration of the `with` block.
+
+        Args:
+            name (str): Name of the span.
+            kind (str): Kind of the span.
+            **attributes: Initial attributes, more can be set on the yielded span.
+
+        Yields:
+            Span: The open span.
+        """
+        span = Span(name, kind, parent=_current_span.get(), attributes=attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.attributes["error"] = str(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end = time.time()
+            self._emit(span)
+
+    def record(self, name: str, kind: str, start: float, end: float, **attributes: Any) -> Span:
+        """
+        Record a span that has already finished, as a child of the current span.
+
+        Args:
+            name (str): Name of the span.
+            kind (str): Kind of the span.
+            start (float): Start timestamp.
+            end (float): End timestamp.
+            **attributes: Attributes of the span.
+
+        Returns:
+            Span: The recorded span.
+        """
+        span = Span(name, kind, parent=_current_span.get(), attributes=attributes, start=start)
+        span.end = end
+        self._emit(span)
+        return span
+
+    @contextmanager
+    def collect(self) -> Iterator[List[Span]]:
+        """
+        Collect every span finished in the current context during the `with` block.
+
+        Yields:
+            List[Span]: List filled with the finished spans.
+        """
+        spans: List[Span] = []
+        token = _collectors.set(_collectors.get() + (spans,))
+        try:
+            yield spans
+        finally:
+            _collectors.reset(token)
+
+    def _emit(self, span: Span) -> None:
+        for collector in _collectors.get():
+            collector.append(span)
+        for sink in self.sinks:
+            try:
+                sink.emit(span)
+            except Exception as e:
+                logger.warning(f"Trace sink {type(sink).__name__} failed: {e}")
+
+
+def current_span() -> Optional[Span]:
+    """Return the innermost span open in the current context, if any."""
+    return _current_span.get()
+
+
+def sinks_from_env() -> List[Any]:
+    """
+    Build sinks from TRACE_SINKS, a comma separated list of "log" and "jsonl".
+
+    The JSONL sink writes to TRACE_PATH (default: .cache/traces.jsonl).
+
+    Returns:
+        List[Any]: The configured sinks.
+    """
+    sinks: List[Any] = []
+    for name in filter(None, (part.strip() for part in os.getenv("TRACE_SINKS", "").split(","))):
+        if name == "log":
+            sinks.append(LoggerSink())
+        elif name == "jsonl":
+            sinks.append(JsonlSink(os.getenv("TRACE_PATH", os.path.join(".cache", "traces.jsonl"))))
+        else:
+            logger.warning(f"Unknown trace sink: {name}")
+    return sinks
+
+
+tracer = Tracer(sinks_from_env())
+
+
+def _size(value: Any) -> int:
+    return len(value) if isinstance(value, (str, bytes, list, dict)) else len(str(value))
+
+
+def trace_tool(tool: Any) -> Any:
+    """
+    Record a "tool" span for every call of a tool, with argument and output sizes.
+
+    The tool's `forward` is wrapped in place; wrapping twice has no effect.
+
+    Args:
+        tool (Any): The smolagents tool.
+
+    Returns:
+        Any: The same tool instance.
+    """
+    if getattr(tool, "_traced", False):
+        return tool
+    forward = tool.forward
+
+    @functools.wraps(forward)
+    def traced_forward(*args, **kwargs):
+        input_chars = sum(_size(value) for value in (*args, *kwargs.values()))
+        with tracer.span(tool.name, "tool", input_chars=input_chars) as span:
+            output = forward(*args, **kwargs)
+            span.attributes["output_chars"] = _size(output)
+            return output
+
+    tool.forward = traced_forward
+    tool._traced = True
+    return tool
+
+
+def _usage_field(usage: Any, names: Tuple[str, ...]) -> Optional[int]:
+    # Usage is an object (OpenAI, LiteLLM) or a dict (Bedrock, recorded responses)
+    for name in names:
+        value = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+        if value is not None:
+            return value
+    return None
+
+
+def message_tokens(message: Any, model: Any = None) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Input and output tokens of one model call, read from the usage of its raw response.
+
+    Models shared by concurrent tasks overwrite their `last_*_token_count` on every call,
+    so the usage carried by the returned `ChatMessage.raw` is preferred; the model's
+    counts are only used for backends reporting no usage there.
+
+    Args:
+        message (Any): The `ChatMessage` returned by `generate`.
+        model (Any): The model that returned it.
+
+    Returns:
+        Tuple[Optional[int], Optional[int]]: Input and output tokens, None if unknown.
+    """
+    raw = getattr(message, "raw", None)
+    usage = raw.get("usage") if isinstance(raw, dict) else getattr(raw, "usage", None)
+    if usage is not None:
+        input_tokens = _usage_field(usage, ("prompt_tokens", "input_tokens", "inputTokens"))
+        output_tokens = _usage_field(usage, ("completion_tokens", "output_tokens", "outputTokens"))
+        if input_tokens is not None or output_tokens is not None:
+            return input_tokens, output_tokens
+    return getattr(model, "last_input_token_count", None), getattr(model, "last_output_token_count", None)
+
+
+def trace_model(model: Any) -> Any:
+    """
+    Record a "model" span for every `generate` call of a model, with sizes and tokens.
+
+    The model's `generate` is wrapped in place; wrapping twice has no effect.
+
+    Args:
+        model (Any): The smolagents model.
+
+    Returns:
+        Any: The same model instance.
+    """
+    if getattr(model, "_traced", False) or not hasattr(model, "generate"):
+        return model
+    generate = model.generate
+
+    @functools.wraps(generate)
+    def traced_generate(messages, *args, **kwargs):
+        name = getattr(model, "model_id", None) or type(model).__name__
+        with tracer.span(name, "model", messages=len(messages)) as span:
+            message = generate(messages, *args, **kwargs)
+            input_tokens, output_tokens = message_tokens(message, model)
+            span.attributes.update(
+                output_chars=_size(message.content or ""), input_tokens=input_tokens, output_tokens=output_tokens
+            )
+            return message
+
+    model.generate = traced_generate
+    model._traced = True
+    return model
+
+
+def summarize_spans(spans: List[Span]) -> Dict[str, Any]:
+    """
+    Aggregate the spans of one task into a flat summary.
+
+    Args:
+        spans (List[Span]): Spans collected while running the task.
+
+    Returns:
+        Dict[str, Any]: Step, model and tool counts, durations, token totals, the tokens
+            each tool added to the context, the model routes tried (when a routing
+            model is used) and the budget ceiling hit, if any.
+    """
+    summary: Dict[str, Any] = {
+        "steps": 0,
+        "llm_calls": 0,
+        "llm_seconds": 0.0,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "tool_calls": defaultdict(int),
+        "tool_seconds": defaultdict(float),
+        "tool_tokens": defaultdict(int),
+        "routes": None,
+        "budget": None,
+    }
+    for span in spans:
+        if span.kind == "task":
+            summary["routes"] = span.attributes.get("routes")
+            summary["budget"] = span.attributes.get("budget")
+        elif span.kind == "step":
+            summary["steps"] += 1
+        elif span.kind == "model":
+            summary["llm_calls"] += 1
+            summary["llm_seconds"] += span.duration
+            summary["input_tokens"] += span.attributes.get("input_tokens") or 0
+            summary["output_tokens"] += span.attributes.get("output_tokens") or 0
+        elif span.kind == "tool":
+            summary["tool_calls"][span.name] += 1
+            summary["tool_seconds"][span.name] += span.duration
+            tokens = span.attributes.get("kept_tokens")
+            if tokens is None:
+                tokens = (span.attributes.get("output_chars") or 0) // 4
+            summary["tool_tokens"][span.name] += tokens
+    summary["tool_calls"] = dict(summary["tool_calls"])
+    summary["tool_seconds"] = dict(summary["tool_seconds"])
+    summary["tool_tokens"] = dict(summary["tool_tokens"])
+    summary["slowest_tool"] = max(summary["tool_seconds"], key=summary["tool_seconds"].get, default=None)
+    return summary
@@ -0,0 +1,317 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Requests per second allowed per API key (0 disables rate limiting) and burst size
+DEFAULT_RATE_LIMIT = float(os.getenv("MODEL_RATE_LIMIT", "0"))
+DEFAULT_BURST = int(os.getenv("MODEL_RATE_BURST", "10"))
+DEFAULT_MAX_RETRIES = int(os.getenv("MODEL_MAX_RETRIES", "4"))
+# Seconds after which a second, hedged copy of a slow request is sent (0 disables hedging)
+DEFAULT_HEDGE_AFTER = float(os.getenv("MODEL_HEDGE_AFTER", "0")) or None
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "32"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "120"))
+
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+RETRYABLE_ERROR_NAMES = ("Timeout", "Connection", "RateLimit", "ServiceUnavailable", "InternalServer")
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, up to `capacity` in reserve.
+
+    Args:
+        rate (float): Tokens added per second.
+        capacity (int): Maximum number of tokens (burst size).
+    """
+
+    def __init__(self, rate: float, capacity: int = DEFAULT_BURST):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: float) -> float:
+        """Take `tokens` now and return how long the caller has to wait for them."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """Block until `tokens` are available."""
+        delay = self._reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, tokens: float = 1.0) -> None:
+        """Wait without blocking the event loop until `tokens` are available."""
+        delay = self._reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    """Return the HTTP status code carried by an API error, if any."""
+    code = getattr(error, "status_code", None)
+    if code is None:
+        code = getattr(getattr(error, "response", None), "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Tell whether a failed request is worth retrying (rate limits, 5xx, timeouts, resets).
+
+    Args:
+        error (BaseException): The error raised by the request.
+
+    Returns:
+        bool: True for transient errors.
+    """
+    code = status_code(error)
+    if code is not None:
+        return code in RETRYABLE_STATUS_CODES
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return any(name in type(error).__name__ for name in RETRYABLE_ERROR_NAMES)
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Return the delay requested by the server through a Retry-After header, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class Transport:
+    """
+    Shared call policy for one API key: rate limiting, retries and hedging.
+
+    Calls wait for a token of the key's token bucket, transient failures are retried
+    with jittered exponential backoff (honoring Retry-After), and when `hedge_after`
+    is set a second copy of a request that is still running after that many seconds
+    is started and the first result wins. Both copies run the same `fn`, so requests
+    whose callable keeps per-call state (e.g. token counts on a model object) must
+    give each attempt its own object, as `TransportModel` does.
+
+    Args:
+        rate (float): Requests per second, 0 for no rate limiting.
+        burst (int): Burst size of the token bucket.
+        max_retries (int): Retries after the first attempt.
+        base_delay (float): Backoff before the first retry, doubled on every retry.
+        max_delay (float): Upper bound of the backoff.
+        hedge_after (Optional[float]): Delay before a hedged request, None to disable.
+    """
+
+    def __init__(
+        self,
+        rate: float = DEFAULT_RATE_LIMIT,
+        burst: int = DEFAULT_BURST,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        hedge_after: Optional[float] = DEFAULT_HEDGE_AFTER,
+    ):
+        self.bucket = TokenBucket(rate, burst) if rate > 0 else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_after = hedge_after
+        self.stats = {"calls": 0, "retries": 0, "hedged": 0, "hedge_wins": 0, "failures": 0}
+        self._hedge_pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def backoff(self, attempt: int, error: BaseException) -> float:
+        """Delay before retry number `attempt` (1-based), with full jitter."""
+        requested = retry_after(error)
+        if requested is not None:
+            return min(requested, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def _hedged(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        with self._lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = concurrent.futures.ThreadPoolExecutor(thread_name_prefix="hedge")
+        primary = self._hedge_pool.submit(fn, *args, **kwargs)
+        done, _ = concurrent.futures.wait([primary], timeout=self.hedge_after)
+        if done:
+            return primary.result()
+
+        if self.bucket is not None:
+            self.bucket.acquire()
+        self.stats["hedged"] += 1
+        hedge = self._hedge_pool.submit(fn, *args, **kwargs)
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # The loser is dropped: cancelled if it has not started yet, its result ignored
+                    for other in pending:
+                        other.cancel()
+                    if future is hedge:
+                        self.stats["hedge_wins"] += 1
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Call `fn(*args, **kwargs)` under the rate limit, retry and hedging policy.
+
+        Args:
+            fn (Callable[..., Any]): The request, e.g. a bound API client method.
+            *args: Positional arguments of `fn`.
+            **kwargs: Keyword arguments of `fn`.
+
+        Returns:
+            Any: The result of the first successful attempt.
+        """
+        self.stats["calls"] += 1
+        for attempt in range(self.max_retries + 1):
+            if self.bucket is not None:
+                self.bucket.acquire()
+            try:
+                if self.hedge_after:
+                    return self._hedged(fn, *args, **kwargs)
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    self.stats["failures"] += 1
+                    raise
+                delay = self.backoff(attempt + 1, e)
+                self.stats["retries"] += 1
+                logger.warning(f"Request failed ({e}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+    async def acall(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Async version of `call`: coroutine functions are awaited on the event loop,
+        blocking functions run in the default executor.
+
+        Args:
+            fn (Callable[..., Any]): The request.
+            *args: Positional arguments of `fn`.
+            **kwargs: Keyword arguments of `fn`.
+
+        Returns:
+            Any: The result of the first successful attempt.
+        """
+        if not asyncio.iscoroutinefunction(fn):
+            return await asyncio.to_thread(self.call, fn, *args, **kwargs)
+
+        self.stats["calls"] += 1
+        for attempt in range(self.max_retries + 1):
+            if self.bucket is not None:
+                await self.bucket.acquire_async()
+            try:
+                if not self.hedge_after:
+                    return await fn(*args, **kwargs)
+                primary = asyncio.ensure_future(fn(*args, **kwargs))
+                done, _ = await asyncio.wait({primary}, timeout=self.hedge_after)
+                if done:
+                    return primary.result()
+                self.stats["hedged"] += 1
+                hedge = asyncio.ensure_future(fn(*args, **kwargs))
+                pending, error = {primary, hedge}, None
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for future in done:
+                        if future.exception() is None:
+                            for other in pending:
+                                other.cancel()
+                            if future is hedge:
+                                self.stats["hedge_wins"] += 1
+                            return future.result()
+                        error = future.exception()
+                raise error
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    self.stats["failures"] += 1
+                    raise
+                self.stats["retries"] += 1
+                await asyncio.sleep(self.backoff(attempt + 1, e))
+
+
+_transports: Dict[str, Transport] = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(api_key: Optional[str] = None) -> Transport:
+    """
+    Return the process-wide transport of an API key, so everything calling an API with
+    the same key shares one rate limit.
+
+    Args:
+        api_key (Optional[str]): The API key (only a hash of it is kept).
+
+    Returns:
+        Transport: The shared transport.
+    """
+    key = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()
+    with _transports_lock:
+        if key not in _transports:
+            _transports[key] = Transport()
+        return _transports[key]
+
+
+_http_client: Optional[Any] = None
+_async_http_client: Optional[Any] = None
+_http_client_lock = threading.Lock()
+
+
+def _http_limits() -> Any:
+    import httpx
+
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+        keepalive_expiry=60,
+    )
+
+
+def get_http_client() -> Any:
+    """
+    Return the process-wide pooled `httpx.Client` with keep-alive connections.
+
+    Returns:
+        httpx.Client: The shared client.
+    """
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            import httpx
+
+            _http_client = httpx.Client(limits=_http_limits(), timeout=HTTP_TIMEOUT)
+        return _http_client
+
+
+def get_async_http_client() -> Any:
+    """
+    Return the process-wide pooled `httpx.AsyncClient` with keep-alive connections.
+
+    Returns:
+        httpx.AsyncClient: The shared async client.
+    """
+    global _async_http_client
+    with _http_client_lock:
+        if _async_http_client is None:
+            import httpx
+
+            _async_http_client = httpx.AsyncClient(limits=_http_limits(), timeout=HTTP_TIMEOUT)
+        return _async_http_client